@@ -1,8 +1,11 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
+from django.utils import timezone
 from django.utils.html import format_html
 from .models import Article
-from .models_extended import ArticleLocale, Keyword, ArticleFile
+from core import pagecache, sitemaps, stats
+from . import counters, search, similarity
+from .models_extended import ArticleLocale, Keyword, ArticleFile, ArticleText
 
 @admin.register(Article)
 class ArticleAdmin(admin.ModelAdmin):
@@ -49,26 +52,47 @@ class ArticleAdmin(admin.ModelAdmin):
     
     def publish_articles(self, request, queryset):
         """Опубликовать выбранные статьи."""
-        from django.utils import timezone
-        updated = queryset.update(status='published', published_at=timezone.now())
+        now = timezone.now()
+        # updated_at задаем явно: update() не обновляет auto_now, а по нему
+        # строятся ETag/Last-Modified страниц (core.conditional)
+        updated = queryset.update(status='published', published_at=now, updated_at=now)
+        pks = list(queryset.values_list('pk', flat=True))
+        search.update_search_document(pks)
+        similarity.schedule_on_commit(pks)
+        stats.invalidate()
+        self._invalidate_pages(queryset)
         self.message_user(request, f'{updated} статей опубликовано.')
     publish_articles.short_description = "Опубликовать выбранные статьи"
     
     def accept_articles(self, request, queryset):
         """Принять выбранные статьи."""
-        updated = queryset.update(status='accepted')
+        updated = queryset.update(status='accepted', updated_at=timezone.now())
+        self._invalidate_pages(queryset)
         self.message_user(request, f'{updated} статей принято.')
     accept_articles.short_description = "Принять выбранные статьи"
     
     def reject_articles(self, request, queryset):
         """Отклонить выбранные статьи."""
-        updated = queryset.update(status='rejected')
+        updated = queryset.update(status='rejected', updated_at=timezone.now())
+        self._invalidate_pages(queryset)
         self.message_user(request, f'{updated} статей отклонено.')
     reject_articles.short_description = "Отклонить выбранные статьи"
     
+    def _invalidate_pages(self, queryset):
+        """Сбрасывает кэш страниц статей и sitemap: queryset.update() не вызывает сигналов."""
+        rows = list(queryset.values_list('pk', 'issue_id'))
+        pagecache.invalidate(
+            'articles',
+            *[f'article:{pk}' for pk, _ in rows],
+            *{f'issue:{issue_id}' for _, issue_id in rows},
+        )
+        sitemaps.mark_stale()
+    
     def reset_views(self, request, queryset):
         """Сбросить счетчики просмотров."""
+        counters.discard(queryset.values_list('pk', flat=True))
         updated = queryset.update(views=0, downloads=0)
+        stats.invalidate()
         self.message_user(request, f'Счетчики сброшены для {updated} статей.')
     reset_views.short_description = "Сбросить счетчики просмотров"
     
@@ -122,3 +146,18 @@ class ArticleFileAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         """Оптимизированный запрос."""
         return super().get_queryset(request).select_related('article')
+
+
+@admin.register(ArticleText)
+class ArticleTextAdmin(admin.ModelAdmin):
+    """Текст PDF статей (заполняется командой extract_pdf_text и после загрузки файлов)."""
+    list_display = ('article', 'source', 'status', 'pages', 'extracted_at')
+    list_filter = ('status',)
+    search_fields = ('article__title_ru', 'source')
+    readonly_fields = ('article', 'article_file', 'source', 'sha256', 'status', 'text', 'pages', 'error', 'extracted_at', 'updated_at')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('article').defer('text')
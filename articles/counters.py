@@ -0,0 +1,237 @@
+"""
+Отложенная запись счетчиков просмотров и загрузок статей (write-behind).
+
+Хиты накапливаются в кэше (атомарные add/incr), а в БД попадают пакетно:
+один UPDATE с F()-выражениями на порцию статей. Сброс происходит
+периодически из рабочего процесса, при его завершении и командой
+``manage.py flush_counters``.
+
+Кэш должен быть общим для всех процессов (Redis, Memcached; в
+production это проверяет settings.prod). С LocMemCache каждый процесс копит
+и сбрасывает только свои хиты: ``flush_counters`` буферов воркеров
+gunicorn не видит.
+
+Порции сбрасываются по одной под общей блокировкой в кэше: чтение буфера
+(get_many) и его уменьшение (decr) не атомарны вместе, и два сбрасывающих
+процесса без блокировки записали бы одни и те же хиты дважды.
+"""
+import atexit
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+
+from core import stats
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('views', 'downloads')
+KEY_PREFIX = 'article-counter'
+# Ключи живут заметно дольше интервала сброса, чтобы хиты не протухли до записи в БД
+KEY_TIMEOUT = 7 * 24 * 3600
+CHUNK_SIZE = 500
+FLUSH_LOCK_KEY = f'{KEY_PREFIX}:flush-lock'
+# Блокировка истекает сама, если процесс упал посреди сброса порции
+FLUSH_LOCK_TIMEOUT = 60
+# Сколько ждет блокировку явный сброс (flush_all); фоновый сброс не ждет
+FLUSH_LOCK_WAIT = 30
+
+_lock = threading.Lock()
+_touched = set()
+_last_flush = time.monotonic()
+
+
+def _cache():
+    return caches[getattr(settings, 'COUNTERS_CACHE_ALIAS', 'default')]
+
+
+def _flush_interval():
+    return getattr(settings, 'COUNTERS_FLUSH_INTERVAL', 30)
+
+
+def _key(field, pk):
+    return f'{KEY_PREFIX}:{field}:{pk}'
+
+
+def _add(cache, field, pk, amount):
+    """Атомарно прибавляет amount к буферу счетчика."""
+    key = _key(field, pk)
+    if cache.add(key, amount, KEY_TIMEOUT):
+        return
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        # Ключ истек между add() и incr()
+        cache.add(key, amount, KEY_TIMEOUT)
+
+
+def hit(pk, field, amount=1):
+    """
+    Регистрирует хит счетчика field ('views' или 'downloads') статьи pk.
+    Хит попадает в буфер после коммита текущей транзакции (вне транзакции —
+    сразу), так что откаченные запросы не учитываются.
+    """
+    if field not in FIELDS:
+        raise ValueError(f"Неизвестный счетчик: {field}")
+    transaction.on_commit(lambda: _record(pk, field, amount))
+
+
+def _record(pk, field, amount):
+    """Добавляет хит в буфер; раз в COUNTERS_FLUSH_INTERVAL секунд сбрасывает буфер процесса в БД."""
+    _add(_cache(), field, pk, amount)
+
+    with _lock:
+        _touched.add(pk)
+        due = time.monotonic() - _last_flush >= _flush_interval()
+    if due:
+        try:
+            flush()
+        except Exception as e:
+            # Хиты остаются в кэше и уйдут в БД при следующем сбросе
+            logger.error(f"Ошибка сброса счетчиков: {e}")
+
+
+def pending(pk):
+    """Возвращает еще не записанные в БД хиты статьи: {'views': n, 'downloads': m}."""
+    keys = {_key(field, pk): field for field in FIELDS}
+    values = _cache().get_many(keys)
+    return {field: values.get(key) or 0 for key, field in keys.items()}
+
+
+def discard(pks):
+    """Отбрасывает накопленные хиты (например, после сброса счетчиков в админке)."""
+    _cache().delete_many([_key(field, pk) for pk in pks for field in FIELDS])
+
+
+def _acquire(cache, wait):
+    """Берет блокировку сброса; возвращает ее токен или None, если не дождались."""
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + wait
+    while not cache.add(FLUSH_LOCK_KEY, token, FLUSH_LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(0.05)
+    return token
+
+
+def _release(cache, token):
+    # Чужую блокировку (наша истекла и ее взял другой процесс) не снимаем
+    if cache.get(FLUSH_LOCK_KEY) == token:
+        cache.delete(FLUSH_LOCK_KEY)
+
+
+def flush(pks=None, wait=None):
+    """
+    Переносит накопленные хиты в БД.
+
+    Args:
+        pks: Статьи для сброса; по умолчанию — затронутые текущим процессом.
+        wait: Сколько секунд ждать блокировку, если сбрасывает другой процесс;
+            по умолчанию для фонового сброса (pks=None) не ждать — хиты
+            останутся в буфере до следующего раза, иначе FLUSH_LOCK_WAIT.
+
+    Returns:
+        Словарь {'articles': n, 'views': n, 'downloads': n} с записанными хитами.
+    """
+    global _last_flush
+    background = pks is None
+    with _lock:
+        if background:
+            pks = set(_touched)
+            _touched.clear()
+        _last_flush = time.monotonic()
+    if wait is None:
+        wait = 0 if background else FLUSH_LOCK_WAIT
+
+    pks = list(pks)
+    cache = _cache()
+    totals = {'articles': 0, 'views': 0, 'downloads': 0}
+    for start in range(0, len(pks), CHUNK_SIZE):
+        chunk = pks[start:start + CHUNK_SIZE]
+        token = _acquire(cache, wait)
+        if token is None:
+            if background:
+                with _lock:
+                    _touched.update(pks[start:])
+                break
+            raise TimeoutError("Не удалось дождаться блокировки сброса счетчиков")
+        try:
+            chunk_totals = _flush_chunk(chunk)
+        finally:
+            _release(cache, token)
+        for name, value in chunk_totals.items():
+            totals[name] += value
+    if totals['articles']:
+        stats.invalidate()
+    return totals
+
+
+def flush_all(wait=None):
+    """Сбрасывает хиты всех статей — в том числе накопленные другими процессами."""
+    from .models import Article
+
+    pks = Article.objects.values_list('pk', flat=True).order_by('pk')
+    return flush(list(pks.iterator(chunk_size=CHUNK_SIZE)), wait=wait)
+
+
+def _flush_chunk(pks):
+    from .models import Article
+
+    cache = _cache()
+    keys = {_key(field, pk): (field, pk) for pk in pks for field in FIELDS}
+    deltas = {field: {} for field in FIELDS}
+    for key, value in cache.get_many(keys).items():
+        if not value:
+            continue
+        field, pk = keys[key]
+        try:
+            # decr атомарен: хиты, пришедшие после get_many, останутся в буфере;
+            # другой сбрасывающий процесс между ними не вклинится (блокировка в flush)
+            cache.decr(key, value)
+        except ValueError:
+            continue
+        deltas[field][pk] = value
+
+    touched = set(deltas['views']) | set(deltas['downloads'])
+    if not touched:
+        return {'articles': 0, 'views': 0, 'downloads': 0}
+
+    updates = {
+        field: F(field) + Case(
+            *[When(pk=pk, then=Value(value)) for pk, value in values.items()],
+            default=Value(0),
+            output_field=PositiveIntegerField(),
+        )
+        for field, values in deltas.items()
+        if values
+    }
+    try:
+        with transaction.atomic():
+            Article.objects.filter(pk__in=touched).update(**updates)
+    except Exception:
+        # Возвращаем хиты в буфер, чтобы не потерять их
+        for field, values in deltas.items():
+            for pk, value in values.items():
+                _add(cache, field, pk, value)
+        raise
+
+    return {
+        'articles': len(touched),
+        'views': sum(deltas['views'].values()),
+        'downloads': sum(deltas['downloads'].values()),
+    }
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception as e:
+        logger.error(f"Ошибка сброса счетчиков при завершении процесса: {e}")
+
+
+atexit.register(_flush_at_exit)
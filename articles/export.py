@@ -0,0 +1,257 @@
+"""
+Потоковая выгрузка метаданных статей: Crossref deposit XML, JATS,
+CSV, BibTeX и RIS.
+
+Статьи читаются итератором по EXPORT_CHUNK_SIZE строк с
+prefetch_related('authors') на каждый пакет, а форматы — генераторы
+строк, поэтому выгрузка всего архива не держит его в памяти целиком.
+Используются командой export_metadata и редакторским эндпоинтом
+articles:metadata_export.
+"""
+import csv
+import itertools
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from core.oai import (
+    LANGUAGES, article_url, element, jats, metadata_context,
+    publication_date, split_keywords, xml_attr, xml_text,
+)
+from .models import Article
+from .search import DOCUMENT_COLUMNS
+
+User = get_user_model()
+
+AUTHOR_FIELDS = ('pk', 'username', 'first_name', 'last_name', 'full_name', 'orcid', 'organization')
+
+
+def _chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 500)
+
+
+def select_articles(issue_ids=None, pk_from=None, pk_to=None, published_only=True):
+    """
+    Статьи для выгрузки в порядке выпусков (год, номер) и страниц.
+
+    Args:
+        issue_ids: Ограничить выпусками
+        pk_from, pk_to: Диапазон id статей (включительно)
+        published_only: Только опубликованные статьи
+    """
+    articles = Article.objects.select_related('issue').defer(*DOCUMENT_COLUMNS)
+    if published_only:
+        articles = articles.filter(status='published')
+    if issue_ids:
+        articles = articles.filter(issue_id__in=issue_ids)
+    if pk_from is not None:
+        articles = articles.filter(pk__gte=pk_from)
+    if pk_to is not None:
+        articles = articles.filter(pk__lte=pk_to)
+    return articles.prefetch_related(
+        Prefetch('authors', queryset=User.objects.only(*AUTHOR_FIELDS).order_by('pk'))
+    ).order_by('issue__year', 'issue__number', 'page_start', 'pk')
+
+
+def _iterate(articles):
+    return articles.iterator(chunk_size=_chunk_size())
+
+
+def _author_name(author):
+    """(фамилия, имя); без фамилии — полное имя целиком как фамилия."""
+    if author.last_name:
+        return author.last_name, author.first_name
+    return author.get_full_name() or author.username, ''
+
+
+def crossref(articles):
+    """
+    Crossref deposit XML (схема 5.3.1): по элементу journal на выпуск.
+    Статьи без DOI пропускаются — Crossref их не принимает.
+    """
+    context = metadata_context()
+    now = timezone.now()
+    issn = getattr(settings, 'JOURNAL_ISSN', '')
+    issn = f'<issn media_type="electronic">{xml_text(issn)}</issn>' if issn else ''
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<doi_batch version="5.3.1" xmlns="http://www.crossref.org/schema/5.3.1" '
+        'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+        'xmlns:jats="http://www.ncbi.nlm.nih.gov/JATS1" '
+        'xsi:schemaLocation="http://www.crossref.org/schema/5.3.1 '
+        'https://www.crossref.org/schemas/crossref5.3.1.xsd">\n'
+        '<head>'
+        f'<doi_batch_id>jhdkz-{now:%Y%m%d%H%M%S}</doi_batch_id>'
+        f'<timestamp>{now:%Y%m%d%H%M%S}</timestamp>'
+        '<depositor>'
+        f'{element("depositor_name", getattr(settings, "CROSSREF_DEPOSITOR_NAME", "") or context["journal"])}'
+        f'{element("email_address", getattr(settings, "CROSSREF_DEPOSITOR_EMAIL", ""))}'
+        '</depositor>'
+        f'{element("registrant", getattr(settings, "CROSSREF_REGISTRANT", "") or context["journal"])}'
+        '</head>\n<body>\n'
+    )
+    with_doi = (article for article in _iterate(articles) if article.doi)
+    # Статьи упорядочены по выпускам: группировка не требует памяти
+    for issue, issue_articles in itertools.groupby(with_doi, key=lambda article: article.issue):
+        yield (
+            '<journal><journal_metadata language="ru">'
+            f'{element("full_title", context["journal"])}'
+            f'{issn}'
+            '</journal_metadata><journal_issue>'
+            f'{_crossref_date(issue.published_at, year=issue.year)}'
+            f'{element("issue", issue.number)}'
+            '</journal_issue>\n'
+        )
+        for article in issue_articles:
+            yield _crossref_article(article)
+        yield '</journal>\n'
+    yield '</body>\n</doi_batch>\n'
+
+
+def _crossref_date(value, year=None):
+    if value is None:
+        return f'<publication_date media_type="online"><year>{year}</year></publication_date>' if year else ''
+    return (
+        f'<publication_date media_type="online"><month>{value.month:02d}</month>'
+        f'<day>{value.day:02d}</day><year>{value.year}</year></publication_date>'
+    )
+
+
+def _crossref_article(article):
+    language = article.language
+    parts = [f'<journal_article publication_type="full_text" language={xml_attr(language)}>', '<titles>']
+    parts.append(element('title', article.get_title(language) or article.title_ru))
+    for code in LANGUAGES:
+        if code != language and article.get_title(code):
+            parts.append(f'<original_language_title language="{code}">{xml_text(article.get_title(code))}</original_language_title>')
+            break
+    parts.append('</titles>')
+
+    authors = list(article.authors.all())
+    if authors:
+        parts.append('<contributors>')
+        for position, author in enumerate(authors):
+            surname, given = _author_name(author)
+            parts.append(
+                f'<person_name sequence="{"first" if position == 0 else "additional"}" contributor_role="author">'
+                f'{element("given_name", given)}{element("surname", surname)}'
+            )
+            if author.organization:
+                parts.append(f'<affiliations><institution>{element("institution_name", author.organization)}</institution></affiliations>')
+            if author.orcid:
+                parts.append(element('ORCID', f'https://orcid.org/{author.orcid}'))
+            parts.append('</person_name>')
+        parts.append('</contributors>')
+
+    abstract = article.get_abstract(language) or article.abstract_ru
+    if abstract:
+        parts.append(f'<jats:abstract xml:lang={xml_attr(language)}><jats:p>{xml_text(abstract)}</jats:p></jats:abstract>')
+    parts.append(_crossref_date(publication_date(article), year=article.issue.year))
+    parts.append(f'<pages>{element("first_page", article.page_start)}{element("last_page", article.page_end)}</pages>')
+    parts.append(f'<doi_data>{element("doi", article.doi)}{element("resource", article_url(article))}</doi_data>')
+    parts.append('</journal_article>\n')
+    return ''.join(parts)
+
+
+def jats_set(articles):
+    """JATS front matter статей, обернутые в один корневой элемент article-set."""
+    context = metadata_context()
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n<article-set>\n'
+    for article in _iterate(articles):
+        yield jats(article, context) + '\n'
+    yield '</article-set>\n'
+
+
+CSV_COLUMNS = (
+    'id', 'doi', 'title_ru', 'title_kk', 'title_en', 'authors', 'orcid', 'year', 'issue',
+    'pages', 'published', 'language', 'keywords_ru', 'keywords_kk', 'keywords_en', 'url',
+)
+
+
+class _Echo:
+    """Псевдо-файл для csv.writer: write() возвращает строку, а не пишет ее."""
+
+    def write(self, value):
+        return value
+
+
+def csv_rows(articles):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for article in _iterate(articles):
+        authors = list(article.authors.all())
+        published = publication_date(article)
+        yield writer.writerow([
+            article.pk, article.doi, article.title_ru, article.title_kk, article.title_en,
+            '; '.join(' '.join(filter(None, _author_name(author))) for author in authors),
+            '; '.join(author.orcid for author in authors if author.orcid),
+            article.issue.year, article.issue.number, article.get_pages_info(),
+            published.isoformat() if published else '', article.language,
+            article.keywords_ru, article.keywords_kk, article.keywords_en, article_url(article),
+        ])
+
+
+_BIBTEX_SPECIAL = str.maketrans({char: f'\\{char}' for char in '&%$#_{}'})
+
+
+def _bibtex_value(value):
+    return str(value).replace('\\', '').translate(_BIBTEX_SPECIAL)
+
+
+def bibtex(articles):
+    journal = metadata_context()['journal']
+    for article in _iterate(articles):
+        fields = [
+            ('title', article.get_title(article.language) or article.title_ru),
+            ('author', ' and '.join(', '.join(filter(None, _author_name(author))) for author in article.authors.all())),
+            ('journal', journal),
+            ('year', article.issue.year),
+            ('number', article.issue.number),
+            ('pages', f'{article.page_start}--{article.page_end}'),
+            ('doi', article.doi),
+            ('url', article_url(article)),
+            ('keywords', ', '.join(split_keywords(article.get_keywords(article.language)))),
+            ('language', article.language),
+        ]
+        body = ',\n'.join(f'  {name} = {{{_bibtex_value(value)}}}' for name, value in fields if value not in (None, ''))
+        yield f'@article{{jhdkz{article.pk},\n{body}\n}}\n\n'
+
+
+def ris(articles):
+    journal = metadata_context()['journal']
+    for article in _iterate(articles):
+        published = publication_date(article)
+        lines = [('TY', 'JOUR'), ('TI', article.get_title(article.language) or article.title_ru)]
+        lines += [('AU', ', '.join(filter(None, _author_name(author)))) for author in article.authors.all()]
+        lines += [
+            ('JO', journal),
+            ('PY', article.issue.year),
+            ('DA', published.strftime('%Y/%m/%d') if published else ''),
+            ('IS', article.issue.number),
+            ('SP', article.page_start),
+            ('EP', article.page_end),
+            ('DO', article.doi),
+            ('UR', article_url(article)),
+            ('AB', (article.get_abstract(article.language) or article.abstract_ru).replace('\r', ' ').replace('\n', ' ')),
+            ('LA', article.language),
+        ]
+        lines += [('KW', keyword) for keyword in split_keywords(article.get_keywords(article.language))]
+        lines.append(('ER', ''))
+        yield ''.join(f'{tag}  - {value}\r\n' for tag, value in lines if value not in (None, '') or tag == 'ER')
+
+
+# формат: (генератор, MIME тип, расширение файла)
+FORMATS = {
+    'crossref': (crossref, 'application/xml', 'xml'),
+    'jats': (jats_set, 'application/xml', 'xml'),
+    'csv': (csv_rows, 'text/csv', 'csv'),
+    'bibtex': (bibtex, 'application/x-bibtex', 'bib'),
+    'ris': (ris, 'application/x-research-info-systems', 'ris'),
+}
+
+
+def export(fmt, articles):
+    """Генератор строк выгрузки articles в формате fmt (ключ FORMATS)."""
+    return FORMATS[fmt][0](articles)
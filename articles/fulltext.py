@@ -0,0 +1,229 @@
+"""
+Извлечение текста из PDF статей для поиска.
+
+Источники статьи — Article.pdf_file и PDF среди ArticleFile; для каждого
+ведется строка ArticleText. sync() создает строки новых файлов
+(status='pending') и удаляет строки исчезнувших. process() извлекает
+текст в пуле процессов (PDF_TEXT_WORKERS, контекст spawn, см.
+articles.pdftext) и сохраняет каждый результат сразу, поэтому прерванный
+прогон продолжается с оставшихся pending-строк. Задание сначала
+хэширует файл: при совпадении sha256 с уже извлеченной версией текст
+не извлекается повторно.
+
+Сохраненный текст попадает в поисковый индекс статьи: на SQLite —
+триггерами FTS5 (core.search.sqlite), на Postgres — пересборкой
+Article.search_document.
+
+После загрузки файла (Article.save, ArticleFile.save) статья ставится
+в очередь после коммита: PDF_TEXT_ON_UPLOAD='thread' — обработка в
+фоновом потоке, 'sync' — сразу в запросе (тесты), 'off' — только
+командой extract_pdf_text.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from . import pdftext, search
+from .models import Article
+from .models_extended import ArticleFile, ArticleText
+
+logger = logging.getLogger(__name__)
+
+
+def _workers():
+    return getattr(settings, 'PDF_TEXT_WORKERS', 2)
+
+
+def _mode():
+    return getattr(settings, 'PDF_TEXT_ON_UPLOAD', 'thread')
+
+
+def _max_chars():
+    return getattr(settings, 'PDF_TEXT_MAX_CHARS', 2_000_000)
+
+
+def _extractor():
+    """Путь к функции извлечения вместо pdftext.extract_text (например, для OCR)."""
+    return getattr(settings, 'PDF_TEXT_EXTRACTOR', None)
+
+
+def _is_pdf(name, content_type=''):
+    return content_type == 'application/pdf' or name.lower().endswith('.pdf')
+
+
+def sources(article):
+    """{имя файла в хранилище: id ArticleFile или None для Article.pdf_file}."""
+    result = {}
+    if article.pdf_file and _is_pdf(article.pdf_file.name):
+        result[article.pdf_file.name] = None
+    for article_file in article.files.all():
+        if article_file.file and _is_pdf(article_file.file.name, article_file.content_type):
+            result[article_file.file.name] = article_file.pk
+    return result
+
+
+def sync(articles):
+    """
+    Приводит строки ArticleText к текущим PDF-файлам статей.
+
+    Returns:
+        Словарь {'created': n, 'deleted': n}.
+    """
+    articles = articles.only('pk', 'pdf_file').prefetch_related(
+        Prefetch('files', queryset=ArticleFile.objects.only('pk', 'article_id', 'file', 'content_type')),
+        Prefetch('texts', queryset=ArticleText.objects.only('pk', 'article_id', 'source')),
+    )
+    new_rows, stale = [], []
+    for article in articles.iterator(chunk_size=500):
+        current = sources(article)
+        known = {text.source: text.pk for text in article.texts.all()}
+        new_rows += [
+            ArticleText(article_id=article.pk, article_file_id=file_id, source=source)
+            for source, file_id in current.items() if source not in known
+        ]
+        stale += [(pk, article.pk) for source, pk in known.items() if source not in current]
+
+    ArticleText.objects.bulk_create(new_rows, batch_size=500, ignore_conflicts=True)
+    deleted = 0
+    if stale:
+        deleted, _ = ArticleText.objects.filter(pk__in=[pk for pk, _ in stale]).delete()
+        # Текст удаленного файла больше не должен находиться поиском
+        search.update_search_document({article_pk for _, article_pk in stale})
+    return {'created': len(new_rows), 'deleted': deleted}
+
+
+def candidates(article_ids=None, retry_failed=False, verify=False):
+    """
+    Строки к обработке: pending; с retry_failed — и неудачные; с verify —
+    все (у извлеченных сверяется sha256 файла).
+    """
+    statuses = ['pending']
+    if retry_failed or verify:
+        statuses.append('failed')
+    if verify:
+        statuses.append('done')
+    rows = ArticleText.objects.filter(status__in=statuses)
+    if article_ids is not None:
+        rows = rows.filter(article_id__in=article_ids)
+    return rows.order_by('pk')
+
+
+def _store(pk, article_id, result=None, error=None):
+    now = timezone.now()
+    rows = ArticleText.objects.filter(pk=pk)
+    if error is not None:
+        logger.warning(f"Не удалось извлечь текст PDF (ArticleText {pk}): {error}")
+        rows.update(status='failed', error=str(error)[:2000], updated_at=now)
+        return 'failed'
+    if result['unchanged']:
+        rows.update(status='done', error='', updated_at=now)
+        return 'unchanged'
+    rows.update(
+        status='done', sha256=result['sha256'], text=result['text'], pages=result['pages'],
+        error='', extracted_at=now, updated_at=now,
+    )
+    search.update_search_document([article_id])
+    return 'extracted'
+
+
+def _jobs(rows, batch_size=500):
+    """
+    Задания пакетами по pk (keyset): строки обновляются по ходу обработки,
+    поэтому курсор по той же выборке не держим.
+    """
+    last_pk = 0
+    while True:
+        batch = list(
+            rows.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', 'article_id', 'source', 'sha256')[:batch_size]
+        )
+        if not batch:
+            return
+        yield from batch
+        last_pk = batch[-1][0]
+
+
+def process(rows, workers=None):
+    """
+    Извлекает текст для строк rows (queryset ArticleText).
+    workers=0 — в текущем процессе, без пула.
+
+    Returns:
+        Словарь {'extracted': n, 'unchanged': n, 'failed': n}.
+    """
+    workers = _workers() if workers is None else workers
+    totals = {'extracted': 0, 'unchanged': 0, 'failed': 0}
+    jobs = _jobs(rows)
+    options = {'extractor': _extractor(), 'max_chars': _max_chars()}
+
+    if workers <= 0:
+        for pk, article_id, source, sha256 in jobs:
+            try:
+                result = pdftext.run(default_storage.path(source), sha256, **options)
+            except Exception as e:
+                totals[_store(pk, article_id, error=e)] += 1
+            else:
+                totals[_store(pk, article_id, result)] += 1
+        return totals
+
+    def collect(done):
+        for future in done:
+            pk, article_id = in_flight.pop(future)
+            error = future.exception()
+            totals[_store(pk, article_id, None if error else future.result(), error)] += 1
+
+    # spawn: дочерние процессы не наследуют соединения с БД и потоки родителя
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        in_flight = {}
+        for pk, article_id, source, sha256 in jobs:
+            # Не больше двух заданий на процесс в очереди: память не зависит от объема архива
+            if len(in_flight) >= workers * 2:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            future = pool.submit(pdftext.run, default_storage.path(source), sha256, **options)
+            in_flight[future] = (pk, article_id)
+        collect(wait(in_flight).done)
+    return totals
+
+
+def _process_in_background(article_ids):
+    try:
+        process(candidates(article_ids), workers=1)
+    except Exception as e:
+        logger.error(f"Ошибка извлечения текста PDF статей {article_ids}: {e}")
+    finally:
+        connection.close()
+
+
+def schedule(article_pk):
+    """Учитывает файлы статьи и запускает извлечение согласно PDF_TEXT_ON_UPLOAD."""
+    mode = _mode()
+    if mode == 'off':
+        return
+    sync(Article.objects.filter(pk=article_pk))
+    if not candidates([article_pk]).exists():
+        return
+    if mode == 'sync':
+        process(candidates([article_pk]), workers=0)
+    else:
+        threading.Thread(
+            target=_process_in_background, args=([article_pk],), name='pdf-text', daemon=True,
+        ).start()
+
+
+def schedule_on_commit(article_pk):
+    """Планирует schedule после коммита; ошибки не ломают сохранение."""
+    def _schedule():
+        try:
+            schedule(article_pk)
+        except Exception as e:
+            logger.error(f"Ошибка постановки PDF статьи {article_pk} на извлечение текста: {e}")
+
+    transaction.on_commit(_schedule)
@@ -0,0 +1,14 @@
+"""
+Management команда для полной пересборки индекса похожих статей.
+"""
+from django.core.management.base import BaseCommand
+
+from articles import similarity
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает похожие статьи (TF-IDF по ключевым словам и аннотациям) для всех опубликованных статей"
+
+    def handle(self, *args, **options):
+        pairs = similarity.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Готово. Записано пар: {pairs}"))
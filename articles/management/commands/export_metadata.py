@@ -0,0 +1,59 @@
+"""
+Management команда для потоковой выгрузки метаданных статей
+(Crossref deposit XML, JATS, CSV, BibTeX, RIS).
+"""
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from articles import export
+from issues.models import Issue
+
+
+class Command(BaseCommand):
+    help = "Выгружает метаданные статей выбранных выпусков или диапазона id"
+
+    def add_arguments(self, parser):
+        parser.add_argument('format', choices=sorted(export.FORMATS), help='Формат выгрузки')
+        parser.add_argument('--issue', action='append', default=[], help='Выпуск ГОД/НОМЕР (можно повторять)')
+        parser.add_argument('--year', action='append', type=int, default=[], help='Все выпуски года (можно повторять)')
+        parser.add_argument('--from-id', type=int, help='Первый id статьи')
+        parser.add_argument('--to-id', type=int, help='Последний id статьи')
+        parser.add_argument('--include-unpublished', action='store_true', help='Выгружать и неопубликованные статьи')
+        parser.add_argument('-o', '--output', help='Файл (по умолчанию stdout)')
+
+    def handle(self, *args, **options):
+        issue_ids = self._issue_ids(options['issue'], options['year'])
+        articles = export.select_articles(
+            issue_ids=issue_ids,
+            pk_from=options['from_id'],
+            pk_to=options['to_id'],
+            published_only=not options['include_unpublished'],
+        )
+
+        output = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        try:
+            for chunk in export.export(options['format'], articles):
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        if options['output']:
+            self.stderr.write(self.style.SUCCESS(f"Готово: {options['output']}"))
+
+    def _issue_ids(self, issues, years):
+        if not issues and not years:
+            return None
+        ids = list(Issue.objects.filter(year__in=years).values_list('pk', flat=True))
+        for value in issues:
+            try:
+                year, number = (int(part) for part in value.split('/'))
+            except ValueError:
+                raise CommandError(f'Неверный выпуск {value!r}: ожидается ГОД/НОМЕР')
+            issue = Issue.objects.filter(year=year, number=number).values_list('pk', flat=True).first()
+            if issue is None:
+                raise CommandError(f'Выпуск {value} не найден')
+            ids.append(issue)
+        if not ids:
+            raise CommandError('Выпуски не найдены')
+        return ids
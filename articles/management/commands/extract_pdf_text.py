@@ -0,0 +1,29 @@
+"""
+Management команда для извлечения текста из PDF статей (backfill и дообработка).
+"""
+from django.core.management.base import BaseCommand
+
+from articles import fulltext
+from articles.models import Article
+
+
+class Command(BaseCommand):
+    help = "Извлекает текст из PDF статей для поиска; неизмененные файлы (по sha256) пропускаются"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--article', type=int, action='append', help='Только статья с этим id (можно повторять)')
+        parser.add_argument('--workers', type=int, help='Процессов в пуле (0 — без пула); по умолчанию PDF_TEXT_WORKERS')
+        parser.add_argument('--retry-failed', action='store_true', help='Повторить файлы с ошибкой извлечения')
+        parser.add_argument('--verify', action='store_true', help='Сверить sha256 уже извлеченных файлов')
+
+    def handle(self, *args, **options):
+        articles = Article.objects.all()
+        if options['article']:
+            articles = articles.filter(pk__in=options['article'])
+        synced = fulltext.sync(articles)
+        rows = fulltext.candidates(options['article'], options['retry_failed'], options['verify'])
+        totals = fulltext.process(rows, workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово. Новых файлов: {synced['created']}, удалено: {synced['deleted']}, "
+            f"извлечено: {totals['extracted']}, без изменений: {totals['unchanged']}, ошибок: {totals['failed']}"
+        ))
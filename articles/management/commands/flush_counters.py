@@ -0,0 +1,19 @@
+"""
+Management команда для принудительного сброса буфера счетчиков статей в БД.
+
+Видит хиты воркеров только при общем кэше (см. articles.counters).
+"""
+from django.core.management.base import BaseCommand
+
+from articles import counters
+
+
+class Command(BaseCommand):
+    help = "Записывает накопленные просмотры и загрузки статей в БД"
+
+    def handle(self, *args, **options):
+        totals = counters.flush_all()
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово. Статей: {totals['articles']}, "
+            f"просмотров: {totals['views']}, загрузок: {totals['downloads']}"
+        ))
@@ -42,6 +42,10 @@ class Command(BaseCommand):
             action="store_true",
             help="Только проверка без сохранения в БД"
         )
+        parser.add_argument(
+            "--blobs",
+            help="Хранилище тел страниц краулера (по умолчанию <каталог source>/blobs)"
+        )
 
     def handle(self, *args, **options):
         source = options["source"]
@@ -53,31 +57,49 @@ class Command(BaseCommand):
         if dry_run:
             self.stdout.write(self.style.WARNING("РЕЖИМ ПРОВЕРКИ (dry-run) - изменения не будут сохранены"))
 
+        from etl.blobstore import BlobStore
+
+        # Тела страниц переносятся из хранилища краулера в ETL_BLOB_ROOT
+        self.blobs = RawDocument.blob_store()
+        self.source_blobs = None
+
         # Получаем итератор сырых документов
         raw_iter: Iterable[Dict[str, Any]]
         
         if source.startswith("http"):
-            # Загружаем через ETL crawler
+            # Загружаем через ETL crawler; тела сразу пишутся в ETL_BLOB_ROOT
             from etl.crawler import crawl_site
             self.stdout.write("Загрузка данных через ETL crawler...")
             raw_iter = crawl_site(
                 start_url=source,
                 langs=langs,
-                since_year=since
+                since_year=since,
+                blob_dir=str(self.blobs.directory)
             )
+            self.source_blobs = self.blobs
         else:
             # Читаем из файла
+            from etl.util import COMPRESSION_SUFFIXES, jsonl_files, load_jsonl
+
             path = Path(source)
-            if not path.exists():
+            # Вывод краулера может быть сжат (.jsonl.gz, .jsonl.zst) и разбит
+            # на части (raw.00001.jsonl.gz ...): тогда source — общее имя
+            suffix = path.suffix
+            if suffix in COMPRESSION_SUFFIXES.values():
+                suffix = Path(path.stem).suffix + suffix
+            streamed = {".jsonl"} | {".jsonl" + ext for ext in COMPRESSION_SUFFIXES.values()}
+            if not (path.exists() or (suffix in streamed and jsonl_files(path))):
                 raise CommandError(f"Файл не найден: {source}")
+            blob_dir = Path(options["blobs"]) if options["blobs"] else path.parent / "blobs"
+            if blob_dir.is_dir():
+                self.source_blobs = BlobStore(blob_dir)
+            elif options["blobs"]:
+                raise CommandError(f"Хранилище тел не найдено: {blob_dir}")
             
-            if path.suffix in {".jsonl", ".json"}:
-                if path.suffix == ".jsonl":
-                    raw_iter = (
-                        json.loads(line)
-                        for line in path.read_text(encoding="utf-8").splitlines()
-                        if line.strip()
-                    )
+            if suffix in streamed | {".json"}:
+                if suffix in streamed:
+                    # Записи читаются потоком, файл целиком в память не загружается
+                    raw_iter = load_jsonl(path)
                 else:
                     # JSON файл
                     data = json.loads(path.read_text(encoding="utf-8"))
@@ -86,7 +108,7 @@ class Command(BaseCommand):
                     else:
                         raw_iter = iter([data])
             else:
-                raise CommandError(f"Неподдерживаемый формат файла: {path.suffix}")
+                raise CommandError(f"Неподдерживаемый формат файла: {suffix}")
 
         # Обрабатываем документы
         stats = {
@@ -120,6 +142,10 @@ class Command(BaseCommand):
                         stats['imported'] += 1
                     else:
                         stats['skipped'] += 1
+                        continue
+
+                    if sha256 and not dry_run:
+                        self._save_raw(doc, sha256)
                 
                 except Exception as e:
                     stats['errors'] += 1
@@ -136,6 +162,23 @@ class Command(BaseCommand):
         self.stdout.write(f"Пропущено: {stats['skipped']}")
         self.stdout.write(f"Ошибок: {stats['errors']}")
 
+    def _save_raw(self, doc: Dict[str, Any], sha256: str):
+        """Сохраняет RawDocument и переносит тело страницы в ETL_BLOB_ROOT."""
+        data = dict(doc.get('data') or {})
+        # Старые выгрузки несут HTML в data['html_content'] вместо хранилища.
+        # Это пересериализованная страница, а sha256 — хеш исходного ответа:
+        # HTML сохраняется под собственным хешем, он записывается в body_sha256
+        html = data.pop('html_content', None)
+        copied = self.source_blobs is not None and self.blobs.copy_from(self.source_blobs, sha256)
+        if not copied and html:
+            data['body_sha256'] = self.blobs.put(html.encode('utf-8') if isinstance(html, str) else html)
+        elif not copied:
+            logger.warning(f"Тело {sha256} не найдено в хранилище краулера: {doc.get('source_url')}")
+        RawDocument.objects.get_or_create(
+            sha256=sha256,
+            defaults={'source_url': doc.get('source_url', ''), 'data': data},
+        )
+
     def _import_article(self, doc: Dict[str, Any], dry_run: bool):
         """Импортирует статью."""
         # Базовая реализация - нужно доработать под конкретную структуру данных
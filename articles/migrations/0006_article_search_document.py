@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:46
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+def populate_search_documents(apps, schema_editor):
+    """
+    Собирает поисковые документы для существующих статей (только Postgres).
+
+    Выражение зафиксировано на момент миграции: текущий
+    articles.search.document_vector ссылается на таблицы более поздних миграций.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from django.contrib.postgres.search import SearchVector
+
+    configs = {'ru': 'russian', 'kk': 'simple', 'en': 'english'}
+    fields = (('title', 'A'), ('keywords', 'B'), ('abstract', 'C'))
+    vector = None
+    for lang, config in configs.items():
+        for name, weight in fields:
+            part = SearchVector(f'{name}_{lang}', config=config, weight=weight)
+            vector = part if vector is None else vector + part
+    Article = apps.get_model('articles', 'Article')
+    Article.objects.update(search_document=vector)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0005_article_submission'),
+        ('issues', '0003_populate_issue_slugs'),
+        ('submissions', '0004_add_test_section'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='search_document',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый документ'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='article_search_doc_gin_idx'),
+        ),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+    ]
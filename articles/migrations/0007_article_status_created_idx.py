@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0006_article_search_document'),
+        ('issues', '0003_populate_issue_slugs'),
+        ('submissions', '0004_add_test_section'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['status', '-created_at', 'id'], name='article_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0007_article_status_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarArticle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Сходство')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_entries', to='articles.article', verbose_name='Статья')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='articles.article', verbose_name='Похожая статья')),
+            ],
+            options={
+                'verbose_name': 'Похожая статья',
+                'verbose_name_plural': 'Похожие статьи',
+                'ordering': ['article', '-score'],
+                'indexes': [models.Index(fields=['article', '-score'], name='similar_article_score_idx')],
+                'unique_together': {('article', 'similar')},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0008_similararticle'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['status', 'updated_at', 'id'], name='article_status_updated_idx'),
+        ),
+    ]
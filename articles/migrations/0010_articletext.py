@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0009_article_status_updated_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleText',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=500, verbose_name='Файл')),
+                ('sha256', models.CharField(blank=True, max_length=64, verbose_name='SHA-256')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('done', 'Извлечен'), ('failed', 'Ошибка')], db_index=True, default='pending', max_length=10, verbose_name='Статус')),
+                ('text', models.TextField(blank=True, verbose_name='Текст')),
+                ('pages', models.PositiveIntegerField(default=0, verbose_name='Страниц')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('extracted_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата извлечения')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='texts', to='articles.article', verbose_name='Статья')),
+                ('article_file', models.ForeignKey(blank=True, help_text='Пусто — основной PDF статьи', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='texts', to='articles.articlefile', verbose_name='Файл статьи')),
+            ],
+            options={
+                'verbose_name': 'Текст PDF',
+                'verbose_name_plural': 'Тексты PDF',
+                'constraints': [models.UniqueConstraint(fields=('article', 'source'), name='article_text_source_unique')],
+            },
+        ),
+    ]
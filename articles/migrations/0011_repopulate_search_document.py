@@ -0,0 +1,43 @@
+from django.db import migrations
+
+
+def populate_search_documents(apps, schema_editor):
+    """
+    Пересобирает поисковые документы вместе с текстом PDF (ArticleText
+    появляется в 0010). Выражение зафиксировано на момент миграции.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from django.contrib.postgres.aggregates import StringAgg
+    from django.contrib.postgres.search import SearchVector
+    from django.db.models import OuterRef, Subquery, Value
+    from django.db.models.functions import Coalesce
+
+    Article = apps.get_model('articles', 'Article')
+    ArticleText = apps.get_model('articles', 'ArticleText')
+    configs = {'ru': 'russian', 'kk': 'simple', 'en': 'english'}
+    fields = (('title', 'A'), ('keywords', 'B'), ('abstract', 'C'))
+    vector = None
+    for lang, config in configs.items():
+        for name, weight in fields:
+            part = SearchVector(f'{name}_{lang}', config=config, weight=weight)
+            vector = part if vector is None else vector + part
+    texts = (
+        ArticleText.objects.filter(article=OuterRef('pk'), status='done')
+        .order_by().values('article')
+        .annotate(text=StringAgg('text', delimiter=' '))
+        .values('text')
+    )
+    vector = vector + SearchVector(Coalesce(Subquery(texts), Value('')), config='simple', weight='D')
+    Article.objects.update(search_document=vector)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0010_articletext'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+    ]
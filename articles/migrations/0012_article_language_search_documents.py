@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:03
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def populate_language_documents(apps, schema_editor):
+    """
+    Заполняет документы по языкам и по тексту PDF. Выражения зафиксированы
+    на момент миграции.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from django.contrib.postgres.aggregates import StringAgg
+    from django.contrib.postgres.search import SearchVector
+    from django.db.models import OuterRef, Subquery, Value
+    from django.db.models.functions import Coalesce
+
+    Article = apps.get_model('articles', 'Article')
+    ArticleText = apps.get_model('articles', 'ArticleText')
+    configs = {'ru': 'russian', 'kk': 'simple', 'en': 'english'}
+    fields = (('title', 'A'), ('keywords', 'B'), ('abstract', 'C'))
+    vectors = {}
+    for lang, config in configs.items():
+        vector = None
+        for name, weight in fields:
+            part = SearchVector(f'{name}_{lang}', config=config, weight=weight)
+            vector = part if vector is None else vector + part
+        vectors[f'search_document_{lang}'] = vector
+    texts = (
+        ArticleText.objects.filter(article=OuterRef('pk'), status='done')
+        .order_by().values('article')
+        .annotate(text=StringAgg('text', delimiter=' '))
+        .values('text')
+    )
+    vectors['search_document_text'] = SearchVector(Coalesce(Subquery(texts), Value('')), config='simple', weight='D')
+    Article.objects.update(**vectors)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0011_repopulate_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='search_document_en',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый документ (en)'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='search_document_kk',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый документ (kk)'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='search_document_ru',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый документ (ru)'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='search_document_text',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый документ (текст PDF)'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document_ru'], name='article_search_ru_gin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document_kk'], name='article_search_kk_gin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document_en'], name='article_search_en_gin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document_text'], name='article_search_text_gin_idx'),
+        ),
+        migrations.RunPython(populate_language_documents, migrations.RunPython.noop),
+    ]
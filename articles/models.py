@@ -1,4 +1,6 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
 from django.utils.text import slugify
@@ -98,6 +100,14 @@ class Article(models.Model):
         ('en', 'Английский'),
     ])
     
+    # Поисковый документ (tsvector на Postgres), поддерживается articles.search:
+    # общий по всем языкам и отдельные по языкам полей и по тексту PDF
+    search_document = SearchVectorField("Поисковый документ", null=True, editable=False)
+    search_document_ru = SearchVectorField("Поисковый документ (ru)", null=True, editable=False)
+    search_document_kk = SearchVectorField("Поисковый документ (kk)", null=True, editable=False)
+    search_document_en = SearchVectorField("Поисковый документ (en)", null=True, editable=False)
+    search_document_text = SearchVectorField("Поисковый документ (текст PDF)", null=True, editable=False)
+    
     class Meta:
         verbose_name = "Статья"
         verbose_name_plural = "Статьи"
@@ -105,8 +115,17 @@ class Article(models.Model):
         indexes = [
             models.Index(fields=['slug']),
             models.Index(fields=['status', 'published_at']),
+            # keyset-пагинация списков в порядке (-created_at, id)
+            models.Index(fields=['status', '-created_at', 'id'], name='article_status_created_idx'),
+            # keyset-курсоры OAI-PMH в порядке (updated_at, id)
+            models.Index(fields=['status', 'updated_at', 'id'], name='article_status_updated_idx'),
             models.Index(fields=['issue', 'status']),
             models.Index(fields=['doi']),
+            GinIndex(fields=['search_document'], name='article_search_doc_gin_idx'),
+            GinIndex(fields=['search_document_ru'], name='article_search_ru_gin_idx'),
+            GinIndex(fields=['search_document_kk'], name='article_search_kk_gin_idx'),
+            GinIndex(fields=['search_document_en'], name='article_search_en_gin_idx'),
+            GinIndex(fields=['search_document_text'], name='article_search_text_gin_idx'),
         ]
 
     def __str__(self):
@@ -150,14 +169,20 @@ class Article(models.Model):
         return ', '.join([author.get_full_name() for author in self.authors.all()])
     
     def increment_views(self):
-        """Увеличивает счетчик просмотров."""
+        """
+        Увеличивает счетчик просмотров.
+        Хит буферизуется в articles.counters и пакетно записывается в БД позже,
+        значение на экземпляре обновляется сразу для текущего ответа.
+        """
+        from . import counters
+        counters.hit(self.pk, 'views')
         self.views += 1
-        self.save(update_fields=['views'])
     
     def increment_downloads(self):
-        """Увеличивает счетчик загрузок."""
+        """Увеличивает счетчик загрузок (см. increment_views)."""
+        from . import counters
+        counters.hit(self.pk, 'downloads')
         self.downloads += 1
-        self.save(update_fields=['downloads'])
     
     def get_pages_info(self):
         """Возвращает информацию о страницах."""
@@ -174,6 +199,20 @@ class Article(models.Model):
                 self.slug = f"{original_slug}-{counter}"
                 counter += 1
         super().save(*args, **kwargs)
+        
+        # Пересобираем поисковый документ и похожие статьи, если менялись индексируемые поля
+        from core import stats
+        from . import search, similarity
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or search.INDEXED_FIELDS.intersection(update_fields):
+            search.update_search_document([self.pk])
+        if update_fields is None or similarity.INDEXED_FIELDS.intersection(update_fields):
+            similarity.schedule_on_commit([self.pk])
+        if update_fields is None or 'status' in update_fields:
+            stats.invalidate_on_commit()
+        if update_fields is None or 'pdf_file' in update_fields:
+            from . import fulltext
+            fulltext.schedule_on_commit(self.pk)
     
     def get_absolute_url(self):
         """
@@ -143,4 +143,91 @@ class ArticleFile(models.Model):
     def get_absolute_url(self):
         """Возвращает URL для скачивания файла."""
         return reverse('core:file_download', kwargs={'pk': self.pk})
+    
+    def save(self, *args, **kwargs):
+        """После сохранения PDF ставится в очередь извлечения текста (articles.fulltext)."""
+        super().save(*args, **kwargs)
+        from . import fulltext
+        fulltext.schedule_on_commit(self.article_id)
+
+
 
+class SimilarArticle(models.Model):
+    """
+    Предрассчитанные похожие статьи (TF-IDF по ключевым словам и аннотациям).
+    Заполняется articles.similarity; для каждой статьи хранится top-k соседей.
+    """
+    article = models.ForeignKey(
+        Article,
+        on_delete=models.CASCADE,
+        related_name='similar_entries',
+        verbose_name="Статья"
+    )
+    similar = models.ForeignKey(
+        Article,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Похожая статья"
+    )
+    score = models.FloatField("Сходство")
+    
+    updated_at = models.DateTimeField("Дата обновления", auto_now=True)
+    
+    class Meta:
+        verbose_name = "Похожая статья"
+        verbose_name_plural = "Похожие статьи"
+        ordering = ['article', '-score']
+        unique_together = ('article', 'similar')
+        indexes = [
+            models.Index(fields=['article', '-score'], name='similar_article_score_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.article_id} ~ {self.similar_id} ({self.score:.3f})"
+
+
+class ArticleText(models.Model):
+    """
+    Текст, извлеченный из PDF статьи (Article.pdf_file или ArticleFile).
+    Ведется articles.fulltext; по sha256 файла неизмененные файлы не
+    обрабатываются повторно. Текст входит в поисковый индекс статьи.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает'),
+        ('done', 'Извлечен'),
+        ('failed', 'Ошибка'),
+    ]
+
+    article = models.ForeignKey(
+        Article,
+        on_delete=models.CASCADE,
+        related_name='texts',
+        verbose_name="Статья"
+    )
+    article_file = models.ForeignKey(
+        ArticleFile,
+        on_delete=models.CASCADE,
+        related_name='texts',
+        verbose_name="Файл статьи",
+        null=True,
+        blank=True,
+        help_text="Пусто — основной PDF статьи"
+    )
+    source = models.CharField("Файл", max_length=500)
+    sha256 = models.CharField("SHA-256", max_length=64, blank=True)
+    status = models.CharField("Статус", max_length=10, choices=STATUS_CHOICES, default='pending', db_index=True)
+    text = models.TextField("Текст", blank=True)
+    pages = models.PositiveIntegerField("Страниц", default=0)
+    error = models.TextField("Ошибка", blank=True)
+    extracted_at = models.DateTimeField("Дата извлечения", null=True, blank=True)
+    updated_at = models.DateTimeField("Дата обновления", auto_now=True)
+
+    class Meta:
+        verbose_name = "Текст PDF"
+        verbose_name_plural = "Тексты PDF"
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'source'], name='article_text_source_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.article_id}: {self.source} ({self.status})"
@@ -0,0 +1,95 @@
+"""
+Извлечение текста из PDF-файла.
+
+Модуль не импортирует Django: его функции выполняются в дочерних
+процессах пула articles.fulltext (контекст spawn). Текст извлекается
+через pypdf, если пакет установлен, иначе утилитой pdftotext (poppler).
+"""
+import hashlib
+import importlib
+import re
+import shutil
+import subprocess
+
+try:
+    import pypdf
+except ImportError:
+    # pypdf не установлен — используем pdftotext, если он есть в системе
+    pypdf = None
+
+_WHITESPACE = re.compile(r'[ \t\r\f\v]+')
+_BLANK_LINES = re.compile(r'\n\s*\n+')
+
+
+class ExtractionError(Exception):
+    """Текст из файла извлечь не удалось."""
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _pypdf_text(path):
+    try:
+        reader = pypdf.PdfReader(path)
+        pages = [page.extract_text() or '' for page in reader.pages]
+    except Exception as e:
+        raise ExtractionError(f'pypdf: {e}') from e
+    return '\n\n'.join(pages), len(pages)
+
+
+def _pdftotext_text(path, timeout=120):
+    try:
+        result = subprocess.run(
+            ['pdftotext', '-enc', 'UTF-8', '-q', str(path), '-'],
+            capture_output=True, timeout=timeout, check=True,
+        )
+    except (subprocess.SubprocessError, OSError) as e:
+        raise ExtractionError(f'pdftotext: {e}') from e
+    text = result.stdout.decode('utf-8', errors='replace')
+    # pdftotext разделяет страницы символом form feed
+    return text, text.count('\f') or 1
+
+
+def extract_text(path):
+    """(текст, число страниц) PDF-файла."""
+    if pypdf is not None:
+        return _pypdf_text(path)
+    if shutil.which('pdftotext'):
+        return _pdftotext_text(path)
+    raise ExtractionError('Нет средства извлечения текста: установите pypdf или poppler-utils (pdftotext)')
+
+
+def normalize(text, max_chars):
+    """Схлопывает пробелы, убирает NUL (недопустим в Postgres) и обрезает до max_chars."""
+    text = text.replace('\x00', '').replace('\f', '\n')
+    text = _WHITESPACE.sub(' ', text)
+    text = _BLANK_LINES.sub('\n\n', text).strip()
+    return text[:max_chars]
+
+
+def _import(path):
+    module, name = path.rsplit('.', 1)
+    return getattr(importlib.import_module(module), name)
+
+
+def run(path, known_sha256='', extractor=None, max_chars=2_000_000):
+    """
+    Задание пула: хэширует файл и, если хэш изменился, извлекает текст.
+
+    Args:
+        known_sha256: Хэш уже извлеченной версии файла
+        extractor: Путь к функции path -> (текст, страницы) вместо extract_text
+
+    Returns:
+        {'sha256', 'unchanged'} и, для измененного файла, {'text', 'pages'}.
+    """
+    sha256 = file_sha256(path)
+    if sha256 == known_sha256:
+        return {'sha256': sha256, 'unchanged': True}
+    text, pages = (_import(extractor) if extractor else extract_text)(path)
+    return {'sha256': sha256, 'unchanged': False, 'text': normalize(text, max_chars), 'pages': pages}
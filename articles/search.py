@@ -0,0 +1,123 @@
+"""
+Поисковый документ статьи.
+
+На Postgres у каждой статьи хранится поисковый документ (Article.search_document,
+tsvector с GIN индексом), собранный из названий, ключевых слов и аннотаций
+на трех языках со своей конфигурацией словаря, и текста ее PDF. Для поиска
+на одном языке рядом хранятся документы по полям каждого языка
+(search_document_<язык>) и по тексту PDF (search_document_text): общий
+документ не различает языки, и запрос на русском находил бы статью по
+английским словам. Документы обновляются при сохранении и публикации
+статьи и после извлечения текста. Сам поиск выполняют бэкенды core.search.
+"""
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.db import connection
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+# Конфигурации text search для языков журнала. Для казахского словаря
+# в Postgres нет, поэтому используем 'simple' (без стемминга).
+SEARCH_CONFIGS = {
+    'ru': 'russian',
+    'kk': 'simple',
+    'en': 'english',
+}
+
+# Поля, из которых собирается документ, и их веса в ранжировании
+DOCUMENT_FIELDS = (
+    ('title', 'A'),
+    ('keywords', 'B'),
+    ('abstract', 'C'),
+)
+
+# Поля Article с поисковыми документами: выгрузкам они не нужны (.defer)
+DOCUMENT_COLUMNS = (
+    'search_document', 'search_document_text',
+    *(f'search_document_{lang}' for lang in SEARCH_CONFIGS),
+)
+
+# Изменение этих полей требует пересборки документа
+INDEXED_FIELDS = frozenset(
+    f'{name}_{lang}' for name, _ in DOCUMENT_FIELDS for lang in SEARCH_CONFIGS
+)
+
+
+def is_supported():
+    """Хранимый документ поддерживается только на Postgres."""
+    return connection.vendor == 'postgresql'
+
+
+def _fulltext():
+    """Текст PDF статьи (ArticleText, см. articles.fulltext) одной строкой."""
+    from .models_extended import ArticleText
+    texts = (
+        ArticleText.objects.filter(article=OuterRef('pk'), status='done')
+        .order_by().values('article')
+        .annotate(text=StringAgg('text', delimiter=' '))
+        .values('text')
+    )
+    return Coalesce(Subquery(texts), Value(''))
+
+
+def language_vector(lang):
+    """SearchVector полей статьи на языке lang."""
+    vector = None
+    for name, weight in DOCUMENT_FIELDS:
+        part = SearchVector(f'{name}_{lang}', config=SEARCH_CONFIGS[lang], weight=weight)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def text_vector():
+    """SearchVector текста PDF (конфигурация 'simple': язык файла неизвестен)."""
+    return SearchVector(_fulltext(), config='simple', weight='D')
+
+
+def document_vector():
+    """
+    Выражение SearchVector для поискового документа статьи: поля статьи
+    на всех языках и с наименьшим весом — текст ее PDF.
+    """
+    vector = None
+    for lang in SEARCH_CONFIGS:
+        vector = language_vector(lang) if vector is None else vector + language_vector(lang)
+    return vector + text_vector()
+
+
+def document_vectors():
+    """Значения всех поисковых документов статьи для queryset.update()."""
+    vectors = {'search_document': document_vector(), 'search_document_text': text_vector()}
+    for lang in SEARCH_CONFIGS:
+        vectors[f'search_document_{lang}'] = language_vector(lang)
+    return vectors
+
+
+def update_search_document(pks):
+    """Пересобирает поисковые документы для статей с указанными pk."""
+    if not is_supported():
+        return 0
+    from .models import Article
+    return Article.objects.filter(pk__in=list(pks)).update(**document_vectors())
+
+
+def rebuild_search_documents():
+    """Пересобирает документы всех статей (после миграции или массового импорта)."""
+    if not is_supported():
+        return 0
+    from .models import Article
+    return Article.objects.update(**document_vectors())
+
+
+def build_query(query, language=None):
+    """
+    SearchQuery для строки пользователя.
+    Для конкретного языка — с его конфигурацией, иначе объединение по всем языкам.
+    """
+    configs = [SEARCH_CONFIGS[language]] if language in SEARCH_CONFIGS else list(SEARCH_CONFIGS.values())
+    search_query = None
+    for config in dict.fromkeys(configs):
+        part = SearchQuery(query, config=config, search_type='websearch')
+        search_query = part if search_query is None else search_query | part
+    return search_query
+
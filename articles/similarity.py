@@ -0,0 +1,260 @@
+"""
+Индекс похожих статей.
+
+Для каждой опубликованной статьи и каждого языка строится TF-IDF вектор
+по названию, ключевым словам (с повышенным весом, плюс каждая ключевая
+фраза целиком как отдельный терм) и аннотации. Сходство пары — косинус,
+итоговое — максимум по языкам. В SimilarArticle хранится top-k соседей
+каждой статьи, поэтому страница статьи читает их одним запросом по индексу.
+
+Полная пересборка — ``manage.py build_similar_articles``; при публикации
+и редактировании статьи списки обновляются инкрементально (refresh).
+refresh строит TF-IDF по всему архиву, поэтому из запроса он не
+вызывается: schedule ставит статьи в очередь согласно
+SIMILAR_ARTICLES_ON_SAVE — 'thread' (по умолчанию) обрабатывает очередь
+одним фоновым потоком процесса, объединяя накопившиеся статьи в один
+refresh, 'sync' — сразу (тесты), 'off' — только периодической командой.
+"""
+import logging
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Min
+
+from .search import DOCUMENT_FIELDS, INDEXED_FIELDS as SEARCH_INDEXED_FIELDS, SEARCH_CONFIGS
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'\w{3,}')
+KEYWORD_SPLIT_RE = re.compile(r'[,;]')
+KEYWORD_WEIGHT = 2
+# Термы, встречающиеся в большей доле документов, не несут информации о теме
+MAX_DF_RATIO = 0.5
+MIN_DOCUMENTS_FOR_DF_CUTOFF = 10
+MIN_SCORE = 0.05
+
+# Изменение этих полей требует пересчета соседей статьи
+INDEXED_FIELDS = SEARCH_INDEXED_FIELDS | {'status'}
+
+
+_queue_lock = threading.Lock()
+_queue = set()
+_worker = None
+
+
+def _top_k():
+    return getattr(settings, 'SIMILAR_ARTICLES_TOP_K', 5)
+
+
+def _mode():
+    return getattr(settings, 'SIMILAR_ARTICLES_ON_SAVE', 'thread')
+
+
+def _terms(article, lang):
+    """Частоты термов статьи на языке lang."""
+    title = getattr(article, f'title_{lang}') or ''
+    abstract = getattr(article, f'abstract_{lang}') or ''
+    keywords = getattr(article, f'keywords_{lang}') or ''
+
+    terms = Counter(TOKEN_RE.findall(f'{title} {abstract}'.lower()))
+    for phrase in KEYWORD_SPLIT_RE.split(keywords.lower()):
+        tokens = TOKEN_RE.findall(phrase)
+        if not tokens:
+            continue
+        terms[f"kw:{' '.join(tokens)}"] += KEYWORD_WEIGHT
+        for token in tokens:
+            terms[token] += KEYWORD_WEIGHT
+    return terms
+
+
+class Corpus:
+    """TF-IDF векторы опубликованных статей по языкам и инвертированный индекс по термам."""
+
+    def __init__(self, articles):
+        self.pks = []
+        self.vectors = {lang: {} for lang in SEARCH_CONFIGS}
+        self.postings = {lang: defaultdict(list) for lang in SEARCH_CONFIGS}
+
+        counts = {lang: {} for lang in SEARCH_CONFIGS}
+        for article in articles:
+            self.pks.append(article.pk)
+            for lang in SEARCH_CONFIGS:
+                terms = _terms(article, lang)
+                if terms:
+                    counts[lang][article.pk] = terms
+
+        for lang, documents in counts.items():
+            df = Counter()
+            for terms in documents.values():
+                df.update(terms.keys())
+            n = len(documents)
+            max_df = n * MAX_DF_RATIO if n >= MIN_DOCUMENTS_FOR_DF_CUTOFF else n
+
+            for pk, terms in documents.items():
+                vector = {
+                    term: (1 + math.log(tf)) * (math.log((n + 1) / (df[term] + 1)) + 1)
+                    for term, tf in terms.items()
+                    if df[term] <= max_df
+                }
+                norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+                if not norm:
+                    continue
+                vector = {term: weight / norm for term, weight in vector.items()}
+                self.vectors[lang][pk] = vector
+                for term, weight in vector.items():
+                    self.postings[lang][term].append((pk, weight))
+
+    def scores(self, pk):
+        """Косинусное сходство pk со всеми статьями, имеющими общие термы (максимум по языкам)."""
+        combined = {}
+        for lang, vectors in self.vectors.items():
+            vector = vectors.get(pk)
+            if not vector:
+                continue
+            lang_scores = defaultdict(float)
+            for term, weight in vector.items():
+                for other, other_weight in self.postings[lang][term]:
+                    if other != pk:
+                        lang_scores[other] += weight * other_weight
+            for other, score in lang_scores.items():
+                if score > combined.get(other, 0.0):
+                    combined[other] = score
+        return {other: score for other, score in combined.items() if score >= MIN_SCORE}
+
+    def neighbours(self, pk, k=None):
+        """top-k соседей статьи: список (pk, score) по убыванию сходства."""
+        ranked = sorted(self.scores(pk).items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:k or _top_k()]
+
+
+def load_corpus():
+    from .models import Article
+
+    fields = ['pk'] + [f'{name}_{lang}' for name, _ in DOCUMENT_FIELDS for lang in SEARCH_CONFIGS]
+    return Corpus(Article.objects.filter(status='published').only(*fields).iterator(chunk_size=500))
+
+
+def _replace(corpus, pks):
+    from .models_extended import SimilarArticle
+
+    SimilarArticle.objects.filter(article_id__in=pks).delete()
+    SimilarArticle.objects.bulk_create(
+        [
+            SimilarArticle(article_id=pk, similar_id=other, score=score)
+            for pk in pks
+            for other, score in corpus.neighbours(pk)
+        ],
+        batch_size=1000,
+    )
+
+
+def rebuild():
+    """Полная пересборка индекса. Возвращает число записанных пар."""
+    from .models_extended import SimilarArticle
+
+    corpus = load_corpus()
+    with transaction.atomic():
+        SimilarArticle.objects.all().delete()
+        _replace(corpus, corpus.pks)
+    return SimilarArticle.objects.count()
+
+
+def refresh(pks):
+    """
+    Инкрементально обновляет индекс после изменения статей pks.
+
+    Пересчитываются списки самих статей, списки, где они уже были соседями
+    (сходство могло упасть или статья снята с публикации), и списки, куда
+    они могут попасть по новому сходству. IDF берется по текущему корпусу;
+    накопленный дрейф устраняет периодическая полная пересборка.
+    """
+    from .models_extended import SimilarArticle
+
+    pks = set(pks)
+    if not pks:
+        return 0
+    corpus = load_corpus()
+    k = _top_k()
+
+    affected = set(pks)
+    affected.update(
+        SimilarArticle.objects.filter(similar_id__in=pks).values_list('article_id', flat=True)
+    )
+
+    candidates = {}
+    for pk in pks:
+        for other, score in corpus.scores(pk).items():
+            if other not in affected and score > candidates.get(other, 0.0):
+                candidates[other] = score
+    if candidates:
+        current = {
+            row['article_id']: row
+            for row in SimilarArticle.objects.filter(article_id__in=candidates)
+            .values('article_id').annotate(size=Count('pk'), lowest=Min('score'))
+        }
+        for other, score in candidates.items():
+            row = current.get(other)
+            if row is None or row['size'] < k or score > row['lowest']:
+                affected.add(other)
+
+    with transaction.atomic():
+        _replace(corpus, affected)
+    return len(affected)
+
+
+def _drain():
+    """Фоновый поток: обновляет статьи из очереди, пока она не опустеет."""
+    global _worker
+    try:
+        while True:
+            with _queue_lock:
+                if not _queue:
+                    _worker = None
+                    return
+                pks = set(_queue)
+                _queue.clear()
+            try:
+                refresh(pks)
+            except Exception as e:
+                logger.error(f"Ошибка обновления похожих статей для {sorted(pks)}: {e}")
+    finally:
+        with _queue_lock:
+            if _worker is threading.current_thread():
+                _worker = None
+        connection.close()
+
+
+def schedule(pks):
+    """Обновляет похожие статьи для pks согласно SIMILAR_ARTICLES_ON_SAVE."""
+    global _worker
+    pks = set(pks)
+    mode = _mode()
+    if not pks or mode == 'off':
+        return
+    if mode == 'sync':
+        refresh(pks)
+        return
+    with _queue_lock:
+        _queue.update(pks)
+        if _worker is not None:
+            # Работающий поток заберет их следующей порцией
+            return
+        _worker = threading.Thread(target=_drain, name='similar-articles', daemon=True)
+        _worker.start()
+
+
+def schedule_on_commit(pks):
+    """Планирует schedule после коммита транзакции; ошибки не ломают сохранение статьи."""
+    pks = list(pks)
+
+    def _schedule():
+        try:
+            schedule(pks)
+        except Exception as e:
+            logger.error(f"Ошибка обновления похожих статей для {pks}: {e}")
+
+    transaction.on_commit(_schedule)
@@ -1,3 +1,472 @@
-from django.test import TestCase
+import csv
+import io
+import shutil
+import tempfile
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from issues.models import Issue
+from articles.models import Article
+from articles import counters, export, fulltext, similarity
+from articles.models_extended import ArticleFile, ArticleText, SimilarArticle
+from core.search import get_backend
+
+
+class ArticleCountersTests(TestCase):
+    """Отложенная запись счетчиков просмотров и загрузок."""
+
+    def setUp(self):
+        cache.clear()
+        issue = Issue.objects.create(year=2025, number=1, title_ru="Выпуск", status='published')
+        self.article = Article.objects.create(
+            issue=issue,
+            title_ru="Статья",
+            abstract_ru="Аннотация",
+            keywords_ru="здоровье",
+            page_start=1,
+            page_end=10,
+            status='published',
+        )
+
+    def test_hits_are_buffered_until_flush(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.article.increment_views()
+            self.article.increment_views()
+            self.article.increment_downloads()
+        self.assertEqual(self.article.views, 2)
+
+        self.article.refresh_from_db()
+        self.assertEqual((self.article.views, self.article.downloads), (0, 0))
+        self.assertEqual(counters.pending(self.article.pk), {'views': 2, 'downloads': 1})
+
+        totals = counters.flush_all()
+        self.assertEqual(totals, {'articles': 1, 'views': 2, 'downloads': 1})
+        self.article.refresh_from_db()
+        self.assertEqual((self.article.views, self.article.downloads), (2, 1))
+        self.assertEqual(counters.pending(self.article.pk), {'views': 0, 'downloads': 0})
+
+    def test_flush_adds_to_existing_totals(self):
+        Article.objects.filter(pk=self.article.pk).update(views=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            counters.hit(self.article.pk, 'views', 5)
+        counters.flush([self.article.pk])
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.views, 15)
+
+    def test_concurrent_flush_waits_for_lock(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            counters.hit(self.article.pk, 'views', 3)
+        cache = counters._cache()
+        # Блокировку держит сброс в другом процессе
+        cache.add(counters.FLUSH_LOCK_KEY, 'other', counters.FLUSH_LOCK_TIMEOUT)
+        try:
+            self.assertEqual(counters.flush()['views'], 0)
+            self.assertIn(self.article.pk, counters._touched)
+            with self.assertRaises(TimeoutError):
+                counters.flush_all(wait=0)
+            self.assertEqual(counters.pending(self.article.pk)['views'], 3)
+        finally:
+            cache.delete(counters.FLUSH_LOCK_KEY)
+
+        self.assertEqual(counters.flush()['views'], 3)
+        self.assertEqual(counters.flush_all()['views'], 0)
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.views, 3)
+
+
+class ArticleSearchTests(TestCase):
+    """Поиск статей через бэкенд core.search (в тестах — SQLite FTS5)."""
+
+    def setUp(self):
+        issue = Issue.objects.create(year=2024, number=2, title_ru="Выпуск", status='published')
+        common = dict(issue=issue, abstract_ru="Аннотация", page_start=1, page_end=5, status='published')
+        self.health = Article.objects.create(
+            title_ru="Здоровье школьников", keywords_ru="школа", title_en="Pupils health", **common
+        )
+        self.other = Article.objects.create(title_ru="Питание", keywords_ru="диета", **common)
+
+    def test_search_articles_by_language(self):
+        qs = Article.objects.filter(status='published')
+        backend = get_backend()
+        self.assertEqual(list(backend.search_articles(qs, 'здоровье', 'ru')), [self.health])
+        self.assertEqual(list(backend.search_articles(qs, 'health', 'ru')), [])
+        self.assertEqual(list(backend.search_articles(qs, 'health', 'all')), [self.health])
+
+    def test_prefix_search_and_index_sync(self):
+        backend = get_backend()
+        qs = Article.objects.filter(status='published')
+        self.assertEqual(list(backend.search_articles(qs, 'здоров')), [self.health])
+
+        Article.objects.filter(pk=self.other.pk).update(title_ru="Здоровое питание")
+        self.assertEqual(set(backend.search_articles(qs, 'здоров')), {self.health, self.other})
+
+    def test_article_search_view(self):
+        response = self.client.get(reverse('articles:article_search'), {'q': 'диета'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['articles']), [self.other])
+
+    def test_postgres_language_query_uses_language_document(self):
+        from core.search.postgres import PostgresSearchBackend
+
+        # Только компиляция запроса: в тестах СУБД — SQLite
+        qs = Article.objects.filter(status='published')
+        sql = str(PostgresSearchBackend().search_articles(qs, 'health', 'ru').query)
+        self.assertIn('"search_document_ru" @@', sql)
+        self.assertIn('"search_document_text" @@', sql)
+        self.assertNotIn('"search_document" @@', sql)
+        sql = str(PostgresSearchBackend().search_articles(qs, 'health', 'all').query)
+        self.assertIn('"search_document" @@', sql)
+
+    @override_settings(SEARCH_MAX_RESULTS=1)
+    def test_total_is_not_capped_by_ranking(self):
+        Article.objects.filter(pk=self.other.pk).update(title_ru="Здоровое питание")
+        found = get_backend().search_articles(Article.objects.filter(status='published'), 'здоров')
+        self.assertEqual(found.count(), 2)
+        ranks = [article.rank for article in found]
+        self.assertIsNotNone(ranks[0])
+        self.assertIsNone(ranks[1])
+
+        response = self.client.get(reverse('articles:article_search'), {'q': 'здоров'})
+        self.assertEqual(response.context['total_found'], 2)
+        self.assertEqual(response.context['year_facets'][0]['count'], 2)
+
+    def test_rank_case_tree(self):
+        from django.db import connection
+        from core.search.sqlite import rank_case
+
+        ranks = [(pk, pk / 10) for pk in range(1, 200, 2)]
+        sql = rank_case('t.id', ranks, leaf_size=4)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"WITH RECURSIVE t(id) AS (SELECT 0 UNION ALL SELECT id + 1 FROM t WHERE id < 200) "
+                f"SELECT id, {sql} FROM t"
+            )
+            found = {pk: rank for pk, rank in cursor.fetchall() if rank is not None}
+        self.assertEqual(found, dict(ranks))
+        self.assertEqual(rank_case('t.id', []), 'NULL')
+
+    def test_triggers_restored_after_migrate(self):
+        from django.db import connection
+        from core.apps import restore_search_index
+
+        # Так выглядит таблица после пересоздания миграцией: триггеров нет
+        with connection.cursor() as cursor:
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f"DROP TRIGGER articles_article_fts_{suffix}")
+        Article.objects.filter(pk=self.other.pk).update(title_ru="Здоровое питание")
+        qs = Article.objects.filter(status='published')
+        self.assertEqual(list(get_backend().search_articles(qs, 'здоровое')), [])
+
+        restore_search_index(using='default')
+        self.assertEqual(list(get_backend().search_articles(qs, 'здоровое')), [self.other])
+        Article.objects.filter(pk=self.health.pk).update(title_ru="Здоровое детство")
+        self.assertEqual(set(get_backend().search_articles(qs, 'здоровое')), {self.health, self.other})
+
+
+class ArticleSearchPaginationTests(TestCase):
+    """Фасеты и keyset-пагинация в article_search."""
+
+    def setUp(self):
+        issue_2024 = Issue.objects.create(year=2024, number=1, title_ru="Выпуск", status='published')
+        issue_2025 = Issue.objects.create(year=2025, number=1, title_ru="Выпуск", status='published')
+        common = dict(abstract_ru="Аннотация", keywords_ru="тест", page_start=1, page_end=5, status='published')
+        self.articles = [
+            Article.objects.create(
+                issue=issue_2024 if i < 10 else issue_2025,
+                title_ru=f"Статья {i}",
+                language='en' if i % 2 else 'ru',
+                views=i,
+                **common
+            )
+            for i in range(15)
+        ]
+
+    def test_summary_and_facets(self):
+        response = self.client.get(reverse('articles:article_search'), {'q': 'статья'})
+        context = response.context
+        self.assertEqual(context['total_found'], 15)
+        self.assertEqual(context['total_views'], sum(range(15)))
+        self.assertEqual(len(context['articles']), 12)
+        self.assertEqual(
+            [(f['value'], f['count']) for f in context['year_facets']], [(2025, 5), (2024, 10)]
+        )
+        self.assertEqual(
+            {f['value']: f['count'] for f in context['language_facets']}, {'ru': 8, 'en': 7}
+        )
+        self.assertEqual(len(self.client.get(
+            reverse('articles:article_search'), {'q': 'статья', 'page': 2}
+        ).context['articles']), 3)
+
+    def test_keyset_pagination_without_query(self):
+        url = reverse('articles:article_search')
+        first = self.client.get(url).context
+        self.assertEqual(len(first['articles']), 12)
+        self.assertIsNotNone(first['next_cursor'])
+
+        second = self.client.get(url, {'after': first['next_cursor']}).context
+        self.assertIsNone(second['next_cursor'])
+        seen = [a.pk for a in first['articles']] + [a.pk for a in second['articles']]
+        self.assertEqual(sorted(seen), sorted(a.pk for a in self.articles))
+
+
+class SimilarArticlesTests(TestCase):
+    """Предрассчитанный индекс похожих статей."""
+
+    def setUp(self):
+        issue = Issue.objects.create(year=2023, number=1, title_ru="Выпуск", status='published')
+        common = dict(issue=issue, page_start=1, page_end=5, status='published')
+        self.nutrition = Article.objects.create(
+            title_ru="Питание школьников", keywords_ru="питание, школьники",
+            abstract_ru="Оценка рациона питания школьников", **common
+        )
+        self.diet = Article.objects.create(
+            title_ru="Рацион студентов", keywords_ru="питание, студенты",
+            abstract_ru="Рацион питания студентов вузов", **common
+        )
+        self.miners = Article.objects.create(
+            title_ru="Заболеваемость горнорабочих", keywords_ru="горнорабочие",
+            abstract_ru="Профессиональные заболевания шахтеров", **common
+        )
+
+    def test_rebuild_and_detail_lookup(self):
+        similarity.rebuild()
+        response = self.client.get(self.nutrition.get_absolute_url())
+        self.assertEqual(response.context['similar_articles'], [self.diet])
+
+    def test_refresh_after_unpublish(self):
+        similarity.rebuild()
+        Article.objects.filter(pk=self.diet.pk).update(status='draft')
+        similarity.refresh([self.diet.pk])
+        self.assertFalse(SimilarArticle.objects.filter(similar=self.diet).exists())
+        self.assertFalse(SimilarArticle.objects.filter(article=self.diet).exists())
+
+    def test_save_does_not_refresh_in_request(self):
+        similarity.rebuild()
+        self.diet.status = 'draft'
+        with override_settings(SIMILAR_ARTICLES_ON_SAVE='off'), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.diet.save()
+        self.assertTrue(SimilarArticle.objects.filter(similar=self.diet).exists())
+
+        with override_settings(SIMILAR_ARTICLES_ON_SAVE='sync'), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.diet.save()
+        self.assertFalse(SimilarArticle.objects.filter(similar=self.diet).exists())
+
+
+class MetadataExportTests(TestCase):
+    """Потоковая выгрузка метаданных: форматы, выбор статей, доступ."""
+
+    def setUp(self):
+        self.issue = Issue.objects.create(year=2025, number=1, title_ru="Выпуск", status='published')
+        other = Issue.objects.create(year=2025, number=2, title_ru="Выпуск 2", status='published')
+        self.author = get_user_model().objects.create_user(
+            username='author', password='x', first_name='Иван', last_name='Петров',
+        )
+        self.articles = []
+        for i, issue in enumerate([self.issue, self.issue, other]):
+            article = Article.objects.create(
+                issue=issue, title_ru=f"Статья {i} & co", abstract_ru="Аннотация", keywords_ru="здоровье, питание",
+                page_start=i * 10 + 1, page_end=i * 10 + 9, status='published', doi=f'10.1234/jhd.{i}' if i else '',
+            )
+            article.authors.add(self.author)
+            self.articles.append(article)
+
+    def _export(self, fmt, **kwargs):
+        return ''.join(export.export(fmt, export.select_articles(**kwargs)))
+
+    def test_crossref_groups_by_issue_and_skips_missing_doi(self):
+        from xml.etree import ElementTree
+
+        root = ElementTree.fromstring(self._export('crossref'))
+        ns = {'cr': 'http://www.crossref.org/schema/5.3.1'}
+        journals = root.findall('cr:body/cr:journal', ns)
+        self.assertEqual(len(journals), 2)
+        self.assertEqual(
+            [e.text for e in root.iter('{http://www.crossref.org/schema/5.3.1}doi')],
+            ['10.1234/jhd.1', '10.1234/jhd.2'],
+        )
+        self.assertEqual(root.find('.//cr:person_name/cr:surname', ns).text, 'Петров')
+
+    def test_text_formats(self):
+        rows = list(csv.reader(io.StringIO(self._export('csv', issue_ids=[self.issue.pk]))))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1][rows[0].index('authors')], 'Петров Иван')
+
+        bib = self._export('bibtex', pk_from=self.articles[1].pk)
+        self.assertEqual(bib.count('@article{'), 2)
+        self.assertIn('Статья 1 \\& co', bib)
+        self.assertIn('author = {Петров, Иван}', bib)
+
+        ris = self._export('ris', pk_to=self.articles[0].pk)
+        self.assertEqual(ris.count('TY  - JOUR'), 1)
+        self.assertIn('KW  - питание\r\n', ris)
+
+    def test_queries_do_not_grow_with_articles(self):
+        with self.assertNumQueries(3):
+            self._export('jats')
+
+    def test_endpoint_is_editor_only(self):
+        url = reverse('articles:metadata_export')
+        self.client.force_login(self.author)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        editor = get_user_model().objects.create_user(username='editor', password='x', role='editor')
+        self.client.force_login(editor)
+        response = self.client.get(url, {'format': 'ris', 'issue': self.issue.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertEqual(b''.join(response.streaming_content).count(b'ER  - '), 2)
+        self.assertEqual(self.client.get(url, {'format': 'docx'}).status_code, 400)
+
+
+EXTRACTED = []
+
+
+def fake_pdf_text(path):
+    """Извлечение для тестов: «PDF» — это текстовый файл."""
+    EXTRACTED.append(path)
+    with open(path, encoding='utf-8') as f:
+        return f.read(), 1
+
+
+@override_settings(PDF_TEXT_ON_UPLOAD='sync', PDF_TEXT_EXTRACTOR='articles.tests.fake_pdf_text')
+class PdfTextTests(TestCase):
+    """Извлечение текста PDF: загрузка, пропуск по sha256, поиск."""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        EXTRACTED.clear()
+        issue = Issue.objects.create(year=2025, number=1, title_ru="Выпуск", status='published')
+        self.article = Article.objects.create(
+            issue=issue, title_ru="Статья", abstract_ru="Аннотация", keywords_ru="здоровье",
+            page_start=1, page_end=2, status='published',
+        )
+
+    def _upload(self, content, name='full.pdf'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ArticleFile.objects.create(
+                article=self.article, kind='pdf', original_name=name, content_type='application/pdf',
+                file=SimpleUploadedFile(name, content.encode('utf-8')),
+            )
+
+    def test_upload_extracts_text_into_search(self):
+        self._upload("Полный текст про  гипертонию\x00 и питание")
+        text = ArticleText.objects.get(article=self.article)
+        self.assertEqual(text.status, 'done')
+        self.assertEqual(text.text, "Полный текст про гипертонию и питание")
+        self.assertEqual(len(text.sha256), 64)
+
+        backend = get_backend()
+        found = backend.search_articles(Article.objects.filter(status='published'), 'гипертонию')
+        self.assertEqual([a.pk for a in found], [self.article.pk])
+
+    def test_unchanged_files_are_skipped(self):
+        self._upload("текст")
+        rows = fulltext.candidates(verify=True)
+        self.assertEqual(fulltext.process(rows, workers=0), {'extracted': 0, 'unchanged': 1, 'failed': 0})
+        self.assertEqual(len(EXTRACTED), 1)
+
+    def test_backfill_resumes_pending_and_retries_failed(self):
+        with override_settings(PDF_TEXT_ON_UPLOAD='off'):
+            first = self._upload("первый", 'a.pdf')
+            self._upload("второй", 'b.pdf')
+        self.assertEqual(fulltext.sync(Article.objects.all()), {'created': 2, 'deleted': 0})
+        # «Сбой» после первого файла: второй остался pending
+        fulltext.process(fulltext.candidates().filter(article_file=first), workers=0)
+        second = ArticleFile.objects.get(original_name='b.pdf')
+        self.assertEqual(list(fulltext.candidates().values_list('source', flat=True)), [second.file.name])
+
+        broken = ArticleText.objects.get(article_file=first)
+        broken.status, broken.sha256 = 'failed', ''
+        broken.save()
+        call_command('extract_pdf_text', workers=0, retry_failed=True, stdout=io.StringIO())
+        self.assertEqual(set(ArticleText.objects.values_list('status', flat=True)), {'done'})
+
+        first.delete()
+        self.assertEqual(fulltext.sync(Article.objects.all()), {'created': 0, 'deleted': 0})
+        self.assertEqual(ArticleText.objects.count(), 1)
+
+    def test_missing_file_is_failed(self):
+        self._upload("текст")
+        text = ArticleText.objects.get()
+        default_storage.delete(text.source)
+        fulltext.process(fulltext.candidates(verify=True), workers=0)
+        text.refresh_from_db()
+        self.assertEqual(text.status, 'failed')
+        self.assertTrue(text.error)
+
+
+class ImportJhdBlobTests(TestCase):
+    """import_jhd: тела страниц из хранилища краулера переносятся в ETL_BLOB_ROOT."""
+
+    def setUp(self):
+        from etl.blobstore import BlobStore
+        from etl.util import JSONLWriter
+
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        settings_override = override_settings(ETL_BLOB_ROOT=f'{self.tmp}/store')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.body = '<html><body><h1>Статья</h1></body></html>'.encode('utf-8')
+        self.sha256 = BlobStore(f'{self.tmp}/crawl/blobs').put(self.body)
+        self.source = f'{self.tmp}/crawl/raw.jsonl.gz'
+        with JSONLWriter(self.source) as writer:
+            for _ in range(2):
+                # Повтор записи после возобновления обхода
+                writer.write({
+                    'source_url': 'https://jhdkz.org/index.php/jhd/article/view/1',
+                    'sha256': self.sha256, 'doc_type': 'article', 'data': {'title': 'Статья'},
+                })
+
+    def test_import_stores_body_once(self):
+        from core.models_extended import RawDocument
+
+        call_command('import_jhd', source=self.source, stdout=io.StringIO())
+        raw = RawDocument.objects.get()
+        self.assertEqual(raw.sha256, self.sha256)
+        self.assertNotIn('html_content', raw.data)
+        self.assertEqual(raw.read_body(), self.body)
+
+        out = io.StringIO()
+        call_command('import_jhd', source=self.source, stdout=out)
+        self.assertIn('Пропущено: 2', out.getvalue())
+        self.assertEqual(RawDocument.objects.count(), 1)
+
+    def test_legacy_html_content_moved_to_store(self):
+        from core.models_extended import RawDocument
+        from etl.util import JSONLWriter, calculate_sha256
+
+        html = '<html><body><p>Старая выгрузка</p></body></html>'
+        # sha256 записи — хеш исходного ответа (в cp1251), а не HTML из выгрузки
+        sha256 = calculate_sha256(html.encode('cp1251'))
+        source = f'{self.tmp}/legacy/raw.jsonl'
+        with JSONLWriter(source) as writer:
+            writer.write({
+                'source_url': 'https://jhdkz.org/index.php/jhd/article/view/2', 'sha256': sha256,
+                'doc_type': 'article', 'data': {'title': 'Старая', 'html_content': html},
+            })
+        call_command('import_jhd', source=source, stdout=io.StringIO())
+        raw = RawDocument.objects.get()
+        body_sha256 = calculate_sha256(html.encode('utf-8'))
+        self.assertEqual(raw.data, {'title': 'Старая', 'body_sha256': body_sha256})
+        self.assertEqual(raw.read_body(), html.encode('utf-8'))
+        # Под ключом исходного ответа в хранилище ничего не записано
+        self.assertNotIn(sha256, RawDocument.blob_store())
+
+    def test_dry_run_creates_no_directories(self):
+        call_command('import_jhd', source=self.source, dry_run=True, stdout=io.StringIO())
+        self.assertFalse(Path(f'{self.tmp}/store').exists())
@@ -13,6 +13,9 @@ urlpatterns = [
     # Создание статьи перенаправляет на workflow подачи
     path('create/', views.article_create_redirect, name='article_create'),
     
+    # Выгрузка метаданных для редакторов (должно быть перед детальными страницами)
+    path('export/', views.metadata_export, name='metadata_export'),
+    
     # Статьи автора (должно быть перед детальными страницами)
     path('author/<int:author_id>/', views.author_articles, name='author_articles'),
     
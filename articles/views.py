@@ -1,14 +1,25 @@
+from datetime import datetime
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.generic import ListView, DetailView
 from django.db import models
-from django.db.models import Q, Sum, Count
-from django.http import HttpResponse
+from django.core.paginator import Paginator
+from django.db.models import Q, Sum, Count, Max, Func, IntegerField, Subquery
+from django.http import HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from .models import Article
+from django.utils.decorators import method_decorator
+from .models import Article, Section
+from .models_extended import SimilarArticle
 from issues.models import Issue
+from core.search import get_backend
+from core.downloads import serve_file, is_new_download
+from core.stats import site_statistics
+from core.pagecache import cache_anonymous_page, remember, tag
+from core.conditional import conditional_page, deleted_at, latest
+from . import counters, export
 
 User = get_user_model()
 
@@ -26,14 +37,7 @@ class ArticleListView(ListView):
         context = super().get_context_data(**kwargs)
         
         # Статистика
-        context['total_articles'] = Article.objects.filter(status='published').count()
-        context['total_views'] = Article.objects.filter(status='published').aggregate(
-            total_views=Sum('views')
-        )['total_views'] or 0
-        context['total_downloads'] = Article.objects.filter(status='published').aggregate(
-            total_downloads=Sum('downloads')
-        )['total_downloads'] or 0
-        context['total_authors'] = User.objects.filter(role='author').count()
+        context.update(site_statistics())
         
         # Годы для фильтрации
         context['years'] = Issue.objects.filter(
@@ -42,6 +46,47 @@ class ArticleListView(ListView):
         
         return context
 
+
+def _count_cached_view(request, meta):
+    """Страница статьи отдана из кэша — просмотр все равно учитывается."""
+    if 'article' in meta:
+        counters.hit(meta['article'], 'views')
+
+
+def _article_lookup(request, slug=None, pk=None):
+    """Статьи по параметрам URL (как в ArticleDetailView.get_object); анонимам — только опубликованные."""
+    articles = Article.objects.all()
+    if not request.user.is_authenticated:
+        articles = articles.filter(status='published')
+    if slug:
+        lookup = Q(slug=slug)
+        if slug.isdigit():
+            lookup |= Q(pk=int(slug))
+        return articles.filter(lookup)
+    return articles.filter(pk=pk)
+
+
+def _article_last_modified(request, slug=None, pk=None):
+    stats = _article_lookup(request, slug, pk).aggregate(
+        article=Max('updated_at'),
+        issue=Max('issue__updated_at'),
+        similar=Max('similar_entries__updated_at'),
+    )
+    if stats['article'] is None:
+        return None
+    return latest(*stats.values(), deleted_at(Article, Issue))
+
+
+def _count_not_modified_view(request, slug=None, pk=None):
+    """Ответ 304 — браузер показал сохраненную страницу, просмотр учитываем."""
+    for article_pk in _article_lookup(request, slug, pk).filter(status='published').values_list('pk', flat=True)[:1]:
+        counters.hit(article_pk, 'views')
+
+
+@method_decorator([
+    conditional_page(_article_last_modified, on_not_modified=_count_not_modified_view),
+    cache_anonymous_page(on_hit=_count_cached_view),
+], name='dispatch')
 class ArticleDetailView(DetailView):
     """
     Детальная страница статьи.
@@ -118,23 +163,21 @@ class ArticleDetailView(DetailView):
         return obj
     
     def get_context_data(self, **kwargs):
+        tag(self.request, f'article:{self.object.pk}', f'issue:{self.object.issue_id}')
         context = super().get_context_data(**kwargs)
         
         # Увеличиваем счетчик просмотров только для опубликованных статей
         if self.object.status == 'published':
             self.object.increment_views()
+            remember(self.request, article=self.object.pk)
         
-        # Похожие статьи (только опубликованные)
-        similar_articles = Article.objects.filter(
-            status='published'
-        ).exclude(
-            pk=self.object.pk
-        ).filter(
-            Q(issue=self.object.issue) | 
-            Q(authors__in=self.object.authors.all())
-        ).distinct()[:3]
+        # Похожие статьи: предрассчитанный индекс (articles.similarity), один запрос по индексу
+        similar_entries = SimilarArticle.objects.filter(
+            article=self.object,
+            similar__status='published',
+        ).select_related('similar__issue').prefetch_related('similar__authors').order_by('-score')[:3]
         
-        context['similar_articles'] = similar_articles
+        context['similar_articles'] = [entry.similar for entry in similar_entries]
         context['can_view_draft'] = (
             self.request.user.is_authenticated and 
             self.request.user.role == 'author' and 
@@ -142,89 +185,191 @@ class ArticleDetailView(DetailView):
         )
         return context
 
+SEARCH_PAGE_SIZE = 12
+
+
+class CountDistinct(Func):
+    """COUNT(DISTINCT ...) без GROUP BY — для скалярного подзапроса."""
+    template = 'COUNT(DISTINCT %(expressions)s)'
+    output_field = IntegerField()
+
+
+def _search_summary(articles, years, sections):
+    """
+    Итоги и фасеты по найденным статьям одним агрегирующим запросом:
+    количество, просмотры, загрузки, уникальные авторы и число статей
+    по годам, языкам и разделам.
+    """
+    authors = Article.authors.through.objects.filter(
+        article_id__in=articles.order_by().values('pk')
+    ).annotate(total=CountDistinct('user_id')).values('total')
+
+    aggregates = {
+        'total': Count('pk'),
+        'total_views': Sum('views'),
+        'total_downloads': Sum('downloads'),
+        # Некоррелированный подзапрос СУБД вычисляет один раз
+        'unique_authors': Max(Subquery(authors, output_field=IntegerField())),
+    }
+    for year in years:
+        aggregates[f'year_{year}'] = Count('pk', filter=Q(issue__year=year))
+    for code, _ in Article._meta.get_field('language').choices:
+        aggregates[f'language_{code}'] = Count('pk', filter=Q(language=code))
+    for section in sections:
+        aggregates[f'section_{section.pk}'] = Count('pk', filter=Q(section_id=section.pk))
+
+    stats = articles.order_by().aggregate(**aggregates)
+    return {
+        'total': stats['total'],
+        'total_views': stats['total_views'] or 0,
+        'total_downloads': stats['total_downloads'] or 0,
+        'unique_authors': stats['unique_authors'] or 0,
+        'year_facets': [
+            {'value': year, 'label': year, 'count': stats[f'year_{year}']}
+            for year in years if stats[f'year_{year}']
+        ],
+        'language_facets': [
+            {'value': code, 'label': label, 'count': stats[f'language_{code}']}
+            for code, label in Article._meta.get_field('language').choices
+            if stats[f'language_{code}']
+        ],
+        'section_facets': [
+            {'value': section.pk, 'label': section.title_ru, 'count': stats[f'section_{section.pk}']}
+            for section in sections if stats[f'section_{section.pk}']
+        ],
+    }
+
+
+def _encode_cursor(article):
+    return f"{article.created_at.isoformat()}_{article.pk}"
+
+
+def _decode_cursor(value):
+    """Разбирает курсор keyset-пагинации; при ошибке возвращает None (первая страница)."""
+    try:
+        created_at, pk = value.rsplit('_', 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _keyset_page(articles, cursor, size):
+    """
+    Страница статей в порядке (-created_at, id) после курсора.
+    Не использует OFFSET, поэтому глубокие страницы не дороже первой.
+    """
+    position = _decode_cursor(cursor) if cursor else None
+    if position:
+        created_at, pk = position
+        articles = articles.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, pk__gt=pk)
+        )
+    page = list(articles.order_by('-created_at', 'id')[:size + 1])
+    next_cursor = _encode_cursor(page[size - 1]) if len(page) > size else None
+    return page[:size], next_cursor
+
+
 def article_search(request):
-    """Поиск статей."""
+    """
+    Поиск статей.
+    Результаты с запросом сортируются по релевантности и разбиваются на страницы
+    (?page=N), без запроса — хронологически с keyset-пагинацией (?after=<курсор>).
+    """
     query = request.GET.get('q', '')
     language = request.GET.get('language', 'ru')
     year = request.GET.get('year', '')
     article_language = request.GET.get('article_language', '')
+    section = request.GET.get('section', '')
     
-    articles = Article.objects.filter(status='published').select_related('issue').prefetch_related('authors')
+    articles = Article.objects.filter(status='published')
     
     if query:
-        # Поиск по названию, аннотации и ключевым словам
-        if language == 'ru':
-            articles = articles.filter(
-                Q(title_ru__icontains=query) |
-                Q(abstract_ru__icontains=query) |
-                Q(keywords_ru__icontains=query)
-            )
-        elif language == 'kk':
-            articles = articles.filter(
-                Q(title_kk__icontains=query) |
-                Q(abstract_kk__icontains=query) |
-                Q(keywords_kk__icontains=query)
-            )
-        elif language == 'en':
-            articles = articles.filter(
-                Q(title_en__icontains=query) |
-                Q(abstract_en__icontains=query) |
-                Q(keywords_en__icontains=query)
-            )
-        else:
-            # Поиск по всем языкам
-            articles = articles.filter(
-                Q(title_ru__icontains=query) | Q(title_kk__icontains=query) | Q(title_en__icontains=query) |
-                Q(abstract_ru__icontains=query) | Q(abstract_kk__icontains=query) | Q(abstract_en__icontains=query) |
-                Q(keywords_ru__icontains=query) | Q(keywords_kk__icontains=query) | Q(keywords_en__icontains=query)
-            )
+        # Полнотекстовый поиск по названию, аннотации и ключевым словам
+        # (ru/kk/en — конкретный язык, иначе все языки), с ранжированием
+        articles = get_backend().search_articles(articles, query, language)
     
     # Фильтр по году выпуска
-    if year:
+    if year.isdigit():
         articles = articles.filter(issue__year=year)
     
     # Фильтр по языку статьи
     if article_language:
         articles = articles.filter(language=article_language)
     
-    # Сортировка по дате создания
-    articles = articles.order_by('-created_at')
+    # Фильтр по разделу
+    if section.isdigit():
+        articles = articles.filter(section_id=section)
+    
+    # Годы и разделы для фильтрации
+    years = list(Issue.objects.filter(status='published').values_list('year', flat=True).distinct().order_by('-year'))
+    sections = list(Section.objects.filter(is_active=True)) if Section else []
     
-    # Статистика поиска
-    total_views = articles.aggregate(total_views=Sum('views'))['total_views'] or 0
-    total_downloads = articles.aggregate(total_downloads=Sum('downloads'))['total_downloads'] or 0
-    unique_authors = articles.values('authors').distinct().count()
+    # Статистика поиска и фасеты
+    summary = _search_summary(articles, years, sections)
     
-    # Годы для фильтрации
-    years = Issue.objects.filter(status='published').values_list('year', flat=True).distinct().order_by('-year')
+    # Параметры фильтров для ссылок пагинации
+    params = request.GET.copy()
+    params.pop('page', None)
+    params.pop('after', None)
+    
+    articles = articles.select_related('issue').prefetch_related('authors')
+    page_obj = None
+    next_cursor = None
+    if query:
+        paginator = Paginator(articles, SEARCH_PAGE_SIZE)
+        # Общее число уже посчитано агрегатом — не делаем отдельный COUNT
+        paginator.count = summary['total']
+        page_obj = paginator.get_page(request.GET.get('page'))
+        page_articles = page_obj.object_list
+    else:
+        page_articles, next_cursor = _keyset_page(articles, request.GET.get('after'), SEARCH_PAGE_SIZE)
     
     context = {
-        'articles': articles,
+        'articles': page_articles,
+        'page_obj': page_obj,
+        'is_paginated': page_obj is not None and page_obj.has_other_pages(),
+        'next_cursor': next_cursor,
+        'is_continued': bool(request.GET.get('after')),
+        'filter_query': params.urlencode(),
         'query': query,
         'language': language,
         'selected_year': year,
         'selected_article_language': article_language,
+        'selected_section': section,
         'years': years,
-        'total_views': total_views,
-        'total_downloads': total_downloads,
-        'unique_authors': unique_authors,
+        'total_found': summary['total'],
+        'total_views': summary['total_views'],
+        'total_downloads': summary['total_downloads'],
+        'unique_authors': summary['unique_authors'],
+        'year_facets': summary['year_facets'],
+        'language_facets': summary['language_facets'],
+        'section_facets': summary['section_facets'],
     }
     
     return render(request, 'articles/article_search.html', context)
 
 def article_download(request, pk):
-    """Загрузка PDF статьи."""
+    """
+    Загрузка PDF статьи.
+    Потоковая отдача с поддержкой Range и условных GET (см. core.downloads).
+    """
     article = get_object_or_404(Article, pk=pk, status='published')
     
-    # Увеличиваем счетчик загрузок
-    article.increment_downloads()
-    
-    if article.pdf_file:
-        response = HttpResponse(article.pdf_file, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{article.get_title()}.pdf"'
-        return response
-    else:
+    if not article.pdf_file:
         return HttpResponse("PDF файл не найден", status=404)
+    
+    response = serve_file(
+        request,
+        article.pdf_file,
+        content_type='application/pdf',
+        filename=f"{article.get_title()}.pdf",
+    )
+    
+    # Увеличиваем счетчик загрузок (повторные Range-запросы просмотрщика не считаем)
+    if is_new_download(request, response):
+        article.increment_downloads()
+    
+    return response
 
 def author_articles(request, author_id):
     """Статьи конкретного автора."""
@@ -241,6 +386,35 @@ def author_articles(request, author_id):
     return render(request, 'articles/author_articles.html', context)
 
 
+def _is_editor(user):
+    return user.is_authenticated and (user.is_editor() or user.is_staff)
+
+
+@login_required
+@user_passes_test(_is_editor)
+def metadata_export(request):
+    """
+    Выгрузка метаданных для редакторов (см. articles.export).
+    ?format=crossref|jats|csv|bibtex|ris, ?issue=<id> (можно повторять),
+    ?from=<id>&to=<id> — диапазон статей.
+    """
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in export.FORMATS:
+        return HttpResponseBadRequest("Неизвестный формат")
+    try:
+        issue_ids = [int(value) for value in request.GET.getlist('issue')]
+        pk_from = int(request.GET['from']) if request.GET.get('from') else None
+        pk_to = int(request.GET['to']) if request.GET.get('to') else None
+    except ValueError:
+        return HttpResponseBadRequest("Неверные параметры выгрузки")
+
+    articles = export.select_articles(issue_ids=issue_ids, pk_from=pk_from, pk_to=pk_to)
+    _, content_type, extension = export.FORMATS[fmt]
+    response = StreamingHttpResponse(export.export(fmt, articles), content_type=f'{content_type}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="jhdkz-{fmt}.{extension}"'
+    return response
+
+
 @login_required
 def article_create_redirect(request):
     """Направляем авторов в единый workflow подачи (submissions:create)."""
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
 from .models import SiteSettings, Page, Contact, News, Redirect, EditorialTeam
-from .models_extended import NewsLocale, PageLocale, Event, RawDocument, Affiliation
+from .models_extended import NewsLocale, PageLocale, Event, EventDailyStat, RawDocument, Affiliation
 
 @admin.register(SiteSettings)
 class SiteSettingsAdmin(admin.ModelAdmin):
@@ -236,6 +236,21 @@ class EventAdmin(admin.ModelAdmin):
     date_hierarchy = 'timestamp'
 
 
+@admin.register(EventDailyStat)
+class EventDailyStatAdmin(admin.ModelAdmin):
+    """Админка суточной статистики событий (только просмотр, заполняется rollup_events)."""
+    list_display = ('day', 'object_type', 'object_id', 'kind', 'count', 'unique_ips')
+    list_filter = ('object_type', 'kind', 'day')
+    ordering = ('-day',)
+    date_hierarchy = 'day'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(RawDocument)
 class RawDocumentAdmin(admin.ModelAdmin):
     """Админка для сырых документов ETL."""
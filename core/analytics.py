@@ -0,0 +1,195 @@
+"""
+Агрегация и хранение журнала событий (Event).
+
+rollup() — инкрементальный пересчет суточных итогов EventDailyStat:
+обрабатываются только события с id больше отметки 'event_rollup'
+(события пишутся пакетами с опозданием, поэтому отметка — id, а не
+время). Отметка отстает на EVENTS_ROLLUP_SETTLE секунд: транзакция,
+получившая меньший id, может закоммититься позже большего, и отметка по
+текущему максимуму пропустила бы ее события навсегда. Поэтому rollup
+запоминает максимальный id ('event_rollup_seen') и доходит до него
+только при запуске, который наступил не раньше чем через
+EVENTS_ROLLUP_SETTLE секунд, — к этому времени все транзакции с
+меньшими id завершены. Для затронутых дней итоги пересчитываются
+целиком по сырым событиям, так что повторный запуск идемпотентен, а
+число уникальных IP остается точным.
+
+prune() — политика хранения: события старше N дней, уже учтенные
+в итогах, пишутся в сжатые JSONL-архивы по месяцам и удаляются
+пакетами. Файл пакета называется по месяцу и первому id пакета
+(events-YYYY-MM-<id>.jsonl.gz) и записывается атомарно, поэтому после
+сбоя между записью архива и удалением повторный запуск перезаписывает
+тот же файл, а не дублирует события.
+"""
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime, time, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models_extended import Event, EventDailyStat, Watermark
+
+ROLLUP_WATERMARK = 'event_rollup'
+SEEN_WATERMARK = 'event_rollup_seen'
+ARCHIVE_FIELDS = ('id', 'object_type', 'object_id', 'kind', 'ip', 'user_agent', 'referer', 'timestamp')
+
+
+def _day_bounds(first_day, last_day):
+    """Начало first_day и конец last_day в текущем часовом поясе."""
+    start = timezone.make_aware(datetime.combine(first_day, time.min))
+    end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time.min))
+    return start, end
+
+
+def _settle():
+    return getattr(settings, 'EVENTS_ROLLUP_SETTLE', 60)
+
+
+def _upper(watermark, settle):
+    """Верхняя граница id для rollup: максимум, замеченный не меньше settle секунд назад."""
+    current = Event.objects.aggregate(last=Max('pk'))['last'] or 0
+    if settle <= 0:
+        return current
+    seen, _ = Watermark.objects.get_or_create(name=SEEN_WATERMARK)
+    upper = watermark.value
+    if seen.value > upper and seen.updated_at <= timezone.now() - timedelta(seconds=settle):
+        upper = seen.value
+    if seen.value <= upper:
+        # Предыдущий замер учтен (или его не было) — замечаем новый максимум
+        seen.value = current
+        seen.save(update_fields=['value', 'updated_at'])
+    return upper
+
+
+def rollup(settle=None):
+    """
+    Учитывает новые события в EventDailyStat.
+
+    Args:
+        settle: Отставание отметки в секундах (по умолчанию
+            EVENTS_ROLLUP_SETTLE); 0 — до текущего максимального id
+
+    Returns:
+        Словарь {'events': n, 'days': n, 'rows': n}: новых событий,
+        пересчитанных дней и записанных строк итогов.
+    """
+    watermark, _ = Watermark.objects.get_or_create(name=ROLLUP_WATERMARK)
+    upper = _upper(watermark, _settle() if settle is None else settle)
+    new_events = Event.objects.filter(pk__gt=watermark.value, pk__lte=upper)
+    if upper <= watermark.value:
+        return {'events': 0, 'days': 0, 'rows': 0}
+
+    days = sorted(
+        new_events.annotate(day=TruncDate('timestamp'))
+        .order_by().values_list('day', flat=True).distinct()
+    )
+    events_count = new_events.count()
+
+    start, end = _day_bounds(days[0], days[-1])
+    rows = (
+        Event.objects.filter(timestamp__gte=start, timestamp__lt=end)
+        .annotate(day=TruncDate('timestamp'))
+        .order_by()
+        .values('object_type', 'object_id', 'kind', 'day')
+        .annotate(count=Count('pk'), unique_ips=Count('ip', distinct=True))
+    )
+    day_set = set(days)
+    stats = [
+        EventDailyStat(**row) for row in rows.iterator(chunk_size=2000) if row['day'] in day_set
+    ]
+
+    with transaction.atomic():
+        EventDailyStat.objects.bulk_create(
+            stats,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['object_type', 'object_id', 'kind', 'day'],
+            update_fields=['count', 'unique_ips'],
+        )
+        watermark.value = upper
+        watermark.save(update_fields=['value', 'updated_at'])
+    return {'events': events_count, 'days': len(days), 'rows': len(stats)}
+
+
+def _archive_dir():
+    return Path(getattr(settings, 'EVENTS_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'var' / 'events'))
+
+
+def _json_default(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def _archive(rows, directory):
+    """
+    Пишет пакет событий в gzip-архивы по месяцам, по файлу на месяц с именем
+    по первому id пакета. Файлы записываются атомарно и синхронизируются на
+    диск до удаления событий.
+    """
+    by_month = {}
+    for row in rows:
+        stamp = timezone.localtime(row['timestamp'])
+        by_month.setdefault(stamp.strftime('%Y-%m'), []).append(row)
+
+    directory.mkdir(parents=True, exist_ok=True)
+    first_id = rows[0]['id']
+    for month, month_rows in by_month.items():
+        path = directory / f'events-{month}-{first_id:010d}.jsonl.gz'
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='wb') as archive:
+                    for row in month_rows:
+                        line = json.dumps(row, ensure_ascii=False, default=_json_default, separators=(',', ':'))
+                        archive.write(line.encode('utf-8') + b'\n')
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+def prune(days=None, archive=True, batch_size=5000, directory=None):
+    """
+    Архивирует и удаляет события старше days дней.
+
+    Удаляются только события, уже учтенные rollup() (id не больше отметки),
+    иначе итоги за эти дни потеряли бы уникальные IP. Граница — id
+    последнего такого события: удаляется все до него включительно, поэтому
+    удаленные события всегда образуют начало журнала по id, и повторный
+    запуск после сбоя начинает с того же пакета (и того же файла архива).
+    События, записанные с опозданием (на секунды новее границы по времени),
+    уходят в архив вместе с соседями по id.
+
+    Returns:
+        Словарь {'archived': n, 'deleted': n}.
+    """
+    days = days if days is not None else getattr(settings, 'EVENTS_RETENTION_DAYS', 180)
+    directory = Path(directory) if directory else _archive_dir()
+    cutoff = timezone.now() - timedelta(days=days)
+    rolled_up = Watermark.objects.filter(name=ROLLUP_WATERMARK).values_list('value', flat=True).first() or 0
+    boundary = (
+        Event.objects.filter(timestamp__lt=cutoff, pk__lte=rolled_up).aggregate(last=Max('pk'))['last'] or 0
+    )
+
+    expired = Event.objects.filter(pk__lte=boundary).order_by('pk')
+    totals = {'archived': 0, 'deleted': 0}
+    last_pk = 0
+    while True:
+        rows = list(expired.filter(pk__gt=last_pk).values(*ARCHIVE_FIELDS)[:batch_size])
+        if not rows:
+            break
+        last_pk = rows[-1]['id']
+        if archive:
+            _archive(rows, directory)
+            totals['archived'] += len(rows)
+        deleted, _ = Event.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+        totals['deleted'] += deleted
+    return totals
@@ -1,6 +1,22 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+
+def restore_search_index(using, **kwargs):
+    """Миграции, пересоздающие таблицу на SQLite, удаляют ее FTS-триггеры."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    from .search.sqlite import ensure_installed
+    with connection.cursor() as cursor:
+        ensure_installed(cursor)
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        post_migrate.connect(restore_search_index, sender=self)
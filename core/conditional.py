@@ -0,0 +1,108 @@
+"""
+Условные GET для публичных страниц: ETag, Last-Modified и ответ 304.
+
+Дата изменения страницы берется одним агрегирующим запросом max(updated_at)
+по объектам, из которых она строится, — до вызова представления, так что
+на 304 шаблон не рендерится и основные запросы не выполняются. Удаление
+объекта может уменьшить max(updated_at), поэтому к дате добавляется
+отметка последнего удаления объектов модели (mark_deleted / deleted_at).
+
+Разметка зависит от пользователя (меню, черновики авторов), поэтому ETag
+включает пользователя и язык, а Last-Modified отдается только анонимным
+посетителям: If-Modified-Since не отличает одного пользователя от другого.
+"""
+import hashlib
+from datetime import datetime, time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone, translation
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+
+def latest(*values):
+    """Наибольшая из дат (None пропускаются); date приводится к началу дня."""
+    moments = []
+    for value in values:
+        if value is None:
+            continue
+        if not isinstance(value, datetime):
+            value = timezone.make_aware(datetime.combine(value, time.min))
+        moments.append(value)
+    return max(moments) if moments else None
+
+
+DELETED_KEY_PREFIX = 'conditional:deleted'
+
+
+def _cache():
+    return caches[getattr(settings, 'PAGE_CACHE_ALIAS', 'default')]
+
+
+def mark_deleted(model):
+    """Отмечает удаление объекта модели (вызывается после коммита)."""
+    _cache().set(f'{DELETED_KEY_PREFIX}:{model._meta.label_lower}', timezone.now(), None)
+
+
+def deleted_at(*models):
+    """Время последнего удаления объектов любой из моделей или None."""
+    keys = [f'{DELETED_KEY_PREFIX}:{model._meta.label_lower}' for model in models]
+    return latest(*_cache().get_many(keys).values())
+
+
+def _has_messages(request):
+    if request.COOKIES.get(getattr(settings, 'MESSAGE_COOKIE_NAME', 'messages')):
+        return True
+    session = getattr(request, 'session', None)
+    return bool(
+        session is not None
+        and request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        and session.get('_messages')
+    )
+
+
+def make_etag(modified, viewer=''):
+    raw = f'{modified.timestamp():.6f}|{viewer}|{translation.get_language()}'
+    return f'"{hashlib.md5(raw.encode()).hexdigest()}"'
+
+
+def conditional_page(last_modified_func, per_user=True, on_not_modified=None):
+    """
+    Декоратор представления с валидаторами ETag/Last-Modified.
+
+    Args:
+        last_modified_func: (request, *args, **kwargs) -> datetime | None;
+            None — объект не найден, представление отрабатывает как обычно
+        per_user: Разметка зависит от пользователя (ETag с его id, Vary: Cookie)
+        on_not_modified: Вызывается при ответе 304 с аргументами представления
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or _has_messages(request):
+                return view(request, *args, **kwargs)
+            modified = last_modified_func(request, *args, **kwargs)
+            if modified is None:
+                return view(request, *args, **kwargs)
+
+            authenticated = per_user and request.user.is_authenticated
+            etag = make_etag(modified, request.user.pk if authenticated else '')
+            last_modified = None if authenticated else int(modified.timestamp())
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            elif response.status_code == 304 and on_not_modified is not None:
+                on_not_modified(request, *args, **kwargs)
+
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                if last_modified is not None:
+                    response['Last-Modified'] = http_date(last_modified)
+                if per_user:
+                    patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,168 @@
+"""
+Отдача файлов статей: потоковая передача, Range-запросы и условные GET.
+
+Файл никогда не читается в память целиком: полный ответ — FileResponse
+(сервер может использовать sendfile), частичный — потоковый генератор по
+выбранному диапазону. ETag и Last-Modified строятся из mtime и размера
+файла, поэтому повторные запросы встроенных PDF-просмотрщиков получают 304.
+
+Режим DOWNLOADS_SENDFILE_MODE позволяет отдать байты веб-серверу:
+'x-accel' — nginx (X-Accel-Redirect на internal location
+DOWNLOADS_ACCEL_PREFIX, соответствующий MEDIA_ROOT), 'x-sendfile' —
+Apache/lighttpd (X-Sendfile с абсолютным путем). Range и условные
+запросы в этом режиме обрабатывает веб-сервер.
+"""
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_etag(size, mtime):
+    return f'"{int(mtime):x}-{size:x}"'
+
+
+def parse_range(header, size):
+    """
+    Разбирает заголовок Range для одного диапазона.
+
+    Returns:
+        (start, end) включительно; None — заголовка нет или он не поддерживается
+        (несколько диапазонов), тогда отдается весь файл; False — диапазон
+        невыполним (416).
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # bytes=-N: последние N байт
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = int(end) if end else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def _if_range_matches(request, etag, mtime):
+    """If-Range: диапазон отдается, только если файл не изменился."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    parsed = parse_http_date_safe(if_range)
+    return parsed is not None and int(mtime) <= parsed
+
+
+def _iter_range(path, start, end):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _sendfile_response(path, name, content_type):
+    mode = getattr(settings, 'DOWNLOADS_SENDFILE_MODE', '')
+    response = HttpResponse(content_type=content_type)
+    if mode == 'x-accel':
+        prefix = getattr(settings, 'DOWNLOADS_ACCEL_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + name.lstrip('/')
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+def serve_file(request, field_file, content_type=None, filename=None):
+    """
+    Отдает файл из FileField с поддержкой Range, ETag/Last-Modified и sendfile.
+
+    Args:
+        request: Текущий запрос
+        field_file: Значение FileField (файловое хранилище с локальным путем)
+        content_type: MIME тип ответа
+        filename: Имя файла для Content-Disposition (attachment)
+    """
+    return serve_path(request, field_file.path, content_type, filename, media_name=field_file.name)
+
+
+def serve_path(request, path, content_type=None, filename=None, media_name=None):
+    """
+    Отдает файл по пути на диске (см. serve_file).
+
+    Args:
+        media_name: Имя файла относительно MEDIA_ROOT; только такие файлы
+            можно передать веб-серверу в режиме DOWNLOADS_SENDFILE_MODE
+    """
+    content_type = content_type or 'application/octet-stream'
+    try:
+        stat = os.stat(path)
+    except OSError:
+        raise Http404("Файл не найден на диске")
+    size, mtime = stat.st_size, stat.st_mtime
+    etag = file_etag(size, mtime)
+
+    # 304 / 412 без чтения файла
+    response = get_conditional_response(request, etag=etag, last_modified=int(mtime))
+    if response is None:
+        if media_name and getattr(settings, 'DOWNLOADS_SENDFILE_MODE', ''):
+            response = _sendfile_response(path, media_name, content_type)
+        else:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+            if byte_range is not None and not _if_range_matches(request, etag, mtime):
+                byte_range = None
+
+            if byte_range is False:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+            elif byte_range:
+                start, end = byte_range
+                response = StreamingHttpResponse(
+                    _iter_range(path, start, end), status=206, content_type=content_type
+                )
+                response['Content-Range'] = f'bytes {start}-{end}/{size}'
+                response['Content-Length'] = str(end - start + 1)
+            else:
+                response = FileResponse(open(path, 'rb'), content_type=content_type)
+                response['Content-Length'] = str(size)
+            response['Accept-Ranges'] = 'bytes'
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(mtime)
+    if filename and response.status_code in (200, 206):
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
+
+
+def is_new_download(request, response):
+    """
+    Считать ли ответ новой загрузкой: полная отдача файла или первый фрагмент.
+    Последующие Range-запросы просмотрщика и 304 не учитываются.
+
+    Решение принимается по заголовку Range запроса, а не по ответу: в режиме
+    DOWNLOADS_SENDFILE_MODE диапазон выполняет веб-сервер, и приложение
+    отвечает 200 на каждый фрагмент.
+    """
+    if response.status_code not in (200, 206):
+        return False
+    header = request.META.get('HTTP_RANGE')
+    if not header:
+        return True
+    return header.replace(' ', '').startswith('bytes=0-')
@@ -0,0 +1,156 @@
+"""
+Буферизованная запись событий (Event) вне пути запроса.
+
+record() кладет событие в очередь процесса, фоновый поток пишет очередь
+в БД пакетами bulk_create раз в EVENTS_FLUSH_INTERVAL секунд или сразу
+при накоплении EVENTS_BATCH_SIZE событий. Очередь ограничена
+EVENTS_BUFFER_SIZE: при переполнении (например, БД недоступна) новые
+события отбрасываются и учитываются в stats()['dropped']. При
+завершении процесса очередь дописывается (atexit).
+
+EVENTS_WRITER='sync' пишет событие сразу в запросе — для тестов и
+разовых скриптов.
+"""
+import atexit
+import logging
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_buffer = deque()
+_wakeup = threading.Event()
+_thread = None
+_stats = {'written': 0, 'dropped': 0, 'failed': 0}
+
+
+def _writer():
+    return getattr(settings, 'EVENTS_WRITER', 'thread')
+
+
+def _buffer_size():
+    return getattr(settings, 'EVENTS_BUFFER_SIZE', 10000)
+
+
+def _batch_size():
+    return getattr(settings, 'EVENTS_BATCH_SIZE', 500)
+
+
+def _flush_interval():
+    return getattr(settings, 'EVENTS_FLUSH_INTERVAL', 5)
+
+
+def record(object_type, object_id, kind, request=None, **fields):
+    """
+    Регистрирует событие. IP, User-Agent и Referer берутся из request,
+    время — момент вызова (а не записи в БД). В очередь событие попадает
+    после коммита текущей транзакции, как и хиты articles.counters.
+    """
+    event = {
+        'object_type': object_type,
+        'object_id': object_id,
+        'kind': kind,
+        'timestamp': timezone.now(),
+    }
+    if request is not None:
+        event['ip'] = request.META.get('REMOTE_ADDR')
+        event['user_agent'] = request.META.get('HTTP_USER_AGENT', '')[:500]
+        event['referer'] = request.META.get('HTTP_REFERER', '')[:500]
+    event.update(fields)
+
+    if _writer() == 'sync':
+        _write([event])
+        return
+
+    transaction.on_commit(lambda: _push(event))
+
+
+def _push(event):
+    _enqueue([event])
+    _ensure_thread()
+    if len(_buffer) >= _batch_size():
+        _wakeup.set()
+
+
+def _enqueue(events):
+    """Добавляет события в очередь с учетом ее предела; лишние отбрасываются."""
+    with _lock:
+        space = max(_buffer_size() - len(_buffer), 0)
+        _buffer.extend(events[:space])
+        dropped = len(events) - min(space, len(events))
+        if dropped:
+            # Предупреждаем при первой потере и далее на каждой тысяче
+            first = _stats['dropped'] == 0
+            _stats['dropped'] += dropped
+            if first or _stats['dropped'] // 1000 != (_stats['dropped'] - dropped) // 1000:
+                logger.warning(f"Очередь событий переполнена, отброшено всего: {_stats['dropped']}")
+
+
+def _write(events):
+    from .models_extended import Event
+
+    Event.objects.bulk_create([Event(**event) for event in events], batch_size=_batch_size())
+    with _lock:
+        _stats['written'] += len(events)
+
+
+def flush():
+    """Записывает накопленные события в БД. Возвращает число записанных."""
+    with _lock:
+        events = list(_buffer)
+        _buffer.clear()
+    if not events:
+        return 0
+    try:
+        _write(events)
+    except Exception as e:
+        logger.error(f"Ошибка записи событий ({len(events)}): {e}")
+        with _lock:
+            _stats['failed'] += 1
+        # Соединение могло оборваться — следующая попытка откроет новое
+        connection.close()
+        _enqueue(events)
+        return 0
+    return len(events)
+
+
+def stats():
+    """Счетчики очереди: queued, written, dropped, failed (неудачные попытки записи)."""
+    with _lock:
+        return {'queued': len(_buffer), **_stats}
+
+
+def _run():
+    while True:
+        _wakeup.wait(_flush_interval())
+        _wakeup.clear()
+        try:
+            flush()
+        except Exception as e:
+            logger.error(f"Ошибка фоновой записи событий: {e}")
+
+
+def _ensure_thread():
+    """Запускает фоновый поток записи (после fork воркера — заново)."""
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_run, name='event-writer', daemon=True)
+            _thread.start()
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception as e:
+        logger.error(f"Ошибка записи событий при завершении процесса: {e}")
+
+
+atexit.register(_flush_at_exit)
@@ -0,0 +1,295 @@
+"""
+Уменьшенные копии изображений (обложки выпусков, картинки новостей).
+
+Оригиналы загружаются в полном размере, а в списках выводятся миниатюры:
+для каждого пресета ширины (IMAGE_PRESETS) и формата (WebP и JPEG)
+строится производный файл MEDIA_ROOT/<IMAGE_DERIVATIVES_DIR>/ab/<sha256
+оригинала>-<пресет>-<ширина>.<расширение>. Имя зависит от содержимого
+оригинала, поэтому замена файла не отдает старую копию, а готовый файл
+можно кэшировать бессрочно.
+
+Копии строятся по требованию: шаблонный тег (core.templatetags.image_tags)
+ссылается на готовый файл в MEDIA, а если его еще нет — на
+core:image_derivative, который строит копию при первом запросе. Команда
+warm_image_derivatives строит копии для всех обложек заранее.
+
+sha256 и размеры оригинала кэшируются (IMAGE_CACHE_ALIAS) по имени,
+размеру и mtime файла, чтобы рендер страницы не читал оригиналы.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    # Без Pillow копии не строятся, шаблоны выводят оригиналы
+    Image = ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'image-meta'
+
+# формат: (формат Pillow, MIME тип)
+FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpg': ('JPEG', 'image/jpeg'),
+}
+
+# Модели и поля, для которых строятся копии (warm_image_derivatives)
+SOURCES = (
+    ('issues.Issue', 'cover_image'),
+    ('core.News', 'image'),
+)
+
+# Значения тега EXIF Orientation, при которых ширина и высота меняются местами
+_ROTATED = {5, 6, 7, 8}
+
+
+class DerivativeError(Exception):
+    """Оригинал не удалось прочитать как изображение."""
+
+
+def presets():
+    """{имя пресета: ширина в пикселях}."""
+    return getattr(settings, 'IMAGE_PRESETS', {'sm': 320, 'md': 640, 'lg': 1280})
+
+
+def _quality():
+    return getattr(settings, 'IMAGE_QUALITY', 82)
+
+
+def _cache():
+    return caches[getattr(settings, 'IMAGE_CACHE_ALIAS', 'default')]
+
+
+def _allowed_prefixes():
+    return tuple(getattr(settings, 'IMAGE_DERIVATIVE_SOURCES', ('issues/covers/', 'news/')))
+
+
+def derivatives_root():
+    return Path(settings.MEDIA_ROOT) / getattr(settings, 'IMAGE_DERIVATIVES_DIR', 'derivatives')
+
+
+def is_allowed_source(name):
+    """Копии строятся только для загрузок из IMAGE_DERIVATIVE_SOURCES."""
+    parts = name.split('/')
+    return (
+        bool(name) and not name.startswith('/') and '..' not in parts
+        and name.startswith(_allowed_prefixes())
+    )
+
+
+def _read_meta(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    try:
+        # Pillow читает только заголовок, пиксели не декодируются
+        with Image.open(path) as image:
+            width, height = image.size
+            if image.getexif().get(0x0112) in _ROTATED:
+                width, height = height, width
+    except Exception as e:
+        raise DerivativeError(str(e)) from e
+    return {'sha256': digest.hexdigest(), 'width': width, 'height': height}
+
+
+def source_meta(name):
+    """
+    {'sha256', 'width', 'height'} оригинала (размеры — с учетом EXIF-поворота).
+
+    Returns:
+        None, если файла нет, Pillow не установлен или файл не изображение.
+    """
+    if Image is None or not is_allowed_source(name):
+        return None
+    path = default_storage.path(name)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = f'{KEY_PREFIX}:{hashlib.md5(name.encode()).hexdigest()}:{stat.st_size}:{stat.st_mtime_ns}'
+    meta = _cache().get(key)
+    if meta is None:
+        try:
+            meta = _read_meta(path)
+        except (OSError, DerivativeError) as e:
+            logger.warning(f"Не удалось прочитать изображение {name}: {e}")
+            return None
+        _cache().set(key, meta, timeout=None)
+    return meta
+
+
+def target_size(meta, preset):
+    """Размер копии: ширина пресета с сохранением пропорций, без увеличения."""
+    width = min(presets()[preset], meta['width'])
+    height = max(1, round(meta['height'] * width / meta['width']))
+    return width, height
+
+
+def derivative_name(meta, preset, fmt):
+    """Имя копии относительно MEDIA_ROOT."""
+    sha256 = meta['sha256']
+    directory = getattr(settings, 'IMAGE_DERIVATIVES_DIR', 'derivatives')
+    return f'{directory}/{sha256[:2]}/{sha256}-{preset}-{presets()[preset]}.{fmt}'
+
+
+def _render(source_path, size, fmt):
+    """Изображение Pillow нужного размера и режима для формата fmt."""
+    with Image.open(source_path) as image:
+        # JPEG декодируется сразу в уменьшенном масштабе; квадрат — запас
+        # на случай EXIF-поворота, меняющего стороны местами
+        image.draft('RGB', (max(size), max(size)))
+        image = ImageOps.exif_transpose(image)
+        icc_profile = image.info.get('icc_profile')
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        if has_alpha and fmt == 'webp':
+            image = image.convert('RGBA')
+        elif has_alpha:
+            # В JPEG нет прозрачности: подкладываем белый фон
+            rgba = image.convert('RGBA')
+            image = Image.new('RGB', rgba.size, 'white')
+            image.paste(rgba, mask=rgba.getchannel('A'))
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        if image.size != size:
+            image = image.resize(size, Image.Resampling.LANCZOS)
+    return image, icc_profile
+
+
+def build(name, meta, preset, fmt):
+    """
+    Строит копию оригинала name и возвращает ее абсолютный путь.
+
+    Файл пишется во временный и переименовывается, поэтому параллельные
+    запросы одной копии не видят недописанный файл.
+    """
+    path = Path(settings.MEDIA_ROOT) / derivative_name(meta, preset, fmt)
+    try:
+        image, icc_profile = _render(default_storage.path(name), target_size(meta, preset), fmt)
+    except Exception as e:
+        raise DerivativeError(str(e)) from e
+
+    options = {'quality': _quality()}
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    if fmt == 'jpg':
+        options.update(optimize=True, progressive=True)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            image.save(f, FORMATS[fmt][0], **options)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return path
+
+
+def ensure(name, preset, fmt, force=False):
+    """
+    Путь к копии (строится при отсутствии или с force).
+
+    Returns:
+        (meta, абсолютный путь); None, если оригинал недоступен.
+    """
+    meta = source_meta(name)
+    if meta is None:
+        return None
+    path = Path(settings.MEDIA_ROOT) / derivative_name(meta, preset, fmt)
+    if force or not path.exists():
+        path = build(name, meta, preset, fmt)
+    return meta, path
+
+
+def variants(meta):
+    """
+    [(пресет, ширина)] по возрастанию ширины; пресеты шире оригинала дали
+    бы одинаковые копии, поэтому из них остается один.
+    """
+    result, seen = [], set()
+    for preset in sorted(presets(), key=presets().get):
+        width = target_size(meta, preset)[0]
+        if width not in seen:
+            seen.add(width)
+            result.append((preset, width))
+    return result
+
+
+def derivative_url(name, meta, preset, fmt):
+    """URL копии: готовый файл в MEDIA или view, который ее построит."""
+    from django.urls import reverse
+
+    relative = derivative_name(meta, preset, fmt)
+    if (Path(settings.MEDIA_ROOT) / relative).exists():
+        return default_storage.url(relative)
+    url = reverse('core:image_derivative', kwargs={'preset': preset, 'fmt': fmt, 'source': name})
+    # Версия по содержимому оригинала: ответ view можно кэшировать бессрочно
+    return f'{url}?v={meta["sha256"][:12]}'
+
+
+def warm(names, force=False):
+    """
+    Строит все копии для оригиналов names.
+
+    Returns:
+        Словарь {'built': n, 'existing': n, 'failed': n, 'keys': set(sha256)}.
+    """
+    totals = {'built': 0, 'existing': 0, 'failed': 0, 'keys': set()}
+    for name in names:
+        meta = source_meta(name)
+        if meta is None:
+            totals['failed'] += 1
+            continue
+        totals['keys'].add(meta['sha256'])
+        for preset, _ in variants(meta):
+            for fmt in FORMATS:
+                path = Path(settings.MEDIA_ROOT) / derivative_name(meta, preset, fmt)
+                if path.exists() and not force:
+                    totals['existing'] += 1
+                    continue
+                try:
+                    build(name, meta, preset, fmt)
+                except DerivativeError as e:
+                    logger.warning(f"Не удалось построить копию {name} ({preset}, {fmt}): {e}")
+                    totals['failed'] += 1
+                else:
+                    totals['built'] += 1
+    return totals
+
+
+def source_names():
+    """Имена всех загруженных оригиналов из SOURCES."""
+    from django.apps import apps
+
+    for model_path, field in SOURCES:
+        model = apps.get_model(model_path)
+        yield from (
+            model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            .order_by('pk').values_list(field, flat=True).iterator()
+        )
+
+
+def prune(keep_keys):
+    """Удаляет копии оригиналов, sha256 которых нет в keep_keys. Возвращает число файлов."""
+    root = derivatives_root()
+    removed = 0
+    if not root.exists():
+        return removed
+    for path in root.glob('*/*'):
+        if path.suffix == '.tmp' or not path.is_file():
+            continue
+        if path.name.split('-', 1)[0] not in keep_keys:
+            path.unlink()
+            removed += 1
+    return removed
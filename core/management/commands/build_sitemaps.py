@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core import sitemaps
+
+
+class Command(BaseCommand):
+    help = "Строит sitemap.xml и gzip-файлы разделов в SITEMAP_ROOT"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help='Каталог вместо SITEMAP_ROOT')
+        parser.add_argument(
+            '--if-stale', action='store_true',
+            help='Собирать, только если sitemap помечен устаревшим (для cron при SITEMAP_ON_CHANGE=off)',
+        )
+
+    def handle(self, *args, **options):
+        if options['if_stale'] and not sitemaps.is_stale(options['dir']):
+            self.stdout.write("Sitemap актуален")
+            return
+        totals = sitemaps.write_sitemaps(options['dir'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово. Файлов: {totals['files']}, адресов: {totals['urls']}"
+        ))
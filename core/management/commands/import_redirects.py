@@ -1,36 +1,75 @@
 import csv
+from urllib.parse import unquote, urlsplit
 from django.core.management.base import BaseCommand, CommandError
-from core.models import Redirect
+from core import redirects
 
 
 class Command(BaseCommand):
-    help = "Импорт редиректов из CSV (old_url,new_path). Обновляет существующие."
+    help = (
+        "Импорт редиректов из CSV (old_url,new_path[,http_status]). "
+        "Обновляет существующие; повторы old_url — побеждает последняя строка."
+    )
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Путь к CSV файлу')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Строк CSV на пакет запросов')
+        parser.add_argument('--dry-run', action='store_true', help='Показать изменения, не записывая их')
+        parser.add_argument(
+            '--deactivate-missing', action='store_true',
+            help='Выключить активные редиректы, которых нет в файле',
+        )
+
+    def _rows(self, reader):
+        for line, row in enumerate(reader, start=2):
+            old_url = (row['old_url'] or '').strip()
+            new_path = (row['new_path'] or '').strip()
+            status = (row.get('http_status') or '').strip() or '301'
+            if (
+                not old_url or not new_path or status not in ('301', '302')
+                or not redirects.accepts(unquote(urlsplit(old_url).path))
+            ):
+                self.skipped += 1
+                self.stderr.write(f'Строка {line} пропущена: {row}')
+                continue
+            yield old_url, new_path, int(status)
+
+    def _diff(self, action, old_url, before, after):
+        if action == 'create':
+            self.stdout.write(f'+ {old_url} -> {after[0]} ({after[1]})')
+        elif action == 'deactivate':
+            self.stdout.write(f'- {old_url} -> {before[0]} ({before[1]})')
+        else:
+            self.stdout.write(
+                f'~ {old_url}: {before[0]} ({before[1]}{"" if before[2] else ", выключен"}) '
+                f'-> {after[0]} ({after[1]})'
+            )
 
     def handle(self, *args, **options):
         path = options['csv_file']
-        created = 0
-        updated = 0
+        dry_run = options['dry_run']
+        self.skipped = 0
         try:
             with open(path, newline='', encoding='utf-8') as f:
                 reader = csv.DictReader(f)
                 required = {'old_url', 'new_path'}
                 if not required.issubset(reader.fieldnames or []):
                     raise CommandError('CSV должен содержать заголовки old_url,new_path')
-                for row in reader:
-                    obj, is_created = Redirect.objects.update_or_create(
-                        old_url=row['old_url'].strip(),
-                        defaults={'new_path': row['new_path'].strip(), 'is_active': True}
-                    )
-                    if is_created:
-                        created += 1
-                    else:
-                        updated += 1
+                totals = redirects.bulk_import(
+                    self._rows(reader), chunk_size=options['chunk_size'], dry_run=dry_run,
+                    deactivate_missing=options['deactivate_missing'],
+                    on_change=self._diff if dry_run else None,
+                )
         except FileNotFoundError:
             raise CommandError(f'Файл не найден: {path}')
 
-        self.stdout.write(self.style.SUCCESS(f'Готово. Создано: {created}, обновлено: {updated}'))
-
-
+        summary = (
+            f"Создано: {totals['created']}, обновлено: {totals['updated']}, "
+            f"без изменений: {totals['unchanged']}, повторов в файле: {totals['duplicates']}, "
+            f"пропущено строк: {self.skipped}"
+        )
+        if options['deactivate_missing']:
+            summary += f", выключено: {totals['deactivated']}"
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'Пробный запуск, изменения не записаны. {summary}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Готово. {summary}'))
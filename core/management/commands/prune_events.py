@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import analytics
+
+
+class Command(BaseCommand):
+    help = "Архивирует события старше N дней в сжатые JSONL-файлы и удаляет их из БД"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=getattr(settings, 'EVENTS_RETENTION_DAYS', 180),
+            help='Хранить события за последние N дней',
+        )
+        parser.add_argument('--archive-dir', help='Каталог архивов (по умолчанию EVENTS_ARCHIVE_DIR)')
+        parser.add_argument('--no-archive', action='store_true', help='Удалять без архивации')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Событий в одном пакете удаления')
+
+    def handle(self, *args, **options):
+        # Сначала учитываем свежие события, чтобы удаляемые дни были в итогах
+        analytics.rollup()
+        totals = analytics.prune(
+            days=options['days'],
+            archive=not options['no_archive'],
+            batch_size=options['batch_size'],
+            directory=options['archive_dir'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово. Архивировано: {totals['archived']}, удалено: {totals['deleted']}"
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.search import get_backend
+
+
+class Command(BaseCommand):
+    help = "Пересобирает поисковый индекс текущего бэкенда (tsvector на Postgres, FTS5 на SQLite)"
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        total = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Готово. Бэкенд: {backend.name}, проиндексировано: {total}'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core import analytics
+
+
+class Command(BaseCommand):
+    help = "Учитывает новые события (Event) в суточной статистике EventDailyStat"
+
+    def handle(self, *args, **options):
+        totals = analytics.rollup()
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово. Новых событий: {totals['events']}, дней: {totals['days']}, строк итогов: {totals['rows']}"
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from core import images
+
+
+class Command(BaseCommand):
+    help = "Строит уменьшенные копии обложек выпусков и изображений новостей (core.images)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Перестроить и существующие копии')
+        parser.add_argument(
+            '--prune', action='store_true',
+            help='Удалить копии изображений, которых больше нет среди загруженных',
+        )
+
+    def handle(self, *args, **options):
+        totals = images.warm(images.source_names(), force=options['force'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово. Построено: {totals['built']}, уже были: {totals['existing']}, "
+            f"ошибок: {totals['failed']}"
+        ))
+        if options['prune']:
+            removed = images.prune(totals['keys'])
+            self.stdout.write(f"Удалено устаревших копий: {removed}")
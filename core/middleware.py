@@ -3,7 +3,7 @@ Middleware для обработки редиректов.
 """
 from django.http import HttpResponsePermanentRedirect, HttpResponseRedirect
 from django.utils.deprecation import MiddlewareMixin
-from .models import Redirect
+from . import events, redirects
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,38 +12,25 @@ logger = logging.getLogger(__name__)
 class RedirectMiddleware(MiddlewareMixin):
     """
     Middleware для обработки редиректов старых OJS URL.
-    Проверяет полный URL запроса и выполняет редирект если найден в Redirect.
+    Пути без префикса старого сайта отсекаются без БД; остальные ищутся
+    по индексу с LRU процесса (core.redirects).
     """
     
     def process_request(self, request):
         """Обрабатывает запрос и проверяет необходимость редиректа."""
-        # Получаем полный URL запроса
-        full_url = request.build_absolute_uri()
-        
-        # Ищем редирект
         try:
-            redirect_obj = Redirect.objects.filter(
-                old_url=full_url,
-                is_active=True
-            ).first()
+            match = redirects.match(request.path, request.META.get('QUERY_STRING', ''))
             
-            if redirect_obj:
-                # Логируем событие редиректа
-                from .models_extended import Event
-                Event.objects.create(
-                    object_type='redirect',
-                    object_id=redirect_obj.pk,
-                    kind='redirect',
-                    ip=request.META.get('REMOTE_ADDR'),
-                    user_agent=request.META.get('HTTP_USER_AGENT', '')[:500],
-                    referer=request.META.get('HTTP_REFERER', '')[:500],
-                )
+            if match:
+                pk, new_path, http_status = match
+                # Логируем событие редиректа (запись в БД — в фоне, см. core.events)
+                events.record('redirect', pk, 'redirect', request)
                 
                 # Выполняем редирект
-                if redirect_obj.http_status == 301:
-                    return HttpResponsePermanentRedirect(redirect_obj.new_path)
+                if http_status == 301:
+                    return HttpResponsePermanentRedirect(new_path)
                 else:
-                    return HttpResponseRedirect(redirect_obj.new_path)
+                    return HttpResponseRedirect(new_path)
         
         except Exception as e:
             logger.error(f"Ошибка в RedirectMiddleware: {e}")
@@ -0,0 +1,46 @@
+"""
+Полнотекстовый индекс FTS5 для SQLite (статьи, локализации статей, новости, страницы).
+На других СУБД миграция ничего не делает.
+Список колонок зафиксирован на момент миграции: FTS_INDEXES в
+core.search.sqlite меняется вместе с кодом, а история миграций — нет.
+"""
+from django.db import migrations
+
+INDEXES = {
+    'articles_article': [
+        'title_ru', 'title_kk', 'title_en',
+        'keywords_ru', 'keywords_kk', 'keywords_en',
+        'abstract_ru', 'abstract_kk', 'abstract_en',
+    ],
+    'articles_articlelocale': ['title', 'abstract', 'body_html'],
+    'core_news': ['title', 'excerpt', 'content'],
+    'core_page': ['title', 'content'],
+}
+
+
+def install_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from core.search.sqlite import install
+    with schema_editor.connection.cursor() as cursor:
+        install(cursor, INDEXES)
+
+
+def uninstall_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from core.search.sqlite import uninstall
+    with schema_editor.connection.cursor() as cursor:
+        uninstall(cursor, list(INDEXES))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_affiliation_event_newslocale_pagelocale_rawdocument_and_more'),
+        ('articles', '0006_article_search_document'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_fts, uninstall_fts),
+    ]
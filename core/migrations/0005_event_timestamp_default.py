@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_sqlite_fts_search'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='event',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Время'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_event_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Watermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Имя')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Значение')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Отметка обработки',
+                'verbose_name_plural': 'Отметки обработки',
+            },
+        ),
+        migrations.CreateModel(
+            name='EventDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_type', models.CharField(max_length=20, verbose_name='Тип объекта')),
+                ('object_id', models.PositiveIntegerField(verbose_name='ID объекта')),
+                ('kind', models.CharField(max_length=20, verbose_name='Тип события')),
+                ('day', models.DateField(verbose_name='День')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Событий')),
+                ('unique_ips', models.PositiveIntegerField(default=0, verbose_name='Уникальных IP')),
+            ],
+            options={
+                'verbose_name': 'Суточная статистика событий',
+                'verbose_name_plural': 'Суточная статистика событий',
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['kind', 'day'], name='event_daily_stat_kind_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('object_type', 'object_id', 'kind', 'day'), name='event_daily_stat_unique')],
+            },
+        ),
+    ]
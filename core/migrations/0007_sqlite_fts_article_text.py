@@ -0,0 +1,38 @@
+"""
+Полнотекстовый индекс FTS5 для текста PDF статей (articles.ArticleText) на SQLite.
+На других СУБД миграция ничего не делает.
+Колонки указаны на момент миграции, как и в core.0004.
+"""
+from django.db import migrations
+
+INDEXES = {
+    'articles_articletext': ['text'],
+}
+
+
+def install_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from core.search.sqlite import install
+    with schema_editor.connection.cursor() as cursor:
+        install(cursor, INDEXES)
+
+
+def uninstall_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from core.search.sqlite import uninstall
+    with schema_editor.connection.cursor() as cursor:
+        uninstall(cursor, list(INDEXES))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_event_daily_stat'),
+        ('articles', '0010_articletext'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_fts, uninstall_fts),
+    ]
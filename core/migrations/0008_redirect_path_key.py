@@ -0,0 +1,44 @@
+"""
+Ключ поиска редиректа (Redirect.path_key): нормализованный путь и запрос
+old_url, по которому core.redirects ищет редирект запросом по индексу.
+"""
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit
+
+from django.db import migrations, models
+
+
+def _key(old_url):
+    # Копия core.redirects.url_key на момент миграции
+    parts = urlsplit(old_url)
+    path = (unquote(parts.path) or '/').rstrip('/') or '/'
+    params = sorted(parse_qsl(parts.query, keep_blank_values=True))
+    return f'{path}?{urlencode(params)}' if params else path
+
+
+def populate_path_key(apps, schema_editor):
+    Redirect = apps.get_model('core', 'Redirect')
+    batch = []
+    for redirect in Redirect.objects.only('pk', 'old_url').iterator(chunk_size=2000):
+        redirect.path_key = _key(redirect.old_url)
+        batch.append(redirect)
+        if len(batch) >= 2000:
+            Redirect.objects.bulk_update(batch, ['path_key'])
+            batch = []
+    if batch:
+        Redirect.objects.bulk_update(batch, ['path_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_sqlite_fts_article_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='redirect',
+            name='path_key',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=1000, verbose_name='Ключ поиска'),
+        ),
+        migrations.RunPython(populate_path_key, migrations.RunPython.noop),
+    ]
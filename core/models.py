@@ -139,6 +139,8 @@ class Redirect(models.Model):
     Поддерживает 301 (постоянный) и 302 (временный) редиректы.
     """
     old_url = models.URLField("Старый URL", max_length=1000, unique=True, db_index=True)
+    # Нормализованный путь и запрос old_url для поиска (core.redirects.url_key)
+    path_key = models.CharField("Ключ поиска", max_length=1000, db_index=True, editable=False, default='')
     new_path = models.CharField("Новый путь", max_length=500, db_index=True)
     http_status = models.SmallIntegerField(
         "HTTP статус",
@@ -164,6 +166,23 @@ class Redirect(models.Model):
     def __str__(self):
         return f"{self.old_url} -> {self.new_path} ({self.http_status})"
 
+    def clean(self):
+        from urllib.parse import unquote, urlsplit
+        from django.core.exceptions import ValidationError
+        from . import redirects
+        if self.old_url and not redirects.accepts(unquote(urlsplit(self.old_url).path)):
+            raise ValidationError({'old_url': _(
+                "Путь старого URL должен начинаться с одного из префиксов REDIRECTS_PATH_PREFIXES"
+            )})
+
+    def save(self, *args, **kwargs):
+        from . import redirects
+        self.path_key = redirects.url_key(self.old_url)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'old_url' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'path_key'}
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         return self.new_path
 
@@ -2,6 +2,7 @@
 Дополнительные модели для core: локализации новостей и страниц, события, сырые документы.
 """
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from .models import News, Page
 
@@ -110,7 +111,8 @@ class Event(models.Model):
     ip = models.GenericIPAddressField("IP адрес", null=True, blank=True)
     user_agent = models.CharField("User Agent", max_length=500, blank=True)
     referer = models.URLField("Referer", max_length=500, blank=True)
-    timestamp = models.DateTimeField("Время", auto_now_add=True, db_index=True)
+    # Не auto_now_add: события пишутся пакетно (core.events), время — момент запроса
+    timestamp = models.DateTimeField("Время", default=timezone.now, db_index=True)
     
     class Meta:
         verbose_name = "Событие"
@@ -129,6 +131,11 @@ class RawDocument(models.Model):
     """
     Сырые документы, полученные при ETL процессе.
     Используется для дедупликации и отслеживания источников.
+
+    sha256 — хеш тела страницы и ключ в хранилище тел ETL_BLOB_ROOT
+    (etl.blobstore): сам HTML в БД не хранится. У документов из старых
+    выгрузок, где был только пересериализованный HTML, ключ тела другой —
+    data['body_sha256'].
     """
     source_url = models.URLField("URL источника", max_length=1000, db_index=True)
     sha256 = models.CharField("SHA256 хеш", max_length=64, unique=True, db_index=True)
@@ -147,6 +154,22 @@ class RawDocument(models.Model):
     def __str__(self):
         return f"{self.source_url} ({self.sha256[:16]}...)"
 
+    @staticmethod
+    def blob_store():
+        from django.conf import settings
+        from etl.blobstore import BlobStore
+
+        return BlobStore(settings.ETL_BLOB_ROOT)
+
+    def read_body(self):
+        """
+        Тело страницы из хранилища.
+
+        Raises:
+            KeyError: Тела нет в хранилище (документ импортирован без него)
+        """
+        return self.blob_store().get(self.data.get('body_sha256', self.sha256))
+
 
 class Affiliation(models.Model):
     """
@@ -174,3 +197,47 @@ class Affiliation(models.Model):
             return f"{self.name}, {self.country}"
         return self.name
 
+
+
+class EventDailyStat(models.Model):
+    """
+    Суточные итоги событий по объекту (см. core.analytics).
+    Строки пересчитываются командой rollup_events; статистика читается отсюда,
+    а не сканированием Event.
+    """
+    object_type = models.CharField("Тип объекта", max_length=20)
+    object_id = models.PositiveIntegerField("ID объекта")
+    kind = models.CharField("Тип события", max_length=20)
+    day = models.DateField("День")
+    count = models.PositiveIntegerField("Событий", default=0)
+    unique_ips = models.PositiveIntegerField("Уникальных IP", default=0)
+
+    class Meta:
+        verbose_name = "Суточная статистика событий"
+        verbose_name_plural = "Суточная статистика событий"
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['object_type', 'object_id', 'kind', 'day'], name='event_daily_stat_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['kind', 'day'], name='event_daily_stat_kind_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_type}:{self.object_id} {self.day}: {self.count}"
+
+
+class Watermark(models.Model):
+    """Отметка инкрементальной обработки (например, последний учтенный Event.id)."""
+    name = models.CharField("Имя", max_length=50, unique=True)
+    value = models.BigIntegerField("Значение", default=0)
+    updated_at = models.DateTimeField("Дата обновления", auto_now=True)
+
+    class Meta:
+        verbose_name = "Отметка обработки"
+        verbose_name_plural = "Отметки обработки"
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
@@ -0,0 +1,493 @@
+"""
+OAI-PMH 2.0 провайдер метаданных статей (эндпоинт /oai).
+
+Поддерживаются глаголы Identify, ListMetadataFormats, ListSets (наборов
+нет — noSetHierarchy), ListIdentifiers, ListRecords и GetRecord, форматы
+oai_dc и jats (JATS-lite: только front/article-meta).
+
+Списки отдаются потоково (StreamingHttpResponse) страницами по
+OAI_PAGE_SIZE записей в порядке (updated_at, id). resumptionToken — это
+keyset-курсор: последняя отданная пара (updated_at, id) плюс исходные
+аргументы запроса. Следующая страница выбирается условием «после
+курсора», без OFFSET, поэтому полный сбор архива идет в постоянной
+памяти и каждая страница стоит одинаково. Токены не истекают; статья,
+измененная во время сбора, попадет в его конец.
+"""
+import base64
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+from urllib.parse import urlsplit
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.db.models import Min, Q
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+
+from articles.models import Article
+from articles.search import DOCUMENT_COLUMNS
+from .models import SiteSettings
+
+VERBS = ('Identify', 'ListMetadataFormats', 'ListSets', 'ListIdentifiers', 'ListRecords', 'GetRecord')
+
+# Допустимые аргументы глаголов (кроме verb); resumptionToken — исключительный
+ARGUMENTS = {
+    'Identify': set(),
+    'ListMetadataFormats': {'identifier'},
+    'ListSets': {'resumptionToken'},
+    'ListIdentifiers': {'metadataPrefix', 'from', 'until', 'set', 'resumptionToken'},
+    'ListRecords': {'metadataPrefix', 'from', 'until', 'set', 'resumptionToken'},
+    'GetRecord': {'identifier', 'metadataPrefix'},
+}
+
+METADATA_FORMATS = {
+    'oai_dc': (
+        'http://www.openarchives.org/OAI/2.0/oai_dc.xsd',
+        'http://www.openarchives.org/OAI/2.0/oai_dc/',
+    ),
+    'jats': (
+        'https://jats.nlm.nih.gov/publishing/1.2/xsd/JATS-journalpublishing1.xsd',
+        'http://jats.nlm.nih.gov',
+    ),
+}
+
+LANGUAGES = ('ru', 'kk', 'en')
+
+OAI_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:schemaLocation="http://www.openarchives.org/OAI/2.0/ '
+    'http://www.openarchives.org/OAI/2.0/OAI-PMH.xsd">\n'
+)
+
+# Символы, недопустимые в XML 1.0 (встречаются в импортированных из OJS текстах)
+_INVALID_XML = re.compile('[^\x09\x0a\x0d\x20-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]')
+_KEYWORD_SEPARATOR = re.compile(r'[;,]')
+
+
+class OAIError(Exception):
+    """Ошибка протокола: код из спецификации OAI-PMH и пояснение."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def _page_size():
+    return getattr(settings, 'OAI_PAGE_SIZE', 100)
+
+
+def xml_text(value):
+    return escape(_INVALID_XML.sub('', str(value)))
+
+
+def xml_attr(value):
+    return quoteattr(_INVALID_XML.sub('', str(value)))
+
+
+def element(name, value, lang=None):
+    """'<name xml:lang="..">value</name>' или '' для пустого значения."""
+    if value in (None, ''):
+        return ''
+    attributes = f' xml:lang={xml_attr(lang)}' if lang else ''
+    return f'<{name}{attributes}>{xml_text(value)}</{name}>'
+
+
+def _site_url():
+    return getattr(settings, 'SITE_URL', 'http://localhost:8000').rstrip('/')
+
+
+def base_url():
+    return _site_url() + reverse('core:oai')
+
+
+def _repository_id():
+    return urlsplit(_site_url()).hostname or 'localhost'
+
+
+def identifier(article_pk):
+    return f'oai:{_repository_id()}:article/{article_pk}'
+
+
+def _parse_identifier(value):
+    prefix = f'oai:{_repository_id()}:article/'
+    if value.startswith(prefix) and value[len(prefix):].isdigit():
+        return int(value[len(prefix):])
+    return None
+
+
+def datestamp(value):
+    """Дата в гранулярности протокола: YYYY-MM-DDThh:mm:ssZ (UTC)."""
+    return value.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _parse_datestamp(value, end=False):
+    """
+    Разбирает from/until. Возвращает (момент, гранулярность): для until
+    момент — исключающая верхняя граница (конец дня или секунды).
+    """
+    for fmt, granularity, step in (('%Y-%m-%d', 'day', timedelta(days=1)),
+                                   ('%Y-%m-%dT%H:%M:%SZ', 'second', timedelta(seconds=1))):
+        try:
+            moment = datetime.strptime(value, fmt).replace(tzinfo=dt_timezone.utc)
+        except ValueError:
+            continue
+        return (moment + step if end else moment), granularity
+    raise OAIError('badArgument', f'Неверная дата: {value}')
+
+
+# resumptionToken: base64url('prefix|from|until|updated_at|id')
+
+def encode_token(prefix, date_from, until, article):
+    raw = '|'.join([prefix, date_from or '', until or '', article.updated_at.isoformat(), str(article.pk)])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_token(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('utf-8')
+        prefix, date_from, until, updated_at, pk = raw.split('|')
+        position = (datetime.fromisoformat(updated_at), int(pk))
+    except ValueError:
+        raise OAIError('badResumptionToken', 'Неверный resumptionToken')
+    if prefix not in METADATA_FORMATS:
+        raise OAIError('badResumptionToken', 'Неверный resumptionToken')
+    return prefix, date_from or None, until or None, position
+
+
+def _arguments(request):
+    """Аргументы запроса (GET или POST); повторяющиеся аргументы — ошибка."""
+    query = request.POST if request.method == 'POST' else request.GET
+    for key in query:
+        if len(query.getlist(key)) > 1:
+            raise OAIError('badArgument', f'Аргумент {key} повторяется')
+    return {key: query[key] for key in query}
+
+
+def _check_arguments(verb, args):
+    allowed = ARGUMENTS[verb]
+    extra = set(args) - allowed
+    if extra:
+        raise OAIError('badArgument', f'Недопустимые аргументы: {", ".join(sorted(extra))}')
+    if 'resumptionToken' in args and len(args) > 1:
+        raise OAIError('badArgument', 'resumptionToken исключает другие аргументы')
+    if verb == 'GetRecord' and not {'identifier', 'metadataPrefix'} <= set(args):
+        raise OAIError('badArgument', 'Нужны аргументы identifier и metadataPrefix')
+    if verb in ('ListIdentifiers', 'ListRecords') and not ({'metadataPrefix', 'resumptionToken'} & set(args)):
+        raise OAIError('badArgument', 'Нужен аргумент metadataPrefix')
+    prefix = args.get('metadataPrefix')
+    if prefix is not None and prefix not in METADATA_FORMATS:
+        raise OAIError('cannotDisseminateFormat', f'Формат {prefix} не поддерживается')
+
+
+def _request_element(verb=None, args=None):
+    attributes = ''
+    if verb:
+        attributes = f' verb={xml_attr(verb)}' + ''.join(f' {key}={xml_attr(value)}' for key, value in args.items())
+    return f'<request{attributes}>{xml_text(base_url())}</request>\n'
+
+
+def _envelope(verb, args, body):
+    """Поток ответа: заголовок, тело (итератор строк), закрывающий тег."""
+    yield OAI_HEADER
+    yield f'<responseDate>{datestamp(timezone.now())}</responseDate>\n'
+    yield _request_element(verb, args)
+    yield from body
+    yield '</OAI-PMH>\n'
+
+
+def _error_response(error, verb=None, args=None):
+    # При badVerb/badArgument элемент request не должен повторять аргументы
+    if error.code in ('badVerb', 'badArgument'):
+        verb, args = None, None
+    body = [f'<error code="{error.code}">{xml_text(error.message)}</error>\n']
+    return HttpResponse(''.join(_envelope(verb, args, body)), content_type='text/xml; charset=utf-8')
+
+
+def respond(request):
+    """Отвечает на запрос OAI-PMH."""
+    args = {}
+    verb = None
+    try:
+        args = _arguments(request)
+        verb = args.pop('verb', None)
+        if verb not in VERBS:
+            raise OAIError('badVerb', 'Неизвестный или отсутствующий verb')
+        _check_arguments(verb, args)
+        body = HANDLERS[verb](args)
+    except OAIError as error:
+        return _error_response(error, verb, args)
+    return StreamingHttpResponse(_envelope(verb, args, body), content_type='text/xml; charset=utf-8')
+
+
+def _published():
+    return Article.objects.filter(status='published')
+
+
+def _identify(args):
+    site = SiteSettings.objects.only('site_name', 'email').first()
+    earliest = _published().aggregate(earliest=Min('updated_at'))['earliest']
+    return [
+        '<Identify>\n',
+        element('repositoryName', getattr(settings, 'OAI_REPOSITORY_NAME', '') or (site.site_name if site else 'JHDKZ')),
+        element('baseURL', base_url()),
+        '<protocolVersion>2.0</protocolVersion>',
+        element('adminEmail', (site.email if site else '') or getattr(settings, 'OAI_ADMIN_EMAIL', 'noreply@jhdkz.org')),
+        element('earliestDatestamp', datestamp(earliest) if earliest else '1970-01-01T00:00:00Z'),
+        '<deletedRecord>no</deletedRecord>',
+        '<granularity>YYYY-MM-DDThh:mm:ssZ</granularity>\n',
+        '<description><oai-identifier xmlns="http://www.openarchives.org/OAI/2.0/oai-identifier" '
+        'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+        'xsi:schemaLocation="http://www.openarchives.org/OAI/2.0/oai-identifier '
+        'http://www.openarchives.org/OAI/2.0/oai-identifier.xsd">',
+        '<scheme>oai</scheme>',
+        element('repositoryIdentifier', _repository_id()),
+        '<delimiter>:</delimiter>',
+        element('sampleIdentifier', identifier(1)),
+        '</oai-identifier></description>\n',
+        '</Identify>\n',
+    ]
+
+
+def _list_metadata_formats(args):
+    if 'identifier' in args:
+        pk = _parse_identifier(args['identifier'])
+        if pk is None or not _published().filter(pk=pk).exists():
+            raise OAIError('idDoesNotExist', f'Запись {args["identifier"]} не найдена')
+    formats = ''.join(
+        f'<metadataFormat>{element("metadataPrefix", prefix)}{element("schema", schema)}'
+        f'{element("metadataNamespace", namespace)}</metadataFormat>\n'
+        for prefix, (schema, namespace) in METADATA_FORMATS.items()
+    )
+    return ['<ListMetadataFormats>\n', formats, '</ListMetadataFormats>\n']
+
+
+def _list_sets(args):
+    raise OAIError('noSetHierarchy', 'Репозиторий не поддерживает наборы')
+
+
+def _get_record(args):
+    pk = _parse_identifier(args['identifier'])
+    article = _records_queryset().filter(pk=pk).first() if pk is not None else None
+    if article is None:
+        raise OAIError('idDoesNotExist', f'Запись {args["identifier"]} не найдена')
+    context = metadata_context()
+    return ['<GetRecord>\n', _record(article, args['metadataPrefix'], context), '</GetRecord>\n']
+
+
+def _records_queryset():
+    return _published().select_related('issue').prefetch_related('authors').defer(*DOCUMENT_COLUMNS)
+
+
+def _list_identifiers(args):
+    return _list(args, 'ListIdentifiers', _published().only('pk', 'updated_at'))
+
+
+def _list_records(args):
+    return _list(args, 'ListRecords', _records_queryset())
+
+
+def _list(args, verb, queryset):
+    if 'set' in args:
+        raise OAIError('noSetHierarchy', 'Репозиторий не поддерживает наборы')
+    if 'resumptionToken' in args:
+        prefix, date_from, until, position = decode_token(args['resumptionToken'])
+    else:
+        prefix, date_from, until, position = args['metadataPrefix'], args.get('from'), args.get('until'), None
+
+    if date_from:
+        start, from_granularity = _parse_datestamp(date_from)
+        queryset = queryset.filter(updated_at__gte=start)
+    if until:
+        end, until_granularity = _parse_datestamp(until, end=True)
+        queryset = queryset.filter(updated_at__lt=end)
+    if date_from and until and (from_granularity != until_granularity or start >= end):
+        raise OAIError('badArgument', 'Неверный интервал from/until')
+    if position:
+        updated_at, pk = position
+        queryset = queryset.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, pk__gt=pk))
+
+    size = _page_size()
+    rows = queryset.order_by('updated_at', 'pk')[:size + 1].iterator(chunk_size=min(size + 1, 500))
+    # Первая запись читается заранее: пустой результат — ошибка, а не пустой список
+    first = next(rows, None)
+    if first is None:
+        if position:
+            # Последняя страница кончилась ровно на курсоре
+            return [f'<{verb}>\n<resumptionToken/>\n</{verb}>\n']
+        raise OAIError('noRecordsMatch', 'Нет записей, удовлетворяющих запросу')
+    return _stream_list(verb, prefix, date_from, until, first, rows, size, bool(position))
+
+
+def _stream_list(verb, prefix, date_from, until, first, rows, size, resumed):
+    context = metadata_context() if verb == 'ListRecords' else None
+    yield f'<{verb}>\n'
+    last, count, article = None, 0, first
+    while article is not None:
+        if count == size:
+            # Есть (size + 1)-я запись — будет следующая страница
+            yield f'<resumptionToken>{encode_token(prefix, date_from, until, last)}</resumptionToken>\n'
+            break
+        if verb == 'ListRecords':
+            yield _record(article, prefix, context)
+        else:
+            yield _header(article)
+        last, count = article, count + 1
+        article = next(rows, None)
+    else:
+        if resumed:
+            # Пустой токен на последней странице — сбор завершен
+            yield '<resumptionToken/>\n'
+    yield f'</{verb}>\n'
+
+
+def _header(article):
+    return (
+        f'<header><identifier>{xml_text(identifier(article.pk))}</identifier>'
+        f'<datestamp>{datestamp(article.updated_at)}</datestamp></header>\n'
+    )
+
+
+def metadata_context():
+    """Общие для всех записей данные журнала (один запрос на ответ или выгрузку)."""
+    site = SiteSettings.objects.only('site_name').first()
+    return {'journal': getattr(settings, 'OAI_REPOSITORY_NAME', '') or (site.site_name if site else 'JHDKZ')}
+
+
+def _record(article, prefix, context):
+    metadata = dublin_core(article, context) if prefix == 'oai_dc' else jats(article, context)
+    return f'<record>{_header(article).rstrip()}<metadata>{metadata}</metadata></record>\n'
+
+
+def split_keywords(value):
+    return [keyword.strip() for keyword in _KEYWORD_SEPARATOR.split(value or '') if keyword.strip()]
+
+
+def publication_date(article):
+    if article.published_at:
+        return timezone.localtime(article.published_at).date()
+    return article.issue.published_at
+
+
+def article_url(article):
+    return _site_url() + article.get_absolute_url()
+
+
+def dublin_core(article, context):
+    """Метаданные статьи в формате oai_dc."""
+    issue = article.issue
+    parts = [
+        '<oai_dc:dc xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/" '
+        'xmlns:dc="http://purl.org/dc/elements/1.1/" '
+        'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+        'xsi:schemaLocation="http://www.openarchives.org/OAI/2.0/oai_dc/ '
+        'http://www.openarchives.org/OAI/2.0/oai_dc.xsd">',
+    ]
+    for language in LANGUAGES:
+        parts.append(element('dc:title', article.get_title(language), lang=language))
+    for author in article.authors.all():
+        if author.last_name and author.first_name:
+            parts.append(element('dc:creator', f'{author.last_name}, {author.first_name}'))
+        else:
+            parts.append(element('dc:creator', author.get_full_name() or author.username))
+    for language in LANGUAGES:
+        for keyword in split_keywords(article.get_keywords(language)):
+            parts.append(element('dc:subject', keyword, lang=language))
+    for language in LANGUAGES:
+        parts.append(element('dc:description', article.get_abstract(language), lang=language))
+    parts.append(element('dc:publisher', context['journal']))
+    published = publication_date(article)
+    parts.append(element('dc:date', published.isoformat() if published else ''))
+    parts.append('<dc:type>info:eu-repo/semantics/article</dc:type><dc:type>Text</dc:type>')
+    if article.pdf_file:
+        parts.append('<dc:format>application/pdf</dc:format>')
+    parts.append(element('dc:identifier', article_url(article)))
+    if article.doi:
+        parts.append(element('dc:identifier', f'https://doi.org/{article.doi}'))
+    parts.append(element('dc:source', f'{context["journal"]}; {issue.year} № {issue.number}; {article.get_pages_info()}'))
+    parts.append(element('dc:language', article.language))
+    parts.append('</oai_dc:dc>')
+    return ''.join(parts)
+
+
+
+def jats(article, context):
+    """Метаданные статьи в формате JATS-lite (front без полного текста)."""
+    issue = article.issue
+    language = article.language
+    other_languages = [code for code in LANGUAGES if code != language]
+    parts = [
+        '<article xmlns="http://jats.nlm.nih.gov" '
+        'xmlns:xlink="http://www.w3.org/1999/xlink" '
+        'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+        'xsi:schemaLocation="http://jats.nlm.nih.gov '
+        'https://jats.nlm.nih.gov/publishing/1.2/xsd/JATS-journalpublishing1.xsd" '
+        f'article-type="research-article" xml:lang={xml_attr(language)}>',
+        '<front><journal-meta><journal-title-group>',
+        element('journal-title', context['journal']),
+        '</journal-title-group><publisher>',
+        element('publisher-name', context['journal']),
+        '</publisher></journal-meta><article-meta>',
+        f'<article-id pub-id-type="publisher-id">{article.pk}</article-id>',
+    ]
+    if article.doi:
+        parts.append(f'<article-id pub-id-type="doi">{xml_text(article.doi)}</article-id>')
+    parts.append('<title-group>')
+    parts.append(element('article-title', article.get_title(language) or article.title_ru))
+    for code in other_languages:
+        title = article.get_title(code)
+        if title:
+            parts.append(f'<trans-title-group xml:lang="{code}">{element("trans-title", title)}</trans-title-group>')
+    parts.append('</title-group>')
+
+    authors = list(article.authors.all())
+    if authors:
+        parts.append('<contrib-group>')
+        for author in authors:
+            parts.append('<contrib contrib-type="author">')
+            if author.orcid:
+                parts.append(f'<contrib-id contrib-id-type="orcid">https://orcid.org/{xml_text(author.orcid)}</contrib-id>')
+            if author.last_name:
+                parts.append(f'<name>{element("surname", author.last_name)}{element("given-names", author.first_name)}</name>')
+            else:
+                parts.append(element('string-name', author.get_full_name() or author.username))
+            parts.append(element('aff', author.organization))
+            parts.append('</contrib>')
+        parts.append('</contrib-group>')
+
+    published = publication_date(article)
+    if published:
+        parts.append(
+            f'<pub-date publication-format="electronic" date-type="pub">'
+            f'<day>{published.day:02d}</day><month>{published.month:02d}</month><year>{published.year}</year></pub-date>'
+        )
+    parts.append(element('issue', issue.number))
+    parts.append(element('fpage', article.page_start))
+    parts.append(element('lpage', article.page_end))
+    parts.append(f'<self-uri xlink:href={xml_attr(article_url(article))}/>')
+    abstract = article.get_abstract(language) or article.abstract_ru
+    if abstract:
+        parts.append(f'<abstract>{element("p", abstract)}</abstract>')
+    for code in other_languages:
+        abstract = article.get_abstract(code)
+        if abstract:
+            parts.append(f'<trans-abstract xml:lang="{code}">{element("p", abstract)}</trans-abstract>')
+    for code in LANGUAGES:
+        keywords = split_keywords(article.get_keywords(code))
+        if keywords:
+            parts.append(f'<kwd-group xml:lang="{code}">' + ''.join(element('kwd', keyword) for keyword in keywords) + '</kwd-group>')
+    parts.append('</article-meta></front></article>')
+    return ''.join(parts)
+
+
+HANDLERS = {
+    'Identify': _identify,
+    'ListMetadataFormats': _list_metadata_formats,
+    'ListSets': _list_sets,
+    'ListIdentifiers': _list_identifiers,
+    'ListRecords': _list_records,
+    'GetRecord': _get_record,
+}
@@ -0,0 +1,167 @@
+"""
+Кэш публичных страниц для анонимных посетителей.
+
+Ключ страницы — путь, язык и строка запроса. Каждая запись помечается
+тегами ('articles', 'issue:5', 'page:3', ...) и хранит версии тегов,
+прочитанные до того, как представление получило данные (общие теги — до
+вызова представления, теги объекта — в tag(), сразу после его загрузки);
+инвалидация во время рендера делает такую запись устаревшей. Сигналы сохранения Article, Issue, News и Page (см.
+core.signals) сбрасывают версии своих тегов, и зависящие от них
+страницы перестают считаться актуальными — без перебора ключей.
+
+Авторизованные пользователи (редакторы в том числе) всегда получают
+страницу из БД. Ответы с cookies (CSRF, сессия) и запросы с
+непрочитанными сообщениями не кэшируются.
+
+С несколькими воркерами кэш должен быть общим (CACHE_URL=redis://...),
+иначе инвалидация дойдет только до процесса, где сохранялась модель.
+"""
+import hashlib
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import translation
+
+KEY_PREFIX = 'page-cache'
+
+
+def _cache():
+    return caches[getattr(settings, 'PAGE_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', 300)
+
+
+def _enabled():
+    return getattr(settings, 'PAGE_CACHE_ENABLED', True)
+
+
+def _tag_key(tag):
+    return f'{KEY_PREFIX}:tag:{tag}'
+
+
+def page_key(request):
+    """Ключ страницы: путь, язык и отсортированная строка запроса."""
+    query = '&'.join(sorted(request.GET.urlencode().split('&'))) if request.GET else ''
+    raw = f'{request.path}?{query}|{translation.get_language()}'
+    return f'{KEY_PREFIX}:page:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def tag(request, *tags):
+    """
+    Добавляет теги к странице, которую рендерит текущий запрос.
+
+    Версии тегов читаются здесь, поэтому представление вызывает tag()
+    сразу после загрузки объекта, до остальных запросов и рендера.
+    """
+    if hasattr(request, '_page_cache_tags'):
+        new = [t for t in tags if t not in request._page_cache_tags]
+        request._page_cache_tags.update(_versions(_cache(), new))
+
+
+def remember(request, **meta):
+    """Сохраняет данные вместе со страницей; они передаются в on_hit при выдаче из кэша."""
+    if hasattr(request, '_page_cache_meta'):
+        request._page_cache_meta.update(meta)
+
+
+def _versions(cache, tags):
+    """Текущие версии тегов; отсутствующие создаются."""
+    keys = {_tag_key(t): t for t in tags}
+    versions = cache.get_many(keys)
+    for key in set(keys) - set(versions):
+        cache.add(key, uuid.uuid4().hex, None)
+        versions[key] = cache.get(key)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def _is_fresh(cache, entry):
+    keys = {_tag_key(t): version for t, version in entry['tags'].items()}
+    current = cache.get_many(keys)
+    return all(current.get(key) == version for key, version in keys.items())
+
+
+def invalidate(*tags):
+    """Делает устаревшими все страницы с любым из тегов."""
+    if tags:
+        _cache().delete_many([_tag_key(t) for t in tags])
+
+
+def invalidate_on_commit(*tags):
+    transaction.on_commit(lambda: invalidate(*tags))
+
+
+def _cacheable_request(request):
+    if not _enabled() or request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    # Непрочитанные сообщения (messages) выводятся в шаблоне — такую страницу не кэшируем
+    if request.COOKIES.get(getattr(settings, 'MESSAGE_COOKIE_NAME', 'messages')):
+        return False
+    session = getattr(request, 'session', None)
+    if session is not None and request.COOKIES.get(settings.SESSION_COOKIE_NAME) and session.get('_messages'):
+        return False
+    return True
+
+
+def _cacheable_response(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and 'private' not in response.get('Cache-Control', '')
+        and 'no-store' not in response.get('Cache-Control', '')
+    )
+
+
+def cache_anonymous_page(*tags, on_hit=None):
+    """
+    Декоратор представления: кэширует страницу для анонимных посетителей.
+
+    Args:
+        tags: Теги, общие для всех страниц представления; теги конкретного
+            объекта представление добавляет через tag(request, ...)
+        on_hit: Функция (request, meta), вызываемая при выдаче из кэша —
+            например, чтобы учесть просмотр статьи
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable_request(request):
+                return view(request, *args, **kwargs)
+
+            cache = _cache()
+            key = page_key(request)
+            entry = cache.get(key)
+            if entry is not None and _is_fresh(cache, entry):
+                if on_hit is not None:
+                    on_hit(request, entry['meta'])
+                return entry['response']
+
+            # Версии читаются до представления: если теги сбросят во время
+            # рендера, страница сохранится под старыми версиями и не будет выдана
+            request._page_cache_tags = _versions(cache, tags)
+            request._page_cache_meta = {}
+            response = view(request, *args, **kwargs)
+
+            def store(response):
+                if not _cacheable_response(response):
+                    return
+                cache.set(key, {
+                    'response': response,
+                    'tags': request._page_cache_tags,
+                    'meta': request._page_cache_meta,
+                }, _timeout())
+
+            if hasattr(response, 'render') and callable(response.render) and not response.is_rendered:
+                response.add_post_render_callback(store)
+            else:
+                store(response)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,229 @@
+"""
+Поиск редиректов старых OJS URL.
+
+Ключ редиректа — нормализованный путь и отсортированные параметры
+запроса старого URL (Redirect.path_key, индекс в БД). Хост и схема не
+учитываются: портал обслуживает старый домен. Предварительный фильтр —
+префиксы старых путей (REDIRECTS_PATH_PREFIXES, обычно только
+'/index.php/'): запросы к статике, админке, healthz и всем новым URL
+отсекаются без обращения к БД. Путь с подходящим префиксом ищется одним
+запросом по индексу; ответ, в том числе отсутствие редиректа, хранится
+в небольшом LRU процесса (REDIRECTS_LRU_SIZE).
+
+Изменение Redirect (сигналы core.signals, импорт) увеличивает версию
+в общем кэше; процесс сверяет версию не чаще раза в
+REDIRECTS_VERSION_CHECK_INTERVAL секунд и при смене очищает LRU.
+
+bulk_import() загружает карту старых URL пакетами: один запрос на
+чтение существующих строк пакета и один bulk_create(update_conflicts)
+на запись, версия сбрасывается один раз после коммита.
+"""
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'redirects:version'
+
+_lock = threading.Lock()
+_lru = OrderedDict()
+_version = None
+_checked_at = 0.0
+
+
+def _cache():
+    return caches[getattr(settings, 'REDIRECTS_CACHE_ALIAS', 'default')]
+
+
+def _check_interval():
+    return getattr(settings, 'REDIRECTS_VERSION_CHECK_INTERVAL', 5)
+
+
+def _prefixes():
+    return tuple(getattr(settings, 'REDIRECTS_PATH_PREFIXES', ('/index.php/',)))
+
+
+def normalize(path, query=''):
+    """
+    Ключ поиска: путь без завершающего '/' и отсортированные параметры запроса.
+
+    path уже декодирован (request.path, см. url_key) и повторно не
+    раскодируется: '%25' в исходном URL дает '%', а не следующий байт.
+    """
+    path = path.rstrip('/') or '/'
+    params = sorted(parse_qsl(query, keep_blank_values=True))
+    return f'{path}?{urlencode(params)}' if params else path
+
+
+def url_key(old_url):
+    """Ключ поиска для старого URL (Redirect.old_url); путь декодируется один раз."""
+    parts = urlsplit(old_url)
+    return normalize(unquote(parts.path) or '/', parts.query)
+
+
+def accepts(path):
+    """Может ли путь (декодированный) быть старым URL — по REDIRECTS_PATH_PREFIXES."""
+    return path.startswith(_prefixes())
+
+
+def _current_version():
+    """Версия редиректов из общего кэша; сверяется не чаще раза в интервал."""
+    global _version, _checked_at
+    now = time.monotonic()
+    if _version is not None and now - _checked_at < _check_interval():
+        return _version
+    version = _cache().get(VERSION_KEY)
+    if version is None:
+        _cache().add(VERSION_KEY, time.time_ns(), None)
+        version = _cache().get(VERSION_KEY)
+    with _lock:
+        if version != _version:
+            _lru.clear()
+            _version = version
+        _checked_at = now
+    return version
+
+
+def _lookup(key):
+    from .models import Redirect
+
+    # При совпадении ключей побеждает последний измененный редирект
+    return (
+        Redirect.objects.filter(path_key=key, is_active=True)
+        .order_by('-updated_at', '-pk')
+        .values_list('pk', 'new_path', 'http_status')
+        .first()
+    )
+
+
+def match(path, query=''):
+    """
+    (pk, новый путь, статус) или None.
+
+    Args:
+        path: Декодированный путь запроса (request.path)
+        query: Строка запроса (QUERY_STRING)
+    """
+    if not accepts(path):
+        return None
+    version = _current_version()
+    key = normalize(path, query)
+    with _lock:
+        if key in _lru:
+            _lru.move_to_end(key)
+            return _lru[key]
+    found = _lookup(key)
+    with _lock:
+        # Версия могла смениться во время запроса: такой ответ не кэшируем
+        if version == _version:
+            _lru[key] = found
+            if len(_lru) > getattr(settings, 'REDIRECTS_LRU_SIZE', 1024):
+                _lru.popitem(last=False)
+    return found
+
+
+def invalidate():
+    """Отмечает найденные редиректы устаревшими во всех процессах (новая версия в кэше)."""
+    global _version
+    _cache().set(VERSION_KEY, time.time_ns(), None)
+    with _lock:
+        _lru.clear()
+        _version = None
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def bulk_import(rows, chunk_size=2000, dry_run=False, deactivate_missing=False, on_change=None):
+    """
+    Создает и обновляет Redirect по строкам (old_url, new_path, http_status).
+
+    Повторы old_url в файле схлопываются (побеждает последняя строка),
+    строки, совпадающие с БД, не перезаписываются. Все изменения — в одной
+    транзакции; в режиме dry_run она откатывается.
+
+    Args:
+        deactivate_missing: Выключить активные редиректы, которых нет в rows
+        on_change: Функция (действие, old_url, было, стало) для каждого
+            изменения; действие — 'create', 'update' или 'deactivate'
+
+    Returns:
+        Словарь {'created', 'updated', 'unchanged', 'duplicates', 'deactivated'}.
+    """
+    from django.db import transaction
+    from django.utils import timezone
+    from .models import Redirect
+
+    totals = dict.fromkeys(('created', 'updated', 'unchanged', 'duplicates', 'deactivated'), 0)
+    seen = set()
+    notify = on_change or (lambda *args: None)
+
+    with transaction.atomic():
+        for chunk in _chunks(rows, chunk_size):
+            # В пределах пакета побеждает последняя строка
+            latest = {}
+            for old_url, new_path, http_status in chunk:
+                if old_url in latest or old_url in seen:
+                    totals['duplicates'] += 1
+                latest[old_url] = (new_path, http_status)
+            existing = {
+                old_url: (new_path, http_status, is_active)
+                for old_url, new_path, http_status, is_active in Redirect.objects.filter(
+                    old_url__in=list(latest),
+                ).values_list('old_url', 'new_path', 'http_status', 'is_active')
+            }
+            changed = []
+            for old_url, (new_path, http_status) in latest.items():
+                before = existing.get(old_url)
+                after = (new_path, http_status, True)
+                # Повтор из прошлого пакета уже посчитан, но его значение побеждает
+                repeated = old_url in seen
+                if before == after:
+                    totals['unchanged'] += not repeated
+                    continue
+                action = 'update' if before else 'create'
+                if not repeated:
+                    totals['updated' if before else 'created'] += 1
+                notify(action, old_url, before, after)
+                changed.append(Redirect(
+                    old_url=old_url, path_key=url_key(old_url), new_path=new_path,
+                    http_status=http_status, is_active=True,
+                ))
+            seen.update(latest)
+            if changed and not dry_run:
+                Redirect.objects.bulk_create(
+                    changed, batch_size=chunk_size, update_conflicts=True, unique_fields=['old_url'],
+                    update_fields=['path_key', 'new_path', 'http_status', 'is_active', 'updated_at'],
+                )
+
+        if deactivate_missing:
+            active = (
+                Redirect.objects.filter(is_active=True).order_by('pk')
+                .values_list('pk', 'old_url', 'new_path', 'http_status')
+            )
+            missing = []
+            for pk, old_url, new_path, http_status in active.iterator(chunk_size=chunk_size):
+                if old_url not in seen:
+                    notify('deactivate', old_url, (new_path, http_status, True), (new_path, http_status, False))
+                    missing.append(pk)
+            totals['deactivated'] = len(missing)
+            if not dry_run:
+                for pks in _chunks(missing, chunk_size):
+                    Redirect.objects.filter(pk__in=pks).update(is_active=False, updated_at=timezone.now())
+
+        if dry_run:
+            transaction.set_rollback(True)
+        elif totals['created'] or totals['updated'] or totals['deactivated']:
+            # bulk_create и update() не шлют сигналы: сбрасываем версию один раз
+            transaction.on_commit(invalidate)
+    return totals
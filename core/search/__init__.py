@@ -0,0 +1,32 @@
+"""
+Поиск по контенту портала с подключаемыми бэкендами.
+
+Бэкенд выбирается настройкой SEARCH_BACKEND (путь к классу) или
+автоматически по СУБД: Postgres — tsvector, SQLite — FTS5, иначе icontains.
+Представления работают только через get_backend() и не зависят от СУБД.
+"""
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .base import SearchBackend
+from .postgres import PostgresSearchBackend
+from .sqlite import SQLiteFTSSearchBackend
+
+_backend = None
+
+
+def get_backend():
+    """Возвращает поисковый бэкенд процесса (создается при первом вызове)."""
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        else:
+            for backend in (PostgresSearchBackend(), SQLiteFTSSearchBackend()):
+                if backend.is_available():
+                    _backend = backend
+                    break
+            else:
+                _backend = SearchBackend()
+    return _backend
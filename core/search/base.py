@@ -0,0 +1,45 @@
+"""
+Базовый поисковый бэкенд: icontains по тем же полям, что и индексы.
+Используется на СУБД без полнотекстового поиска и как родитель для остальных бэкендов.
+"""
+from django.db.models import Q
+
+from articles.models_extended import ArticleText
+from articles.search import DOCUMENT_FIELDS, SEARCH_CONFIGS
+
+
+class SearchBackend:
+    """
+    Интерфейс поискового бэкенда.
+
+    Методы search_* принимают исходный queryset (с нужными фильтрами статуса)
+    и возвращают queryset, отфильтрованный по запросу и отсортированный по
+    релевантности. Если бэкенд умеет ранжировать, у объектов есть атрибут
+    rank (больше — релевантнее).
+    """
+    name = 'simple'
+
+    def is_available(self):
+        """Может ли бэкенд работать на текущей БД."""
+        return True
+
+    def search_articles(self, queryset, query, language=None):
+        langs = [language] if language in SEARCH_CONFIGS else list(SEARCH_CONFIGS)
+        condition = Q()
+        for lang in langs:
+            for name, _ in DOCUMENT_FIELDS:
+                condition |= Q(**{f'{name}_{lang}__icontains': query})
+        condition |= Q(pk__in=ArticleText.objects.filter(status='done', text__icontains=query).values('article_id'))
+        return queryset.filter(condition).order_by('-created_at')
+
+    def search_news(self, queryset, query):
+        return queryset.filter(
+            Q(title__icontains=query) | Q(excerpt__icontains=query) | Q(content__icontains=query)
+        ).order_by('-published_at')
+
+    def search_pages(self, queryset, query):
+        return queryset.filter(Q(title__icontains=query) | Q(content__icontains=query))
+
+    def rebuild(self):
+        """Пересобирает индекс целиком. Возвращает число проиндексированных объектов."""
+        return 0
@@ -0,0 +1,67 @@
+"""
+Поисковый бэкенд для Postgres: статьи ищутся по хранимому tsvector
+(Article.search_document, см. articles.search), новости и страницы —
+по вектору, построенному на лету (таблицы небольшие).
+
+Поиск на одном языке идет по документу полей этого языка и документу
+текста PDF (язык файла неизвестен, как и в бэкенде SQLite), без
+документа по всем языкам.
+"""
+from django.contrib.postgres.search import SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, Q
+
+from articles import search as article_search
+from .base import SearchBackend
+
+
+class PostgresSearchBackend(SearchBackend):
+    name = 'postgres'
+
+    def is_available(self):
+        return connection.vendor == 'postgresql'
+
+    def search_articles(self, queryset, query, language=None):
+        search_query = article_search.build_query(query, language)
+        if language not in article_search.SEARCH_CONFIGS:
+            return (
+                queryset.filter(search_document=search_query)
+                .annotate(rank=SearchRank(F('search_document'), search_query))
+                .order_by('-rank', '-created_at')
+            )
+        document = f'search_document_{language}'
+        return (
+            queryset.filter(Q(**{document: search_query}) | Q(search_document_text=search_query))
+            .annotate(rank=(
+                SearchRank(F(document), search_query)
+                + SearchRank(F('search_document_text'), search_query)
+            ))
+            .order_by('-rank', '-created_at')
+        )
+
+    def _search_vector(self, queryset, query, vector):
+        search_query = article_search.build_query(query)
+        return (
+            queryset.annotate(search=vector)
+            .filter(search=search_query)
+            .annotate(rank=SearchRank(vector, search_query))
+            .order_by('-rank')
+        )
+
+    def search_news(self, queryset, query):
+        vector = (
+            SearchVector('title', config='russian', weight='A')
+            + SearchVector('excerpt', config='russian', weight='B')
+            + SearchVector('content', config='russian', weight='C')
+        )
+        return self._search_vector(queryset, query, vector)
+
+    def search_pages(self, queryset, query):
+        vector = (
+            SearchVector('title', config='russian', weight='A')
+            + SearchVector('content', config='russian', weight='C')
+        )
+        return self._search_vector(queryset, query, vector)
+
+    def rebuild(self):
+        return article_search.rebuild_search_documents()
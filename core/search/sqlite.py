@@ -0,0 +1,283 @@
+"""
+Поисковый бэкенд для SQLite на FTS5.
+
+Для каждой индексируемой таблицы создается виртуальная FTS5-таблица
+в режиме external content (<таблица>_fts) и триггеры, которые держат
+ее в синхронизации с исходной таблицей при INSERT/UPDATE/DELETE —
+в том числе при queryset.update(). Токенизатор unicode61 приводит
+кириллицу к нижнему регистру, prefix-индексы ускоряют поиск по началу
+слова, ранжирование — bm25 с весами колонок.
+
+Таблицы и триггеры создаются миграциями core.0004 и core.0007. Миграция,
+пересоздающая исходную таблицу (ALTER на SQLite), теряет ее триггеры —
+их и индекс восстанавливает обработчик post_migrate (ensure_installed,
+см. core.apps), вручную — ``manage.py rebuild_search_index``.
+
+Найденные объекты отбираются подзапросом по MATCH без ограничения, так что
+количество и фасеты считает СУБД (COUNT по совпадениям). По bm25
+ранжируются SEARCH_MAX_RESULTS лучших: их (id, score) выбираются
+отдельным запросом при построении queryset и подставляются в запрос
+страницы (rank_case), остальные совпадения (rank = NULL) идут после них
+по дате.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, FloatField
+from django.db.models.expressions import RawSQL
+
+from articles.search import DOCUMENT_FIELDS, SEARCH_CONFIGS
+from .base import SearchBackend
+
+TOKENIZE = 'unicode61 remove_diacritics 2'
+PREFIX = '2 3'
+
+ARTICLE_COLUMNS = [f'{name}_{lang}' for name, _ in DOCUMENT_FIELDS for lang in SEARCH_CONFIGS]
+ARTICLE_WEIGHTS = {'title': 10.0, 'keywords': 5.0, 'abstract': 1.0}
+
+# Таблица -> [(колонка, вес bm25)]
+FTS_INDEXES = {
+    'articles_article': [(column, ARTICLE_WEIGHTS[column.rsplit('_', 1)[0]]) for column in ARTICLE_COLUMNS],
+    'articles_articlelocale': [('title', 10.0), ('abstract', 3.0), ('body_html', 1.0)],
+    'articles_articletext': [('text', 1.0)],
+    'core_news': [('title', 10.0), ('excerpt', 3.0), ('content', 1.0)],
+    'core_page': [('title', 10.0), ('content', 1.0)],
+}
+
+
+def fts_table(table):
+    return f'{table}_fts'
+
+
+def _statements(table, columns):
+    fts = fts_table(table)
+    cols = ', '.join(columns)
+    new = ', '.join(f'new.{c}' for c in columns)
+    old = ', '.join(f'old.{c}' for c in columns)
+    insert = f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new});"
+    delete = f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', "
+        f"content_rowid='id', tokenize='{TOKENIZE}', prefix='{PREFIX}')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN {delete} {insert} END",
+    ]
+
+
+def _columns(tables=None):
+    """{таблица: [колонки]} текущего FTS_INDEXES (все таблицы или tables)."""
+    return {
+        table: [column for column, _ in columns]
+        for table, columns in FTS_INDEXES.items()
+        if tables is None or table in tables
+    }
+
+
+def install(cursor, indexes=None):
+    """
+    Создает FTS-таблицы и триггеры (идемпотентно) и заполняет индекс.
+    Таблицы, которых еще нет в БД (ранние миграции), пропускаются.
+
+    Args:
+        indexes: {таблица: [колонки]}; по умолчанию — текущий FTS_INDEXES.
+            Миграции передают список колонок на момент своего создания
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    existing = {row[0] for row in cursor.fetchall()}
+    for table, columns in (_columns() if indexes is None else indexes).items():
+        if table not in existing:
+            continue
+        for sql in _statements(table, columns):
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {fts_table(table)}({fts_table(table)}) VALUES ('rebuild')")
+
+
+def _triggers(table):
+    fts = fts_table(table)
+    return {f'{fts}_{suffix}' for suffix in ('ai', 'ad', 'au')}
+
+
+def ensure_installed(cursor):
+    """
+    Восстанавливает триггеры, пропавшие после пересоздания исходных таблиц,
+    и перестраивает их индекс. FTS-таблицы, которых нет (миграции core.0004
+    и core.0007 еще не применены или откачены), не создаются.
+
+    Returns:
+        Список восстановленных таблиц.
+    """
+    cursor.execute("SELECT type, name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+    names = {(kind, name) for kind, name in cursor.fetchall()}
+    tables = {name for kind, name in names if kind == 'table'}
+    triggers = {name for kind, name in names if kind == 'trigger'}
+    broken = [
+        table for table in FTS_INDEXES
+        if table in tables and fts_table(table) in tables and not _triggers(table) <= triggers
+    ]
+    if broken:
+        install(cursor, _columns(broken))
+    return broken
+
+
+def uninstall(cursor, tables=None):
+    """Удаляет FTS-таблицы и триггеры tables (по умолчанию — всех из FTS_INDEXES)."""
+    for table in tables or FTS_INDEXES:
+        fts = fts_table(table)
+        for trigger in sorted(_triggers(table)):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        cursor.execute(f"DROP TABLE IF EXISTS {fts}")
+
+
+def match_expression(query, columns=None):
+    """
+    Переводит пользовательскую строку в выражение FTS5 MATCH:
+    каждое слово — префиксный терм в кавычках, термы объединяются через AND.
+    """
+    tokens = re.findall(r'\w+', query)
+    if not tokens:
+        return None
+    expression = ' '.join(f'"{token}"*' for token in tokens)
+    if columns:
+        expression = f"{{{' '.join(columns)}}} : ({expression})"
+    return expression
+
+
+def rank_case(column, ranks, leaf_size=16):
+    """
+    SQL-выражение: rank строки по ее id из списка [(id, rank)], отсортированного
+    по id, или NULL. CASE разбит на дерево сравнений по id, поэтому строка
+    проходит log2(len(ranks)) сравнений, а не весь список; id и rank —
+    числа из БД, они подставляются в SQL литералами.
+    """
+    if not ranks:
+        return 'NULL'
+    if len(ranks) <= leaf_size:
+        whens = ' '.join(f'WHEN {pk:d} THEN {rank!r}' for pk, rank in ranks)
+        return f'CASE {column} {whens} END'
+    middle = len(ranks) // 2
+    return (
+        f'CASE WHEN {column} < {ranks[middle][0]:d} '
+        f'THEN {rank_case(column, ranks[:middle], leaf_size)} '
+        f'ELSE {rank_case(column, ranks[middle:], leaf_size)} END'
+    )
+
+
+class SQLiteFTSSearchBackend(SearchBackend):
+    name = 'sqlite_fts'
+
+    def __init__(self):
+        self._available = None
+
+    def is_available(self):
+        if connection.vendor != 'sqlite':
+            return False
+        if self._available is None:
+            names = [fts_table(table) for table in FTS_INDEXES]
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN (%s)"
+                    % ', '.join(['%s'] * len(names)),
+                    names,
+                )
+                self._available = cursor.fetchone()[0] == len(names)
+        return self._available
+
+    def _bm25(self, table):
+        weights = ', '.join(str(weight) for _, weight in FTS_INDEXES[table])
+        return f"bm25({fts_table(table)}, {weights})"
+
+    def _limit(self):
+        return getattr(settings, 'SEARCH_MAX_RESULTS', 1000)
+
+    def _ranked(self, queryset, matches, ranked, params, *ordering):
+        """
+        Ограничивает queryset совпадениями и аннотирует rank = -bm25.
+
+        Лучшие совпадения (id, score) выбираются отдельным запросом один
+        раз и подставляются в запрос страницы выражением rank_case: FTS
+        MATCH, bm25 и сортировка не повторяются для каждой найденной строки.
+
+        Args:
+            matches: SQL id всех совпавших объектов
+            ranked: SQL пар (id, score) лучших совпадений по возрастанию
+                score, с параметром LIMIT в конце
+            params: Параметры MATCH (одинаковые для matches и ranked)
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(ranked, params + [self._limit()])
+            top = sorted((int(pk), -float(score)) for pk, score in cursor.fetchall())
+        column = f'{queryset.model._meta.db_table}.id'
+        return (
+            queryset.filter(pk__in=RawSQL(matches, params))
+            .annotate(rank=RawSQL(rank_case(column, top), [], output_field=FloatField()))
+            .order_by(F('rank').desc(nulls_last=True), *ordering)
+        )
+
+    def _search_table(self, queryset, table, query, *ordering):
+        expression = match_expression(query)
+        if expression is None:
+            return queryset.none()
+        fts = fts_table(table)
+        matches = f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s"
+        ranked = (
+            f"SELECT rowid AS id, {self._bm25(table)} AS score FROM {fts} "
+            f"WHERE {fts} MATCH %s ORDER BY score LIMIT %s"
+        )
+        return self._ranked(queryset, matches, ranked, [expression], *ordering)
+
+    def search_articles(self, queryset, query, language=None):
+        columns = None
+        if language in SEARCH_CONFIGS:
+            columns = [f'{name}_{language}' for name, _ in DOCUMENT_FIELDS]
+        article_expression = match_expression(query, columns)
+        locale_expression = match_expression(query)
+        if article_expression is None:
+            return queryset.none()
+
+        article_fts = fts_table('articles_article')
+        locale_fts = fts_table('articles_articlelocale')
+        text_fts = fts_table('articles_articletext')
+        # Статья находится по своим полям, по полному тексту локализаций и по
+        # тексту PDF (язык не известен — без фильтра); берем лучший score
+        locale_filter = 'AND l.language = %s' if columns else ''
+        sources = [
+            ("rowid", self._bm25('articles_article'), f"{article_fts} WHERE {article_fts} MATCH %s"),
+            (
+                "l.article_id", self._bm25('articles_articlelocale'),
+                f"{locale_fts} JOIN articles_articlelocale l ON l.id = {locale_fts}.rowid"
+                f" WHERE {locale_fts} MATCH %s {locale_filter}",
+            ),
+            (
+                "t.article_id", self._bm25('articles_articletext'),
+                f"{text_fts} JOIN articles_articletext t ON t.id = {text_fts}.rowid"
+                f" WHERE {text_fts} MATCH %s AND t.status = 'done'",
+            ),
+        ]
+        matches = ' UNION '.join(f"SELECT {id_column} FROM {source}" for id_column, _, source in sources)
+        scores = ' UNION ALL '.join(
+            f"SELECT {id_column} AS id, {bm25} AS score FROM {source}" for id_column, bm25, source in sources
+        )
+        ranked = f"SELECT id, MIN(score) AS score FROM ({scores}) GROUP BY id ORDER BY score LIMIT %s"
+        params = [article_expression, locale_expression]
+        if columns:
+            params.append(language)
+        params.append(locale_expression)
+        return self._ranked(queryset, matches, ranked, params, '-created_at')
+
+    def search_news(self, queryset, query):
+        return self._search_table(queryset, 'core_news', query, '-published_at')
+
+    def search_pages(self, queryset, query):
+        return self._search_table(queryset, 'core_page', query)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            install(cursor)
+            total = 0
+            for table in FTS_INDEXES:
+                cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                total += cursor.fetchone()[0]
+        self._available = True
+        return total
@@ -0,0 +1,62 @@
+"""
+Инвалидация кэша публичных страниц (core.pagecache) и sitemap
+(core.sitemaps) при изменении контента и таблицы редиректов
+(core.redirects) при изменении Redirect.
+
+Теги сбрасываются после коммита транзакции, чтобы страница не успела
+закэшироваться со старыми данными между сохранением и коммитом.
+Массовые queryset.update() сигналов не вызывают — такие места
+(действия админки) инвалидируют теги сами.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from articles.models import Article
+from issues.models import Issue
+from . import conditional, pagecache, redirects, sitemaps
+from .models import News, Page, Redirect
+
+
+def article_tags(article):
+    return ['articles', f'article:{article.pk}', f'issue:{article.issue_id}']
+
+
+@receiver([post_save, post_delete], sender=Article)
+def article_changed(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    # Сохранение одних счетчиков не меняет содержимое страниц
+    if update_fields and set(update_fields) <= {'views', 'downloads'}:
+        return
+    pagecache.invalidate_on_commit(*article_tags(instance))
+    transaction.on_commit(sitemaps.mark_stale)
+
+
+@receiver([post_save, post_delete], sender=Issue)
+def issue_changed(sender, instance, **kwargs):
+    pagecache.invalidate_on_commit('issues', f'issue:{instance.pk}')
+    transaction.on_commit(sitemaps.mark_stale)
+
+
+@receiver([post_save, post_delete], sender=News)
+def news_changed(sender, instance, **kwargs):
+    pagecache.invalidate_on_commit('news')
+    transaction.on_commit(sitemaps.mark_stale)
+
+
+@receiver([post_save, post_delete], sender=Page)
+def page_changed(sender, instance, **kwargs):
+    pagecache.invalidate_on_commit(f'page:{instance.pk}')
+
+
+@receiver(post_delete, sender=Article)
+@receiver(post_delete, sender=Issue)
+@receiver(post_delete, sender=News)
+def content_deleted(sender, instance, **kwargs):
+    """Удаление может уменьшить max(updated_at) страницы — двигаем отметку (core.conditional)."""
+    transaction.on_commit(lambda: conditional.mark_deleted(sender))
+
+
+@receiver([post_save, post_delete], sender=Redirect)
+def redirect_changed(sender, instance, **kwargs):
+    transaction.on_commit(redirects.invalidate)
@@ -1,9 +1,46 @@
+"""
+Sitemap портала: индекс sitemap.xml и сжатые файлы разделов.
+
+Файлы строятся заранее в SITEMAP_ROOT: sitemap-<раздел>-<n>.xml.gz
+по SITEMAP_MAX_URLS адресов в каждом и индекс sitemap.xml со ссылками
+на них. Представления только отдают готовые файлы с ETag/Last-Modified
+и никогда не строят их сами: запросы sitemap идут от роботов, и
+пересборка в запросе держала бы воркер на время обхода всего архива.
+Элементы выбираются проекцией .only() и обходятся итератором, поэтому
+память не растет с числом статей.
+
+Изменение статей, выпусков и новостей помечает sitemap устаревшим
+(mark_stale) и запускает пересборку согласно SITEMAP_ON_CHANGE:
+'thread' — фоновым потоком процесса (изменения, пришедшие во время
+сборки, собираются следующим проходом), 'sync' — сразу (тесты), 'off' —
+только командой ``manage.py build_sitemaps`` (например, из cron с
+--if-stale).
+"""
+import filecmp
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
 from django.contrib.sitemaps import Sitemap
-from django.urls import reverse
+from django.db import connection
 from .models import News
 from articles.models import Article
 from issues.models import Issue
 
+STALE_MARKER = '.stale'
+INDEX_NAME = 'sitemap.xml'
+
+logger = logging.getLogger(__name__)
+
+_worker_lock = threading.Lock()
+_worker = None
+
 
 class NewsSitemap(Sitemap):
     changefreq = "daily"
@@ -11,13 +48,16 @@ class NewsSitemap(Sitemap):
 
     def items(self):
         try:
-            return News.objects.filter(is_published=True)
+            return News.objects.filter(is_published=True).only('pk', 'slug', 'updated_at').order_by('pk')
         except Exception:
             return []
 
     def location(self, obj):
         return f"/news/{obj.slug}/"
 
+    def lastmod(self, obj):
+        return obj.updated_at
+
 
 class ArticleSitemap(Sitemap):
     changefreq = "weekly"
@@ -25,13 +65,16 @@ class ArticleSitemap(Sitemap):
 
     def items(self):
         try:
-            return Article.objects.filter(status='published')
+            return Article.objects.filter(status='published').only('pk', 'slug', 'updated_at').order_by('pk')
         except Exception:
             return []
 
     def location(self, obj):
         return f"/articles/{obj.slug}/" if hasattr(obj, 'slug') and obj.slug else f"/articles/{obj.pk}/"
 
+    def lastmod(self, obj):
+        return obj.updated_at
+
 
 class IssueSitemap(Sitemap):
     changefreq = "weekly"
@@ -39,13 +82,16 @@ class IssueSitemap(Sitemap):
 
     def items(self):
         try:
-            return Issue.objects.filter(status='published')
+            return Issue.objects.filter(status='published').only('pk', 'year', 'number', 'updated_at').order_by('pk')
         except Exception:
             return []
 
     def location(self, obj):
         return f"/issues/{obj.year}/{obj.number}/"
 
+    def lastmod(self, obj):
+        return obj.updated_at
+
 
 SITEMAPS = {
     "news": NewsSitemap,
@@ -54,3 +100,215 @@ SITEMAPS = {
 }
 
 
+def sitemap_root():
+    return Path(getattr(settings, 'SITEMAP_ROOT', Path(settings.BASE_DIR) / 'var' / 'sitemaps'))
+
+
+def _max_urls():
+    return getattr(settings, 'SITEMAP_MAX_URLS', 50000)
+
+
+def _mode():
+    return getattr(settings, 'SITEMAP_ON_CHANGE', 'thread')
+
+
+def _absolute(location):
+    return getattr(settings, 'SITE_URL', 'http://localhost:8000').rstrip('/') + location
+
+
+def section_filename(section, page):
+    return f'sitemap-{section}-{page}.xml.gz'
+
+
+def _iter_items(sitemap):
+    items = sitemap.items()
+    return items.iterator(chunk_size=2000) if hasattr(items, 'iterator') else iter(items)
+
+
+class _SectionWriter:
+    """Пишет адреса раздела в gzip-файлы, начиная новый каждые SITEMAP_MAX_URLS адресов."""
+
+    def __init__(self, directory, section):
+        self.directory = directory
+        self.section = section
+        self.files = []
+        self._file = None
+        self._count = 0
+        self._lastmod = None
+
+    def _open(self):
+        name = section_filename(self.section, len(self.files) + 1)
+        # mtime=0: одинаковое содержимое дает одинаковые байты
+        self._file = gzip.GzipFile(self.directory / name, 'wb', mtime=0)
+        self._file.write(
+            b'<?xml version="1.0" encoding="UTF-8"?>\n'
+            b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        )
+        self.files.append([name, None])
+        self._count = 0
+
+    def _close(self):
+        self._file.write(b'</urlset>\n')
+        self._file.close()
+        self.files[-1][1] = self._lastmod
+        self._file = None
+        self._lastmod = None
+
+    def add(self, location, lastmod, changefreq, priority):
+        if self._file is None or self._count >= _max_urls():
+            if self._file is not None:
+                self._close()
+            self._open()
+        entry = f'<url><loc>{escape(_absolute(location))}</loc>'
+        if lastmod:
+            entry += f'<lastmod>{lastmod.date().isoformat()}</lastmod>'
+            if self._lastmod is None or lastmod > self._lastmod:
+                self._lastmod = lastmod
+        if changefreq:
+            entry += f'<changefreq>{changefreq}</changefreq>'
+        if priority is not None:
+            entry += f'<priority>{priority}</priority>'
+        self._file.write((entry + '</url>\n').encode('utf-8'))
+        self._count += 1
+
+    def finish(self):
+        if self._file is not None:
+            self._close()
+        return self.files
+
+
+def _install(source, target):
+    """Заменяет target на source; неизменившийся файл сохраняет mtime, а с ним ETag и Last-Modified."""
+    if target.exists() and filecmp.cmp(source, target, shallow=False):
+        return
+    os.replace(source, target)
+
+
+def write_sitemaps(directory=None):
+    """
+    Строит файлы разделов и индекс. Измененные файлы заменяются атомарно
+    (os.replace), устаревшие страницы разделов удаляются.
+
+    Returns:
+        Словарь {'files': n, 'urls': n}.
+    """
+    root = Path(directory) if directory else sitemap_root()
+    root.mkdir(parents=True, exist_ok=True)
+    # Публикации во время сборки снова пометят sitemap устаревшим
+    (root / STALE_MARKER).unlink(missing_ok=True)
+
+    workdir = Path(tempfile.mkdtemp(prefix='build-', dir=root))
+    try:
+        entries, urls = [], 0
+        for section, sitemap_class in SITEMAPS.items():
+            sitemap = sitemap_class()
+            writer = _SectionWriter(workdir, section)
+            for obj in _iter_items(sitemap):
+                writer.add(sitemap.location(obj), sitemap.lastmod(obj), sitemap.changefreq, sitemap.priority)
+                urls += 1
+            entries.extend(writer.finish())
+
+        index = ['<?xml version="1.0" encoding="UTF-8"?>',
+                 '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+        for name, lastmod in entries:
+            index.append(f'<sitemap><loc>{escape(_absolute("/" + name))}</loc>')
+            if lastmod:
+                index.append(f'<lastmod>{lastmod.isoformat(timespec="seconds")}</lastmod>')
+            index.append('</sitemap>')
+        index.append('</sitemapindex>\n')
+        (workdir / INDEX_NAME).write_text('\n'.join(index), encoding='utf-8')
+
+        names = {name for name, _ in entries}
+        for name in [*names, INDEX_NAME]:
+            _install(workdir / name, root / name)
+        for stale in root.glob('sitemap-*.xml.gz'):
+            if stale.name not in names:
+                stale.unlink(missing_ok=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {'files': len(entries), 'urls': urls}
+
+
+def is_stale(root=None):
+    root = Path(root) if root else sitemap_root()
+    return not (root / INDEX_NAME).exists() or (root / STALE_MARKER).exists()
+
+
+def _drain(root):
+    """Фоновый поток: пересобирает sitemap, пока он помечен устаревшим."""
+    global _worker
+    try:
+        while True:
+            with _worker_lock:
+                if not is_stale(root):
+                    _worker = None
+                    return
+            try:
+                write_sitemaps(root)
+            except Exception as e:
+                logger.error(f"Ошибка сборки sitemap: {e}")
+                return
+    finally:
+        with _worker_lock:
+            if _worker is threading.current_thread():
+                _worker = None
+        connection.close()
+
+
+def schedule_rebuild():
+    """Пересобирает sitemap согласно SITEMAP_ON_CHANGE; в режиме 'thread' не ждет сборки."""
+    global _worker
+    mode = _mode()
+    if mode == 'off':
+        return
+    root = sitemap_root()
+    if mode == 'sync':
+        write_sitemaps(root)
+        return
+    with _worker_lock:
+        if _worker is not None:
+            # Работающий поток увидит метку и соберет sitemap еще раз
+            return
+        _worker = threading.Thread(target=_drain, args=(root,), name='sitemaps', daemon=True)
+        _worker.start()
+
+
+def _touch_marker(root):
+    try:
+        root.mkdir(parents=True, exist_ok=True)
+        (root / STALE_MARKER).touch()
+    except OSError as e:
+        logger.error(f"Не удалось пометить sitemap устаревшим: {e}")
+        return False
+    return True
+
+
+def _rebuild():
+    try:
+        schedule_rebuild()
+    except Exception as e:
+        logger.error(f"Ошибка сборки sitemap: {e}")
+
+
+def mark_stale():
+    """Помечает sitemap устаревшим и планирует пересборку (SITEMAP_ON_CHANGE)."""
+    root = sitemap_root()
+    # Каталога еще нет — первую сборку запустит первый запрос sitemap
+    if not root.is_dir():
+        return
+    if _touch_marker(root):
+        _rebuild()
+
+
+def current():
+    """
+    Каталог с построенными файлами или None, если sitemap еще не собран
+    (тогда сборка запускается в фоне). Устаревшие файлы отдаются как есть.
+    """
+    root = sitemap_root()
+    if not (root / INDEX_NAME).exists():
+        if _touch_marker(root):
+            _rebuild()
+        if not (root / INDEX_NAME).exists():
+            return None
+    return root
@@ -0,0 +1,144 @@
+"""
+Сводная статистика портала для главной, списка статей, кабинетов и view_db.py.
+
+Все показатели считаются одним запросом (SELECT из скалярных подзапросов)
+и кэшируются на SITE_STATISTICS_TIMEOUT секунд. При публикации статей и
+сбросе счетчиков просмотров кэш инвалидируется через смену поколения
+ключей, так что вместе со сводкой сбрасывается и статистика авторов.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, router, transaction
+from django.db.models import Count, Func, IntegerField, Q, Sum
+from django.db.models.functions import Coalesce
+
+KEY_PREFIX = 'site-statistics'
+GENERATION_KEY = f'{KEY_PREFIX}:generation'
+
+
+class _Scalar(Func):
+    """Агрегатная функция без GROUP BY — запрос всегда возвращает одну строку."""
+    output_field = IntegerField()
+
+
+class _Sum(_Scalar):
+    function = 'SUM'
+
+
+class _CountAll(_Scalar):
+    template = 'COUNT(*)'
+
+
+def _cache():
+    return caches[getattr(settings, 'SITE_STATISTICS_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'SITE_STATISTICS_TIMEOUT', 60)
+
+
+def _generation(cache):
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, 1, None)
+        generation = cache.get(GENERATION_KEY, 1)
+    return generation
+
+
+def _key(cache, name):
+    return f'{KEY_PREFIX}:{_generation(cache)}:{name}'
+
+
+def _scalars():
+    """Имя показателя -> queryset, возвращающий одно число."""
+    from articles.models import Article
+    from core.models import News
+    from issues.models import Issue
+    from users.models import User
+
+    published = Article.objects.filter(status='published')
+
+    def count(queryset):
+        return queryset.order_by().values(value=_CountAll())
+
+    def total(queryset, field):
+        return queryset.order_by().values(value=Coalesce(_Sum(field), 0))
+
+    return {
+        'total_articles': count(published),
+        'total_views': total(published, 'views'),
+        'total_downloads': total(published, 'downloads'),
+        'total_authors': count(User.objects.filter(role='author')),
+        'all_articles': count(Article.objects.all()),
+        'all_views': total(Article.objects.all(), 'views'),
+        'all_downloads': total(Article.objects.all(), 'downloads'),
+        'total_issues': count(Issue.objects.all()),
+        'published_issues': count(Issue.objects.filter(status='published')),
+        'total_users': count(User.objects.all()),
+        'total_editors': count(User.objects.filter(role='editor')),
+        'total_reviewers': count(User.objects.filter(role='reviewer')),
+        'total_news': count(News.objects.all()),
+    }
+
+
+def compute():
+    """Считает сводку одним запросом к БД (без кэша)."""
+    from articles.models import Article
+
+    alias = router.db_for_read(Article)
+    connection = connections[alias]
+    columns, params = [], []
+    for name, queryset in _scalars().items():
+        sql, query_params = queryset.query.get_compiler(using=alias).as_sql()
+        columns.append(f'({sql}) AS {connection.ops.quote_name(name)}')
+        params.extend(query_params)
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT ' + ', '.join(columns), params)
+        row = cursor.fetchone()
+        names = [column[0] for column in cursor.description]
+    return {name: value or 0 for name, value in zip(names, row)}
+
+
+def site_statistics():
+    """
+    Сводка по порталу: total_articles, total_views, total_downloads,
+    total_authors (по опубликованным статьям и авторам), а также
+    all_articles, all_views, all_downloads (по всем статьям), total_issues,
+    published_issues, total_users, total_editors, total_reviewers, total_news.
+    """
+    cache = _cache()
+    key = _key(cache, 'site')
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute()
+        cache.set(key, stats, _timeout())
+    return stats
+
+
+def author_statistics(user):
+    """Статистика опубликованных статей автора одним агрегирующим запросом."""
+    cache = _cache()
+    key = _key(cache, f'author:{user.pk}')
+    stats = cache.get(key)
+    if stats is None:
+        stats = user.articles.order_by().aggregate(
+            total_articles=Count('pk', filter=Q(status='published')),
+            total_views=Coalesce(Sum('views', filter=Q(status='published')), 0),
+            total_downloads=Coalesce(Sum('downloads', filter=Q(status='published')), 0),
+        )
+        cache.set(key, stats, _timeout())
+    return stats
+
+
+def invalidate():
+    """Сбрасывает закэшированную статистику (сводку и статистику авторов)."""
+    cache = _cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 2, None)
+
+
+def invalidate_on_commit():
+    transaction.on_commit(invalidate)
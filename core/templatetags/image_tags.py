@@ -0,0 +1,59 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from core import images
+
+
+register = template.Library()
+
+
+def _name(field_file):
+    return getattr(field_file, 'name', None) or ''
+
+
+@register.simple_tag
+def image_srcset(field_file, fmt='webp'):
+    """
+    Значение srcset из уменьшенных копий (см. core.images):
+    {% image_srcset issue.cover_image 'jpg' %}. Пусто, если копий нет.
+    """
+    name = _name(field_file)
+    meta = images.source_meta(name) if name else None
+    if meta is None or fmt not in images.FORMATS:
+        return ''
+    return ', '.join(
+        f'{images.derivative_url(name, meta, preset, fmt)} {width}w'
+        for preset, width in images.variants(meta)
+    )
+
+
+@register.simple_tag
+def responsive_image(field_file, alt='', sizes='100vw', preset='md', css_class='', loading='lazy'):
+    """
+    <picture> с WebP и JPEG копиями вместо оригинала:
+    {% responsive_image issue.cover_image alt="Обложка" sizes="(min-width: 768px) 33vw, 100vw" css_class="card-img-top" %}
+
+    preset — копия для src браузеров без srcset; по ней же заданы width и
+    height, чтобы место под картинку резервировалось до загрузки.
+    Если копии построить нельзя, выводится оригинал.
+    """
+    name = _name(field_file)
+    if not name:
+        return ''
+    meta = images.source_meta(name)
+    if meta is None or preset not in images.presets():
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}">',
+            field_file.url, alt, css_class, loading,
+        )
+    width, height = images.target_size(meta, preset)
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        [(images.FORMATS['webp'][1], image_srcset(field_file, 'webp'), sizes)],
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" class="{}" '
+        'loading="{}" decoding="async"></picture>',
+        sources, images.derivative_url(name, meta, preset, 'jpg'), image_srcset(field_file, 'jpg'),
+        sizes, width, height, alt, css_class, loading,
+    )
@@ -1,7 +1,31 @@
-from django.test import TestCase, Client
+import gzip
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from core.models import News
+from core.models_extended import Event, EventDailyStat
+from core import analytics, events, images, oai, redirects, sitemaps, stats
+from core.models import Redirect
+from issues.models import Issue
+from articles.models import Article
+from articles import counters
+from articles.models_extended import ArticleFile
+from PIL import Image
 
 
 class UrlsSmokeTests(TestCase):
@@ -28,8 +52,807 @@ class UrlsSmokeTests(TestCase):
         self.assertIn('results', r.json())
 
     def test_sitemap(self):
-        r = self.client.get('/sitemap.xml')
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        with self.settings(SITEMAP_ROOT=root, SITEMAP_ON_CHANGE='sync'):
+            r = self.client.get('/sitemap.xml')
         self.assertEqual(r.status_code, 200)
-        self.assertIn(b'<urlset', r.content)
+        self.assertIn(b'<sitemapindex', b''.join(r.streaming_content))
 
 # Create your tests here.
+
+
+@override_settings(EVENTS_WRITER='sync')
+class FileDownloadTests(TestCase):
+    """Потоковая отдача файлов с Range и условными GET."""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        issue = Issue.objects.create(year=2025, number=1, title_ru="Выпуск", status='published')
+        article = Article.objects.create(
+            issue=issue, title_ru="Статья", abstract_ru="А", keywords_ru="к",
+            page_start=1, page_end=2, status='published',
+        )
+        self.file = ArticleFile.objects.create(
+            article=article,
+            file=SimpleUploadedFile("paper.pdf", b"%PDF-0123456789"),
+            original_name="Статья.pdf",
+            content_type='application/pdf',
+        )
+        self.url = reverse('core:file_download', kwargs={'pk': self.file.pk})
+
+    def test_full_download(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b"%PDF-0123456789")
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+        self.assertIn("filename*=utf-8''", response['Content-Disposition'])
+
+    def test_range_request(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5-8')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 5-8/15')
+        self.assertEqual(b''.join(response.streaming_content), b"0123")
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b"789")
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_conditional_get(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(Event.objects.filter(object_type='file', kind='download').count(), 1)
+
+    @override_settings(DOWNLOADS_SENDFILE_MODE='x-accel')
+    def test_accel_redirect(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.file.file.name)
+
+    def test_only_first_range_counts(self):
+        downloads = Event.objects.filter(object_type='file', kind='download')
+        for mode in ('', 'x-accel'):
+            with self.subTest(mode=mode), override_settings(DOWNLOADS_SENDFILE_MODE=mode):
+                downloads.delete()
+                self.client.get(self.url, HTTP_RANGE='bytes=0-4')
+                self.client.get(self.url, HTTP_RANGE='bytes=5-8')
+                self.client.get(self.url, HTTP_RANGE='bytes=-3')
+                # Несколько диапазонов отдаются целиком (200), но это тоже дочитывание
+                self.client.get(self.url, HTTP_RANGE='bytes=5-6,8-9')
+                self.assertEqual(downloads.count(), 1)
+
+
+@override_settings(SIMILAR_ARTICLES_ON_SAVE='sync')
+class SiteStatisticsTests(TestCase):
+    """Сводная статистика одним запросом с кэшем и инвалидацией."""
+
+    def setUp(self):
+        cache.clear()
+        self.issue = Issue.objects.create(year=2025, number=1, title_ru="Выпуск", status='published')
+        self.article = Article.objects.create(
+            issue=self.issue, title_ru="Статья", abstract_ru="А", keywords_ru="к",
+            page_start=1, page_end=2, status='published', views=5, downloads=2,
+        )
+        Article.objects.create(
+            issue=self.issue, title_ru="Черновик", abstract_ru="Б", keywords_ru="к",
+            page_start=3, page_end=4, status='draft', views=7,
+        )
+
+    def test_single_query_and_cache(self):
+        with self.assertNumQueries(1):
+            result = stats.site_statistics()
+        self.assertEqual(result['total_articles'], 1)
+        self.assertEqual(result['all_articles'], 2)
+        self.assertEqual(result['total_views'], 5)
+        self.assertEqual(result['total_downloads'], 2)
+        self.assertEqual(result['all_views'], 12)
+        self.assertEqual(result['published_issues'], 1)
+        with self.assertNumQueries(0):
+            stats.site_statistics()
+
+    def test_invalidated_on_publish_and_counter_flush(self):
+        stats.site_statistics()
+        draft = Article.objects.get(status='draft')
+        draft.status = 'published'
+        with self.captureOnCommitCallbacks(execute=True):
+            draft.save()
+        self.assertEqual(stats.site_statistics()['total_articles'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.article.increment_views()
+        counters.flush([self.article.pk])
+        self.assertEqual(stats.site_statistics()['total_views'], 13)
+
+    def test_home_uses_statistics(self):
+        response = self.client.get(reverse('core:home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_articles'], 1)
+        self.assertEqual(response.context['total_views'], 5)
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class PageCacheTests(TestCase):
+    """Кэш публичных страниц для анонимных посетителей."""
+
+    def setUp(self):
+        cache.clear()
+        issue = Issue.objects.create(year=2025, number=1, title_ru="Выпуск", status='published')
+        self.article = Article.objects.create(
+            issue=issue, title_ru="Статья", abstract_ru="А", keywords_ru="к",
+            page_start=1, page_end=2, status='published',
+        )
+        self.news = News.objects.create(
+            title='Первая новость', slug='first', content='x', is_published=True, published_at=timezone.now(),
+        )
+
+    # Выдача из кэша не обращается к БД (редиректы — таблица в памяти процесса)
+    CACHED_QUERIES = 0
+
+    def test_anonymous_page_is_cached_and_invalidated_on_save(self):
+        url = reverse('core:news_list')
+        self.assertContains(self.client.get(url), 'Первая новость')
+        with self.assertNumQueries(self.CACHED_QUERIES):
+            self.assertContains(self.client.get(url), 'Первая новость')
+
+        self.news.title = 'Исправленная новость'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.news.save()
+        self.assertContains(self.client.get(url), 'Исправленная новость')
+
+    def test_query_string_is_part_of_key(self):
+        url = reverse('core:news_list')
+        self.client.get(url)
+        with self.assertNumQueries(self.CACHED_QUERIES):
+            self.client.get(url)
+        self.assertEqual(self.client.get(url, {'featured': 'true'}).status_code, 200)
+        self.assertNotContains(self.client.get(url, {'featured': 'true'}), 'Первая новость')
+
+    def test_cached_article_page_still_counts_views(self):
+        url = self.article.get_absolute_url()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            # плюс запрос даты изменения статьи (core.conditional)
+            with self.assertNumQueries(self.CACHED_QUERIES + 1):
+                self.client.get(url)
+        self.assertEqual(counters.pending(self.article.pk)['views'], 2)
+
+    def test_authenticated_users_bypass_cache(self):
+        User = get_user_model()
+        editor = User.objects.create_user(username='editor', password='x', role='editor')
+        url = reverse('core:news_list')
+        self.client.get(url)
+        self.client.force_login(editor)
+        News.objects.filter(pk=self.news.pk).update(title='Черновой заголовок')
+        self.assertContains(self.client.get(url), 'Черновой заголовок')
+
+    def test_invalidation_during_render_is_not_served(self):
+        from django.contrib.auth.models import AnonymousUser
+        from django.test import RequestFactory
+        from core.pagecache import cache_anonymous_page, invalidate
+
+        renders = []
+
+        @cache_anonymous_page('news')
+        def view(request):
+            renders.append(request.path)
+            if len(renders) == 1:
+                # Новость сохранена, пока страница рендерилась
+                invalidate('news')
+            return HttpResponse(f'render {len(renders)}')
+
+        def get():
+            request = RequestFactory().get('/news-during-render/')
+            request.user = AnonymousUser()
+            return view(request).content
+
+        self.assertEqual(get(), b'render 1')
+        self.assertEqual(get(), b'render 2')
+        self.assertEqual(get(), b'render 2')
+
+
+class ConditionalGetTests(TestCase):
+    """ETag / Last-Modified и ответы 304 для публичных страниц."""
+
+    def setUp(self):
+        cache.clear()
+        self.issue = Issue.objects.create(year=2025, number=1, title_ru="Выпуск", status='published')
+        self.article = Article.objects.create(
+            issue=self.issue, title_ru="Статья", abstract_ru="А", keywords_ru="к",
+            page_start=1, page_end=2, status='published',
+        )
+
+    def test_article_not_modified(self):
+        url = self.article.get_absolute_url()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.templates, [])
+        self.assertEqual(counters.pending(self.article.pk)['views'], 1)
+
+        self.article.title_ru = "Новое название"
+        self.article.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        url = reverse('issues:issue_detail', kwargs={'year': 2025, 'number': 1})
+        etag = self.client.get(url)['ETag']
+        user = get_user_model().objects.create_user(username='reader', password='x')
+        self.client.force_login(user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+
+    def test_sitemap_if_modified_since(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        with self.settings(SITEMAP_ROOT=root, SITEMAP_ON_CHANGE='sync'):
+            response = self.client.get('/sitemap.xml')
+            self.assertEqual(response.status_code, 200)
+            response = self.client.get('/sitemap.xml', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_object_is_404(self):
+        self.assertEqual(self.client.get('/news/missing/').status_code, 404)
+
+    def test_bulk_admin_action_changes_validators(self):
+        from django.contrib import admin
+        from articles.admin import ArticleAdmin
+
+        url = reverse('issues:issue_detail', kwargs={'year': 2025, 'number': 1})
+        etag = self.client.get(url)['ETag']
+        model_admin = ArticleAdmin(Article, admin.site)
+        with mock.patch.object(model_admin, 'message_user'):
+            model_admin.reject_articles(None, Article.objects.filter(pk=self.article.pk))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_deletion_moves_last_modified_forward(self):
+        hour = timedelta(hours=1)
+        newer = Article.objects.create(
+            issue=self.issue, title_ru="Вторая", abstract_ru="А", keywords_ru="к",
+            page_start=3, page_end=4, status='published',
+        )
+        Article.objects.filter(pk=self.article.pk).update(updated_at=timezone.now() - 2 * hour)
+        Article.objects.filter(pk=newer.pk).update(updated_at=timezone.now() - hour)
+        Issue.objects.filter(pk=self.issue.pk).update(updated_at=timezone.now() - 3 * hour)
+        url = reverse('issues:issue_archive')
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            newer.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+
+
+@override_settings(EVENTS_WRITER='sync')
+class RedirectMiddlewareTests(TestCase):
+    """Редиректы старых OJS URL: префильтр без БД, поиск по индексу с LRU."""
+
+    def setUp(self):
+        cache.clear()
+        redirects.invalidate()
+        with self.captureOnCommitCallbacks(execute=True):
+            Redirect.objects.create(
+                old_url='https://jhdkz.org/index.php/jhd/article/view/12?lang=ru&a=1',
+                new_path='/articles/12/',
+            )
+
+    def test_matching_path_redirects(self):
+        response = self.client.get('/index.php/jhd/article/view/12/', {'a': '1', 'lang': 'ru'})
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response['Location'], '/articles/12/')
+        self.assertEqual(Event.objects.filter(kind='redirect').count(), 1)
+
+    def test_other_paths_skip_database(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/healthz').status_code, 200)
+        # Промах по старому пути — один запрос по индексу, дальше из LRU
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/index.php/jhd/article/view/13').status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/index.php/jhd/article/view/13').status_code, 404)
+
+    def test_percent_escapes_decoded_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Redirect.objects.create(
+                old_url='https://jhdkz.org/index.php/jhd/article/download/12/100%2541.pdf', new_path='/articles/12/pdf/',
+            )
+        response = self.client.get('/index.php/jhd/article/download/12/100%2541.pdf')
+        self.assertEqual((response.status_code, response['Location']), (301, '/articles/12/pdf/'))
+        self.assertEqual(self.client.get('/index.php/jhd/article/download/12/100A.pdf').status_code, 404)
+
+    def test_lookup_refreshes_after_change(self):
+        self.assertEqual(self.client.get('/index.php/jhd/issue/archive').status_code, 404)
+        with self.captureOnCommitCallbacks(execute=True):
+            Redirect.objects.create(
+                old_url='https://jhdkz.org/index.php/jhd/issue/archive', new_path='/issues/archive/', http_status=302,
+            )
+        response = self.client.get('/index.php/jhd/issue/archive')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], '/issues/archive/')
+
+    def test_old_url_outside_prefixes_rejected(self):
+        redirect = Redirect(old_url='https://jhdkz.org/about/', new_path='/pages/about/')
+        with self.assertRaises(ValidationError):
+            redirect.full_clean()
+
+
+class ImportRedirectsTests(TestCase):
+    """Пакетный импорт карты старых URL (import_redirects)."""
+
+    OLD = 'https://jhdkz.org/index.php/jhd/article/view/'
+
+    def setUp(self):
+        cache.clear()
+        redirects.invalidate()
+        Redirect.objects.create(old_url=self.OLD + '1', new_path='/articles/1/')
+        Redirect.objects.create(old_url=self.OLD + '2', new_path='/old/2/')
+        Redirect.objects.create(old_url=self.OLD + '3', new_path='/articles/3/')
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.csv = self.tmp / 'map.csv'
+        self.csv.write_text(
+            'old_url,new_path,http_status\n'
+            f'{self.OLD}1,/articles/1/,\n'
+            f'{self.OLD}2,/articles/2/,301\n'
+            f'{self.OLD}4,/articles/x/,301\n'
+            f'{self.OLD}4,/articles/4/,302\n'
+            f'{self.OLD}5,,301\n'
+            'https://jhdkz.org/about/,/pages/about/,301\n',
+            encoding='utf-8',
+        )
+
+    def _import(self, *args):
+        out = io.StringIO()
+        call_command('import_redirects', str(self.csv), '--chunk-size', '2', *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_bulk_upsert_counts_and_deactivation(self):
+        self.assertEqual(self.client.get('/index.php/jhd/article/view/4').status_code, 404)
+        with self.captureOnCommitCallbacks(execute=True):
+            output = self._import('--deactivate-missing')
+        self.assertIn(
+            'Создано: 1, обновлено: 1, без изменений: 1, повторов в файле: 1, пропущено строк: 2, выключено: 1',
+            output,
+        )
+        active = dict(Redirect.objects.filter(is_active=True).values_list('old_url', 'new_path'))
+        self.assertEqual(active, {
+            self.OLD + '1': '/articles/1/', self.OLD + '2': '/articles/2/', self.OLD + '4': '/articles/4/',
+        })
+        self.assertEqual(Redirect.objects.get(old_url=self.OLD + '4').http_status, 302)
+        # LRU процессов сброшен одним invalidate после коммита
+        response = self.client.get('/index.php/jhd/article/view/4')
+        self.assertEqual((response.status_code, response['Location']), (302, '/articles/4/'))
+        self.assertEqual(self.client.get('/index.php/jhd/article/view/3').status_code, 404)
+
+        output = self._import('--deactivate-missing')
+        self.assertIn('Создано: 0, обновлено: 0, без изменений: 3', output)
+
+    def test_dry_run_prints_diff_without_writing(self):
+        output = self._import('--dry-run', '--deactivate-missing')
+        self.assertIn(f'~ {self.OLD}2: /old/2/ (301) -> /articles/2/ (301)', output)
+        self.assertIn(f'+ {self.OLD}4 -> /articles/4/ (302)', output)
+        self.assertIn(f'- {self.OLD}3 -> /articles/3/ (301)', output)
+        self.assertIn('Пробный запуск', output)
+        self.assertEqual(Redirect.objects.count(), 3)
+        self.assertEqual(Redirect.objects.get(old_url=self.OLD + '2').new_path, '/old/2/')
+        self.assertTrue(Redirect.objects.get(old_url=self.OLD + '3').is_active)
+
+
+@override_settings(EVENTS_WRITER='thread', EVENTS_BUFFER_SIZE=3)
+class EventSinkTests(TestCase):
+    """Буферизованная запись событий."""
+
+    def setUp(self):
+        events.flush()
+        # Поток записи не запускаем: очередь сбрасывается в тесте явно
+        patcher = mock.patch.object(events, '_ensure_thread')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_events_are_buffered_until_flush(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            events.record('file', 1, 'download')
+            events.record('file', 2, 'download')
+        self.assertEqual(Event.objects.count(), 0)
+        self.assertEqual(events.flush(), 2)
+        self.assertEqual(Event.objects.filter(kind='download').count(), 2)
+
+    def test_rolled_back_events_are_not_queued(self):
+        events.record('file', 1, 'download')
+        self.assertEqual(events.stats()['queued'], 0)
+
+    def test_overflow_is_counted(self):
+        dropped = events.stats()['dropped']
+        with self.captureOnCommitCallbacks(execute=True):
+            for pk in range(5):
+                events.record('file', pk, 'download')
+        self.assertEqual(events.stats()['queued'], 3)
+        self.assertEqual(events.stats()['dropped'], dropped + 2)
+        self.assertEqual(events.flush(), 3)
+
+
+@override_settings(EVENTS_ROLLUP_SETTLE=0)
+class EventAnalyticsTests(TestCase):
+    """Суточные итоги событий и архивация старых событий."""
+
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir, ignore_errors=True)
+
+    def _event(self, object_id, ip, days_ago=0):
+        return Event.objects.create(
+            object_type='file', object_id=object_id, kind='download', ip=ip,
+            timestamp=timezone.now() - timedelta(days=days_ago),
+        )
+
+    def test_incremental_rollup(self):
+        self._event(1, '10.0.0.1')
+        self._event(1, '10.0.0.1')
+        self._event(1, '10.0.0.2')
+        self.assertEqual(analytics.rollup()['events'], 3)
+        stat = EventDailyStat.objects.get(object_id=1)
+        self.assertEqual((stat.count, stat.unique_ips), (3, 2))
+
+        self.assertEqual(analytics.rollup()['events'], 0)
+        self._event(1, '10.0.0.3')
+        self.assertEqual(analytics.rollup()['events'], 1)
+        stat.refresh_from_db()
+        self.assertEqual((stat.count, stat.unique_ips), (4, 3))
+
+    def test_prune_archives_only_rolled_up_events(self):
+        self._event(1, '10.0.0.1', days_ago=400)
+        analytics.rollup()
+        self._event(2, '10.0.0.2', days_ago=400)
+        self._event(3, '10.0.0.3')
+
+        totals = analytics.prune(days=180, directory=self.archive_dir, batch_size=1)
+        self.assertEqual(totals, {'archived': 1, 'deleted': 1})
+        self.assertEqual(sorted(Event.objects.values_list('object_id', flat=True)), [2, 3])
+
+        archives = list(Path(self.archive_dir).glob('events-*.jsonl.gz'))
+        self.assertEqual(len(archives), 1)
+        with gzip.open(archives[0], 'rt', encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual([row['object_id'] for row in rows], [1])
+
+    def test_rollup_waits_for_settle_interval(self):
+        from core.models_extended import Watermark
+
+        self._event(1, '10.0.0.1')
+        self._event(1, '10.0.0.2')
+        # Максимальный id только замечен: меньшие id могут быть еще не закоммичены
+        self.assertEqual(analytics.rollup(settle=60)['events'], 0)
+        self._event(1, '10.0.0.3')
+        self.assertEqual(analytics.rollup(settle=60)['events'], 0)
+
+        Watermark.objects.filter(name=analytics.SEEN_WATERMARK).update(
+            updated_at=timezone.now() - timedelta(seconds=61)
+        )
+        self.assertEqual(analytics.rollup(settle=60)['events'], 2)
+        self.assertEqual(EventDailyStat.objects.get(object_id=1).count, 3)
+
+    def test_prune_after_crash_does_not_duplicate_archive(self):
+        for i in range(5):
+            self._event(i, '10.0.0.1', days_ago=400)
+        analytics.rollup()
+        # Сбой после записи архива первого пакета, до удаления событий
+        rows = list(Event.objects.order_by('pk').values(*analytics.ARCHIVE_FIELDS)[:2])
+        analytics._archive(rows, Path(self.archive_dir))
+
+        totals = analytics.prune(days=180, directory=self.archive_dir, batch_size=2)
+        self.assertEqual(totals, {'archived': 5, 'deleted': 5})
+        archived = []
+        for path in Path(self.archive_dir).glob('events-*.jsonl.gz'):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                archived += [json.loads(line)['object_id'] for line in f]
+        self.assertEqual(sorted(archived), [0, 1, 2, 3, 4])
+
+
+@override_settings(SIMILAR_ARTICLES_ON_SAVE='sync')
+class SitemapTests(TestCase):
+    """Индекс sitemap и заранее построенные gzip-файлы разделов."""
+
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        settings_override = override_settings(
+            SITEMAP_ROOT=str(self.root), SITEMAP_MAX_URLS=2, SITE_URL='https://jhd.kz', SITEMAP_ON_CHANGE='sync',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.issue = Issue.objects.create(year=2025, number=1, title_ru="Выпуск", status='published')
+        for i in range(3):
+            Article.objects.create(
+                issue=self.issue, title_ru=f"Статья {i}", abstract_ru="А", keywords_ru="к",
+                page_start=1, page_end=2, status='published',
+            )
+        Article.objects.create(
+            issue=self.issue, title_ru="Черновик", abstract_ru="А", keywords_ru="к",
+            page_start=1, page_end=2, status='draft',
+        )
+
+    def _section(self, name):
+        with gzip.open(self.root / name) as f:
+            return f.read().decode('utf-8')
+
+    def test_sections_split_by_max_urls(self):
+        totals = sitemaps.write_sitemaps()
+        self.assertEqual(totals, {'files': 3, 'urls': 4})
+
+        index = (self.root / 'sitemap.xml').read_text(encoding='utf-8')
+        self.assertIn('<loc>https://jhd.kz/sitemap-articles-1.xml.gz</loc>', index)
+        self.assertIn('<loc>https://jhd.kz/sitemap-articles-2.xml.gz</loc>', index)
+        self.assertIn('<loc>https://jhd.kz/sitemap-issues-1.xml.gz</loc>', index)
+        self.assertNotIn('sitemap-news-1', index)
+
+        first, second = self._section('sitemap-articles-1.xml.gz'), self._section('sitemap-articles-2.xml.gz')
+        self.assertEqual(first.count('<url>'), 2)
+        self.assertEqual(second.count('<url>'), 1)
+        self.assertIn('<lastmod>', first)
+        self.assertNotIn('Черновик', first + second)
+        self.assertIn('https://jhd.kz/issues/2025/1/', self._section('sitemap-issues-1.xml.gz'))
+
+    def test_stale_pages_removed(self):
+        sitemaps.write_sitemaps()
+        Article.objects.filter(status='published').first().delete()
+        sitemaps.write_sitemaps()
+        self.assertFalse((self.root / 'sitemap-articles-2.xml.gz').exists())
+        self.assertNotIn('sitemap-articles-2', (self.root / 'sitemap.xml').read_text(encoding='utf-8'))
+
+    def test_publish_rebuilds(self):
+        self.client.get('/sitemap.xml')
+        with self.captureOnCommitCallbacks(execute=True):
+            Article.objects.create(
+                issue=self.issue, title_ru="Новая", abstract_ru="А", keywords_ru="к",
+                page_start=1, page_end=2, status='published',
+            )
+        self.assertFalse((self.root / sitemaps.STALE_MARKER).exists())
+        self.assertTrue((self.root / 'sitemap-articles-2.xml.gz').exists())
+        self.assertEqual(self._section('sitemap-articles-2.xml.gz').count('<url>'), 2)
+
+    @override_settings(SITEMAP_ON_CHANGE='off')
+    def test_request_does_not_rebuild(self):
+        response = self.client.get('/sitemap.xml')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertTrue((self.root / sitemaps.STALE_MARKER).exists())
+
+        sitemaps.write_sitemaps()
+        with self.captureOnCommitCallbacks(execute=True):
+            Article.objects.create(
+                issue=self.issue, title_ru="Новая", abstract_ru="А", keywords_ru="к",
+                page_start=1, page_end=2, status='published',
+            )
+        self.assertTrue(sitemaps.is_stale())
+        # Робот получает прежние файлы, сборка остается команде
+        self.assertEqual(self.client.get('/sitemap.xml').status_code, 200)
+        self.assertEqual(self._section('sitemap-articles-2.xml.gz').count('<url>'), 1)
+
+        call_command('build_sitemaps', '--if-stale', stdout=io.StringIO())
+        self.assertFalse(sitemaps.is_stale())
+        self.assertEqual(self._section('sitemap-articles-2.xml.gz').count('<url>'), 2)
+
+    def test_section_view(self):
+        response = self.client.get('/sitemap-articles-1.xml.gz')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn(b'<urlset', gzip.decompress(b''.join(response.streaming_content)))
+
+        response = self.client.get('/sitemap-articles-1.xml.gz', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get('/sitemap-articles-9.xml.gz').status_code, 404)
+        self.assertEqual(self.client.get('/sitemap-unknown-1.xml.gz').status_code, 404)
+
+    def test_unchanged_files_keep_etag(self):
+        etag = self.client.get('/sitemap-issues-1.xml.gz')['ETag']
+        sitemaps.mark_stale()
+        self.client.get('/sitemap.xml')
+        self.assertEqual(self.client.get('/sitemap-issues-1.xml.gz')['ETag'], etag)
+
+
+@override_settings(OAI_PAGE_SIZE=2, SITE_URL='https://jhd.kz')
+class OAIPMHTests(TestCase):
+    """OAI-PMH: глаголы, форматы и keyset resumptionToken."""
+
+    NS = {
+        'oai': 'http://www.openarchives.org/OAI/2.0/',
+        'dc': 'http://purl.org/dc/elements/1.1/',
+        'jats': 'http://jats.nlm.nih.gov',
+    }
+
+    def setUp(self):
+        self.issue = Issue.objects.create(year=2025, number=1, title_ru="Выпуск", status='published')
+        self.author = get_user_model().objects.create_user(
+            username='author', password='x', first_name='Иван', last_name='Петров', orcid='0000-0001-2345-6789',
+        )
+        self.articles = []
+        for i in range(5):
+            article = Article.objects.create(
+                issue=self.issue, title_ru=f"Статья {i}", title_en=f"Article {i}", abstract_ru="Аннотация\x0b",
+                keywords_ru="здоровье; питание", page_start=1, page_end=2, status='published', doi=f'10.1/{i}',
+            )
+            article.authors.add(self.author)
+            self.articles.append(article)
+        Article.objects.create(
+            issue=self.issue, title_ru="Черновик", abstract_ru="А", keywords_ru="к",
+            page_start=1, page_end=2, status='draft',
+        )
+
+    def _get(self, **params):
+        from xml.etree import ElementTree
+
+        response = self.client.get('/oai', params)
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return ElementTree.fromstring(content)
+
+    def _error(self, root):
+        error = root.find('oai:error', self.NS)
+        return error.get('code') if error is not None else None
+
+    def test_identify(self):
+        root = self._get(verb='Identify')
+        self.assertEqual(root.find('oai:Identify/oai:baseURL', self.NS).text, 'https://jhd.kz/oai')
+        self.assertEqual(root.find('oai:Identify/oai:granularity', self.NS).text, 'YYYY-MM-DDThh:mm:ssZ')
+
+    def test_list_records_resumes_by_keyset(self):
+        seen = []
+        root = self._get(verb='ListRecords', metadataPrefix='oai_dc')
+        while True:
+            records = root.findall('oai:ListRecords/oai:record', self.NS)
+            seen += [record.find('oai:header/oai:identifier', self.NS).text for record in records]
+            token = root.find('oai:ListRecords/oai:resumptionToken', self.NS)
+            if token is None or not token.text:
+                break
+            self.assertLessEqual(len(records), 2)
+            root = self._get(verb='ListRecords', resumptionToken=token.text)
+        self.assertEqual(seen, [oai.identifier(article.pk) for article in self.articles])
+
+    def test_list_records_query_count_is_constant(self):
+        # Таблица редиректов процесса загружается первым запросом
+        self._get(verb='Identify')
+        # Страница статей, авторы и SiteSettings — независимо от позиции курсора
+        with self.assertNumQueries(3):
+            self._get(verb='ListRecords', metadataPrefix='jats')
+        with self.assertNumQueries(3):
+            self._get(verb='ListRecords', resumptionToken=oai.encode_token('jats', None, None, self.articles[2]))
+
+    def test_get_record_formats(self):
+        article = self.articles[0]
+        root = self._get(verb='GetRecord', metadataPrefix='oai_dc', identifier=oai.identifier(article.pk))
+        dc = root.find('.//{http://www.openarchives.org/OAI/2.0/oai_dc/}dc')
+        self.assertEqual(dc.find('dc:creator', self.NS).text, 'Петров, Иван')
+        self.assertIn('https://doi.org/10.1/0', [e.text for e in dc.findall('dc:identifier', self.NS)])
+        self.assertEqual([e.text for e in dc.findall('dc:subject', self.NS)], ['здоровье', 'питание'])
+        self.assertEqual(dc.find('dc:description', self.NS).text, 'Аннотация')
+
+        root = self._get(verb='GetRecord', metadataPrefix='jats', identifier=oai.identifier(article.pk))
+        meta = root.find('.//jats:article-meta', self.NS)
+        self.assertEqual(meta.find('jats:title-group/jats:article-title', self.NS).text, 'Статья 0')
+        self.assertEqual(meta.find('jats:contrib-group/jats:contrib/jats:name/jats:surname', self.NS).text, 'Петров')
+        self.assertEqual(meta.find('jats:fpage', self.NS).text, '1')
+
+    def test_errors(self):
+        self.assertEqual(self._error(self._get(verb='Nope')), 'badVerb')
+        self.assertEqual(self._error(self._get(verb='ListRecords')), 'badArgument')
+        self.assertEqual(self._error(self._get(verb='ListRecords', metadataPrefix='marc')), 'cannotDisseminateFormat')
+        self.assertEqual(self._error(self._get(verb='ListRecords', resumptionToken='garbage')), 'badResumptionToken')
+        self.assertEqual(self._error(self._get(verb='ListSets')), 'noSetHierarchy')
+        self.assertEqual(
+            self._error(self._get(verb='ListIdentifiers', metadataPrefix='oai_dc', **{'from': '2000-01-01', 'until': '2000-12-31'})),
+            'noRecordsMatch',
+        )
+        draft = Article.objects.get(status='draft')
+        self.assertEqual(
+            self._error(self._get(verb='GetRecord', metadataPrefix='oai_dc', identifier=oai.identifier(draft.pk))),
+            'idDoesNotExist',
+        )
+
+
+def make_image(width, height, fmt='PNG', mode='RGB'):
+    buffer = io.BytesIO()
+    Image.new(mode, (width, height), 'teal').save(buffer, fmt)
+    return buffer.getvalue()
+
+
+class ImageDerivativeTests(TestCase):
+    """Уменьшенные копии обложек: тег srcset, построение по запросу и прогрев."""
+
+    def setUp(self):
+        self.media = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=str(self.media), IMAGE_PRESETS={'sm': 320, 'md': 640, 'lg': 1280})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        self.issue = Issue.objects.create(
+            year=2025, number=1, title_ru="Выпуск", status='published',
+            cover_image=SimpleUploadedFile('cover.png', make_image(1000, 1500), content_type='image/png'),
+        )
+
+    def _render(self, **kwargs):
+        template = Template(
+            '{% load image_tags %}{% responsive_image issue.cover_image alt="Обложка" css_class="card-img-top" %}'
+        )
+        return template.render(Context({'issue': self.issue}))
+
+    def test_tag_renders_picture_with_srcset(self):
+        html = self._render()
+        meta = images.source_meta(self.issue.cover_image.name)
+        self.assertIn('<picture><source type="image/webp"', html)
+        # Пресет шире оригинала заменяется копией в размер оригинала
+        self.assertIn(' 320w, ', html)
+        self.assertIn(' 1000w"', html)
+        self.assertNotIn('1280w', html)
+        self.assertIn('width="640" height="960"', html)
+        self.assertIn(f'?v={meta["sha256"][:12]}', html)
+        self.assertNotIn(self.issue.cover_image.url + '"', html)
+
+    def test_view_builds_derivative_once(self):
+        url = reverse('core:image_derivative', kwargs={
+            'preset': 'md', 'fmt': 'webp', 'source': self.issue.cover_image.name,
+        })
+        meta = images.source_meta(self.issue.cover_image.name)
+        response = self.client.get(url, {'v': meta['sha256'][:12]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (640, 960)))
+
+        path = self.media / images.derivative_name(meta, 'md', 'webp')
+        mtime = path.stat().st_mtime_ns
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(path.stat().st_mtime_ns, mtime)
+        # Готовая копия отдается из MEDIA напрямую, без view
+        self.assertIn(f'/media/{images.derivative_name(meta, "md", "webp")} 640w', self._render())
+
+    def test_jpeg_flattens_transparency(self):
+        name = 'news/logo.png'
+        (self.media / 'news').mkdir()
+        (self.media / name).write_bytes(make_image(400, 200, mode='RGBA'))
+        meta, path = images.ensure(name, 'sm', 'jpg')
+        with Image.open(path) as image:
+            self.assertEqual((image.format, image.mode, image.size), ('JPEG', 'RGB', (320, 160)))
+
+    def test_view_rejects_foreign_paths_and_falls_back_for_broken_images(self):
+        kwargs = {'preset': 'md', 'fmt': 'webp'}
+        for source in ('articles/pdfs/a.pdf', 'issues/covers/../../settings.py', 'issues/covers/missing.png'):
+            url = reverse('core:image_derivative', kwargs={**kwargs, 'source': source})
+            self.assertEqual(self.client.get(url).status_code, 404, source)
+        url = reverse('core:image_derivative', kwargs={**kwargs, 'fmt': 'gif', 'source': self.issue.cover_image.name})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        (self.media / 'issues/covers/broken.png').write_bytes(b'not an image')
+        url = reverse('core:image_derivative', kwargs={**kwargs, 'source': 'issues/covers/broken.png'})
+        response = self.client.get(url)
+        self.assertRedirects(response, '/media/issues/covers/broken.png', fetch_redirect_response=False)
+
+    def test_warm_command_builds_and_prunes(self):
+        stale = self.media / 'derivatives' / 'ab' / ('ab' * 32 + '-md-640.webp')
+        stale.parent.mkdir(parents=True)
+        stale.write_bytes(b'old')
+        out = io.StringIO()
+        call_command('warm_image_derivatives', '--prune', stdout=out)
+        # 3 ширины (320, 640, 1000) x 2 формата
+        self.assertIn('Построено: 6', out.getvalue())
+        self.assertIn('Удалено устаревших копий: 1', out.getvalue())
+        self.assertFalse(stale.exists())
+
+        out = io.StringIO()
+        call_command('warm_image_derivatives', stdout=out)
+        self.assertIn('Построено: 0, уже были: 6', out.getvalue())
@@ -1,7 +1,5 @@
 from django.urls import path
-from django.contrib.sitemaps import views as sitemap_views
 from . import views
-from .sitemaps import SITEMAPS
 
 app_name = 'core'
 
@@ -24,15 +22,20 @@ urlpatterns = [
 
     # Файлы
     path('files/<int:pk>/download/', views.file_download, name='file_download'),
+    path('images/<slug:preset>/<slug:fmt>/<path:source>', views.image_derivative, name='image_derivative'),
 
     # Поиск
     path('search/', views.search_page, name='search'),
     path('api/search', views.api_search, name='api_search'),
 
     # Sitemap и robots
-    path('sitemap.xml', sitemap_views.sitemap, {"sitemaps": SITEMAPS}, name='django.contrib.sitemaps.views.sitemap'),
+    path('sitemap.xml', views.sitemap_index, name='sitemap'),
+    path('sitemap-<slug:section>-<int:page>.xml.gz', views.sitemap_section, name='sitemap_section'),
     path('robots.txt', views.robots_txt, name='robots_txt'),
 
+    # OAI-PMH
+    path('oai', views.oai_pmh, name='oai'),
+
     # Healthcheck
     path('healthz', views.healthz, name='healthz'),
     
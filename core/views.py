@@ -1,42 +1,41 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.views.generic import ListView, DetailView, TemplateView
-from django.db.models import Sum, Count, Q
-from django.http import JsonResponse, HttpResponse, FileResponse, Http404
+from django.utils.decorators import method_decorator
+from django.db.models import Sum, Count, Max, Q
+from django.http import JsonResponse, HttpResponse, Http404
 from django.conf import settings
+from django.core.files.storage import default_storage
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
 from .models import SiteSettings, News, Page
 from issues.models import Issue
 from articles.models import Article
 from users.models import User
-from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
-from django.db import connection
 from articles.models_extended import ArticleFile
-from core.models_extended import Event
-import os
+from core import events
+from core.search import get_backend
+from core.downloads import serve_file, serve_path, is_new_download
+from core import images, oai, sitemaps
+from core.stats import site_statistics
+from core.pagecache import cache_anonymous_page, tag
+from core.conditional import conditional_page, deleted_at, latest
 
 
+@cache_anonymous_page('articles', 'issues', 'news')
 def home(request):
     """Главная страница."""
-    # Получаем статистику
-    total_articles = Article.objects.filter(status='published').count()
-    total_authors = User.objects.filter(role='author').count()
-    total_views = Article.objects.filter(status='published').aggregate(total=Sum('views'))['total'] or 0
-    total_downloads = Article.objects.filter(status='published').aggregate(total=Sum('downloads'))['total'] or 0
-    
     # Последние статьи
     latest_articles = Article.objects.filter(status='published').select_related('issue').prefetch_related('authors').order_by('-created_at')[:6]
     
     # Последние выпуски
-    latest_issues = Issue.objects.filter(status='published').order_by('-published_at')[:3]
+    latest_issues = Issue.objects.published().with_article_counts().order_by('-published_at')[:3]
     
     # Рекомендуемые новости
     featured_news = News.objects.filter(is_published=True, is_featured=True).order_by('-published_at')[:3]
     
     context = {
-        'total_articles': total_articles,
-        'total_authors': total_authors,
-        'total_views': total_views,
-        'total_downloads': total_downloads,
+        **site_statistics(),
         'latest_articles': latest_articles,
         'latest_issues': latest_issues,
         'featured_news': featured_news,
@@ -57,6 +56,7 @@ def contact(request):
     
     return render(request, 'core/contact.html')
 
+@method_decorator(cache_anonymous_page('news'), name='dispatch')
 class NewsListView(ListView):
     """Список новостей."""
     model = News
@@ -79,6 +79,20 @@ class NewsListView(ListView):
         context['featured_news'] = News.objects.filter(is_published=True, is_featured=True).order_by('-published_at')[:3]
         return context
 
+def _news_last_modified(request, slug):
+    """На странице новости есть списки других новостей — берем последнее изменение по всем."""
+    stats = News.objects.aggregate(
+        latest=Max('updated_at'),
+        found=Count('pk', filter=Q(slug=slug, is_published=True)),
+    )
+    return latest(stats['latest'], deleted_at(News)) if stats['found'] else None
+
+
+def _page_last_modified(request, slug):
+    return Page.objects.filter(slug=slug, is_published=True).aggregate(latest=Max('updated_at'))['latest']
+
+
+@method_decorator(conditional_page(_news_last_modified), name='dispatch')
 class NewsDetailView(DetailView):
     """Детальная страница новости."""
     model = News
@@ -111,6 +125,7 @@ class NewsDetailView(DetailView):
         context['featured_news'] = featured_news
         return context
 
+@method_decorator([conditional_page(_page_last_modified), cache_anonymous_page()], name='dispatch')
 class PageDetailView(DetailView):
     """Детальная страница статической страницы."""
     model = Page
@@ -120,6 +135,10 @@ class PageDetailView(DetailView):
     
     def get_queryset(self):
         return Page.objects.filter(is_published=True)
+    
+    def get_context_data(self, **kwargs):
+        tag(self.request, f'page:{self.object.pk}')
+        return super().get_context_data(**kwargs)
 
 
 def author_detail(request, slug):
@@ -134,37 +153,89 @@ def author_detail(request, slug):
 def file_download(request, pk):
     """
     Скачивание файла по pk.
-    Поддерживает файлы из ArticleFile и других источников.
+    Потоковая отдача с поддержкой Range и условных GET (см. core.downloads).
     """
     try:
-        file_obj = ArticleFile.objects.get(pk=pk)
-        
-        # Логируем событие загрузки
-        Event.objects.create(
-            object_type='file',
-            object_id=file_obj.pk,
-            kind='download',
-            ip=request.META.get('REMOTE_ADDR'),
-            user_agent=request.META.get('HTTP_USER_AGENT', '')[:500],
-        )
+        file_obj = ArticleFile.objects.select_related('article').get(pk=pk)
+    except ArticleFile.DoesNotExist:
+        raise Http404("Файл не найден")
+    
+    response = serve_file(
+        request,
+        file_obj.file,
+        content_type=file_obj.content_type or 'application/octet-stream',
+        filename=file_obj.original_name,
+    )
+    
+    if is_new_download(request, response):
+        # Логируем событие загрузки (запись в БД — в фоне, см. core.events)
+        events.record('file', file_obj.pk, 'download', request)
         
         # Увеличиваем счетчик загрузок у статьи
         if file_obj.article:
             file_obj.article.increment_downloads()
-        
-        # Отдаем файл
-        if not os.path.exists(file_obj.file.path):
-            raise Http404("Файл не найден на диске")
-        
-        response = FileResponse(
-            open(file_obj.file.path, 'rb'),
-            content_type=file_obj.content_type or 'application/octet-stream'
-        )
-        response['Content-Disposition'] = f'attachment; filename="{file_obj.original_name}"'
-        return response
     
-    except ArticleFile.DoesNotExist:
-        raise Http404("Файл не найден")
+    return response
+
+
+def _sitemap_not_ready():
+    """Sitemap еще собирается в фоне: роботы повторят запрос позже."""
+    response = HttpResponse("Sitemap еще не построен", status=503, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = '60'
+    return response
+
+
+def sitemap_index(request):
+    """Индекс sitemap.xml (файлы строит core.sitemaps)."""
+    root = sitemaps.current()
+    if root is None:
+        return _sitemap_not_ready()
+    return serve_path(request, root / sitemaps.INDEX_NAME, content_type='application/xml')
+
+
+def sitemap_section(request, section, page):
+    """Сжатый файл раздела sitemap-<раздел>-<n>.xml.gz."""
+    if section not in sitemaps.SITEMAPS:
+        raise Http404("Раздел sitemap не найден")
+    root = sitemaps.current()
+    if root is None:
+        return _sitemap_not_ready()
+    return serve_path(request, root / sitemaps.section_filename(section, page), content_type='application/gzip')
+
+
+def image_derivative(request, preset, fmt, source):
+    """
+    Уменьшенная копия изображения (см. core.images); строится при первом
+    запросе. Если оригинал не читается как изображение — редирект на него.
+    """
+    if preset not in images.presets() or fmt not in images.FORMATS:
+        raise Http404("Неизвестный размер или формат")
+    if not images.is_allowed_source(source):
+        raise Http404("Изображение не найдено")
+    try:
+        found = images.ensure(source, preset, fmt)
+    except images.DerivativeError:
+        found = None
+    if found is None:
+        if default_storage.exists(source):
+            return redirect(default_storage.url(source))
+        raise Http404("Изображение не найдено")
+    meta, path = found
+    response = serve_path(
+        request, path, content_type=images.FORMATS[fmt][1],
+        media_name=images.derivative_name(meta, preset, fmt),
+    )
+    if request.GET.get('v') == meta['sha256'][:12]:
+        # Адрес с версией содержимого не меняет ответа
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+def oai_pmh(request):
+    """OAI-PMH для харвестеров (см. core.oai); протокол допускает и POST."""
+    return oai.respond(request)
 
 
 def robots_txt(request):
@@ -177,33 +248,44 @@ def healthz(request):
     return JsonResponse({"status": "ok"})
 
 
+def _search(q, limit=20):
+    """Ищет опубликованные статьи, новости и страницы через текущий поисковый бэкенд."""
+    backend = get_backend()
+    articles = backend.search_articles(
+        Article.objects.filter(status='published').select_related('issue'), q
+    )[:limit]
+    news = backend.search_news(News.objects.filter(is_published=True), q)[:limit]
+    pages = backend.search_pages(Page.objects.filter(is_published=True), q)[:limit]
+    return articles, news, pages
+
+
+def _article_url(article):
+    return f"/articles/{article.slug}/" if article.slug else f"/articles/{article.pk}/"
+
+
 def search_page(request):
     """Страница поиска. Использует простую строку q и шаблон core/search.html."""
     q = request.GET.get('q', '')
     results = []
     if q:
-        # Простой fallback-поиск для dev (SQLite): icontains по нескольким моделям
-        articles_qs = Article.objects.filter(
-            Q(title_ru__icontains=q) | Q(abstract_ru__icontains=q)
-        )[:20]
-        news_qs = News.objects.filter(Q(title__icontains=q) | Q(content__icontains=q))[:20]
+        articles, news, pages = _search(q)
         results.extend([
-            {
-                "type": "article",
-                "title": a.get_title('ru'),
-                "url": f"/articles/{a.slug}/" if hasattr(a, 'slug') and a.slug else f"/articles/{a.pk}/"
-            }
-            for a in articles_qs
+            {"type": "article", "title": a.get_title('ru'), "url": _article_url(a)}
+            for a in articles
         ])
         results.extend([
             {"type": "news", "title": n.title, "url": f"/news/{n.slug}/"}
-            for n in news_qs
+            for n in news
+        ])
+        results.extend([
+            {"type": "page", "title": p.title, "url": f"/{p.slug}/"}
+            for p in pages
         ])
     return render(request, 'core/search.html', {"query": q, "results": results})
 
 
 def api_search(request):
-    """API поиска. Если доступен Postgres, используем tsvector, иначе icontains.
+    """API поиска через поисковый бэкенд (Postgres tsvector, SQLite FTS5 или icontains).
     Возвращает JSON {type, title, url, snippet}.
     """
     q = request.GET.get('q', '')
@@ -211,54 +293,31 @@ def api_search(request):
     if not q:
         return JsonResponse({"results": items})
 
-    is_postgres = connection.vendor == 'postgresql'
-
-    if is_postgres:
-        try:
-            # Полнотекстовый поиск по статьям: заголовки и аннотация RU
-            vector = SearchVector('title_ru', weight='A') + SearchVector('abstract_ru', weight='B')
-            query = SearchQuery(q)
-            art = (
-                Article.objects.annotate(rank=SearchRank(vector, query))
-                .filter(rank__gte=0.1, status='published')
-                .order_by('-rank')[:20]
-            )
-            for a in art:
-                items.append({
-                    "type": "article",
-                    "title": a.get_title('ru'),
-                    "url": f"/articles/{a.slug}/" if hasattr(a, 'slug') and a.slug else f"/articles/{a.pk}/",
-                    "snippet": a.get_abstract('ru')[:200],
-                    "issue": {
-                        "year": a.issue.year if a.issue else None,
-                        "number": a.issue.number if a.issue else None,
-                    }
-                })
-        except Exception:
-            # Fallback на icontains
-            pass
-
-    if not items:
-        # Fallback: icontains статьи и новости
-        for a in Article.objects.filter(
-            Q(title_ru__icontains=q) | Q(abstract_ru__icontains=q), status='published'
-        ).select_related('issue')[:20]:
-            items.append({
-                "type": "article",
-                "title": a.get_title('ru'),
-                "url": f"/articles/{a.slug}/" if hasattr(a, 'slug') and a.slug else f"/articles/{a.pk}/",
-                "snippet": a.get_abstract('ru')[:200],
-                "issue": {
-                    "year": a.issue.year if a.issue else None,
-                    "number": a.issue.number if a.issue else None,
-                }
-            })
-        for n in News.objects.filter(Q(title__icontains=q) | Q(content__icontains=q))[:20]:
-            items.append({
-                "type": "news",
-                "title": n.title,
-                "url": f"/news/{n.slug}/",
-                "snippet": (n.excerpt or n.content)[:200]
-            })
+    articles, news, pages = _search(q)
+    for a in articles:
+        items.append({
+            "type": "article",
+            "title": a.get_title('ru'),
+            "url": _article_url(a),
+            "snippet": a.get_abstract('ru')[:200],
+            "issue": {
+                "year": a.issue.year if a.issue else None,
+                "number": a.issue.number if a.issue else None,
+            }
+        })
+    for n in news:
+        items.append({
+            "type": "news",
+            "title": n.title,
+            "url": f"/news/{n.slug}/",
+            "snippet": (n.excerpt or n.content)[:200]
+        })
+    for p in pages:
+        items.append({
+            "type": "page",
+            "title": p.title,
+            "url": f"/{p.slug}/",
+            "snippet": p.content[:200]
+        })
 
     return JsonResponse({"results": items})
@@ -0,0 +1,120 @@
+"""
+Сравнение скорости нормализации HTML на записанных страницах.
+
+Страницы берутся из вывода crawl (JSONL) и хранилища тел (etl.blobstore)
+и заранее читаются в память, поэтому измеряется только разбор. Базовая
+линия — прежняя реализация на BeautifulSoup (clean_html + extract_text,
+два разбора страницы); она ломалась на корне документа, здесь обход
+начинается с детей <body>, остальное без изменений.
+"""
+import logging
+import re
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, NavigableString, Tag
+
+from .blobstore import BlobStore
+from .normalize import ALLOWED_ATTRIBUTES, ALLOWED_TAGS, sanitize, sanitize_many
+from .util import load_jsonl
+
+logger = logging.getLogger('etl')
+
+
+def _legacy_clean_tag(tag: Tag, base_url: Optional[str] = None) -> None:
+    if isinstance(tag, NavigableString):
+        return
+    if tag.name not in ALLOWED_TAGS:
+        tag.replace_with(tag.get_text())
+        return
+    allowed_attrs = ALLOWED_ATTRIBUTES.get(tag.name, [])
+    for attr in [attr for attr in tag.attrs if attr not in allowed_attrs]:
+        del tag.attrs[attr]
+    if tag.name == 'a' and 'href' in tag.attrs:
+        href = tag.attrs['href']
+        if base_url and not href.startswith(('http://', 'https://')):
+            tag.attrs['href'] = urljoin(base_url, href)
+    if tag.name == 'img' and 'src' in tag.attrs:
+        src = tag.attrs['src']
+        if base_url and not src.startswith(('http://', 'https://', 'data:')):
+            tag.attrs['src'] = urljoin(base_url, src)
+    for child in list(tag.children):
+        _legacy_clean_tag(child, base_url)
+
+
+def legacy_normalize(html: Any, base_url: Optional[str] = None) -> Dict[str, str]:
+    """Прежний конвейер: clean_html на BeautifulSoup и отдельный extract_text."""
+    soup = BeautifulSoup(html, 'lxml')
+    for tag in soup(['script', 'style', 'iframe', 'object', 'embed']):
+        tag.decompose()
+    root = soup.body or soup
+    for child in list(root.children):
+        _legacy_clean_tag(child, base_url)
+    cleaned = re.sub(r'\s+', ' ', root.decode_contents())
+    cleaned = re.sub(r'\n\s*\n', '\n\n', cleaned).strip()
+
+    text = BeautifulSoup(html, 'lxml').get_text(separator=' ', strip=True)
+    snippet = text[:300].rsplit(' ', 1)[0] + '...' if len(text) > 300 else text
+    return {'html': cleaned, 'text': text, 'snippet': snippet}
+
+
+def load_pages(input_path: Path, blob_dir: Optional[Path], limit: Optional[int] = None) -> List[Tuple[Any, str]]:
+    """
+    [(html, source_url)] страниц статей и выпусков из вывода crawl: тело
+    из хранилища или, в старых выгрузках, из data['html_content'].
+    """
+    blobs = BlobStore(blob_dir) if blob_dir and blob_dir.is_dir() else None
+    pages = []
+    for record in load_jsonl(input_path):
+        if record.get('doc_type') not in ('article', 'issue'):
+            continue
+        sha256 = record.get('sha256')
+        if blobs and sha256 in blobs:
+            html = blobs.get(sha256)
+        else:
+            html = record.get('data', {}).get('html_content')
+        if html:
+            pages.append((html, record['source_url']))
+            if limit and len(pages) >= limit:
+                break
+    return pages
+
+
+def _measure(name: str, run: Callable[[], int], pages: List[Tuple[Any, str]], repeat: int) -> Dict[str, Any]:
+    size = sum(len(html) for html, _ in pages)
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = run()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        'name': name,
+        'documents': count,
+        'seconds': best,
+        'docs_per_second': count / best if best else 0.0,
+        'mb_per_second': size / 1024 / 1024 / best if best else 0.0,
+    }
+
+
+def run(pages: List[Tuple[Any, str]], workers: int = 4, repeat: int = 3) -> List[Dict[str, Any]]:
+    """
+    Прогоняет страницы через прежнюю реализацию, sanitize в одном
+    процессе и sanitize_many в пуле; время — лучшее из repeat прогонов.
+    """
+    results = [
+        _measure('bs4 (clean_html + extract_text)', lambda: sum(1 for html, url in pages if legacy_normalize(html, url)), pages, repeat),
+        _measure('lxml sanitize', lambda: sum(1 for html, url in pages if sanitize(html, url)), pages, repeat),
+    ]
+    if workers > 0:
+        results.append(_measure(
+            f'lxml sanitize_many, процессов: {workers}',
+            lambda: sum(1 for _ in sanitize_many(pages, workers=workers)),
+            pages, repeat,
+        ))
+    baseline = results[0]['seconds']
+    for result in results:
+        result['speedup'] = baseline / result['seconds'] if result['seconds'] else 0.0
+    return results
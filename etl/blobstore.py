@@ -0,0 +1,86 @@
+"""
+Хранилище сырых тел страниц по содержимому (content-addressed).
+
+Тело ответа хранится один раз в файле <каталог>/ab/cd/<sha256>.gz, где
+sha256 — хеш несжатого тела (тот же, что в записях краулера и в
+RawDocument.sha256). Записи JSONL несут только хеш, а страницы можно
+разобрать заново (etl.crawler.reextract) без повторного обхода сайта.
+"""
+import gzip
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterator, Optional
+
+from .util import calculate_sha256
+
+
+class BlobStore:
+    """
+    Тела по sha256 в каталоге directory, сжатые gzip.
+
+    Каталог создается при первой записи: чтение и пробный запуск
+    (import_jhd --dry-run) ничего не создают на диске.
+    """
+
+    def __init__(self, directory: str, compresslevel: int = 6):
+        self.directory = Path(directory)
+        self.compresslevel = compresslevel
+
+    def path(self, sha256: str) -> Path:
+        return self.directory / sha256[:2] / sha256[2:4] / f'{sha256}.gz'
+
+    def __contains__(self, sha256: str) -> bool:
+        return bool(sha256) and self.path(sha256).exists()
+
+    def put(self, content: bytes, sha256: Optional[str] = None) -> str:
+        """
+        Сохраняет тело, если его еще нет; безопасно из нескольких потоков.
+
+        Returns:
+            sha256 тела
+        """
+        sha256 = sha256 or calculate_sha256(content)
+        path = self.path(sha256)
+        if path.exists():
+            return sha256
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(gzip.compress(content, self.compresslevel, mtime=0))
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return sha256
+
+    def get(self, sha256: str) -> bytes:
+        """
+        Raises:
+            KeyError: Тела нет в хранилище
+        """
+        try:
+            return gzip.decompress(self.path(sha256).read_bytes())
+        except FileNotFoundError:
+            raise KeyError(sha256) from None
+
+    def copy_from(self, other: 'BlobStore', sha256: str) -> bool:
+        """Переносит тело из другого хранилища; False, если его там нет."""
+        if sha256 in self:
+            return True
+        if sha256 not in other:
+            return False
+        path = self.path(sha256)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Файл копируется как есть, без повторного сжатия
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(other.path(sha256).read_bytes())
+        os.replace(tmp, path)
+        return True
+
+    def __iter__(self) -> Iterator[str]:
+        """sha256 всех тел."""
+        for path in self.directory.glob('*/*/*.gz'):
+            yield path.name[:-len('.gz')]
@@ -6,7 +6,8 @@ import logging
 import sys
 from pathlib import Path
 from typing import List
-from .crawler import crawl_site
+from .crawler import OJSCrawler, crawl_site
+from .util import JSONLWriter, load_jsonl
 
 logging.basicConfig(
     level=logging.INFO,
@@ -26,8 +27,39 @@ def main():
     crawl_parser.add_argument('--out', required=True, help='Путь к выходному файлу (JSONL)')
     crawl_parser.add_argument('--langs', default='ru,kk,en', help='Языки через запятую')
     crawl_parser.add_argument('--since', type=int, default=2010, help='Минимальный год')
-    crawl_parser.add_argument('--rate-limit', type=float, default=1.0, help='Задержка между запросами')
+    crawl_parser.add_argument('--rate-limit', type=float, default=1.0, help='Интервал между запросами к одному хосту, с')
     crawl_parser.add_argument('--max-pages', type=int, help='Максимальное количество страниц')
+    crawl_parser.add_argument('--concurrency', type=int, default=4, help='Число одновременных запросов')
+    crawl_parser.add_argument('--retries', type=int, default=3, help='Повторов при временных ошибках')
+    crawl_parser.add_argument('--timeout', type=float, default=30, help='Таймаут запроса, с')
+    crawl_parser.add_argument('--frontier', help='Файл очереди обхода (по умолчанию <out>.frontier.sqlite3)')
+    crawl_parser.add_argument('--restart', action='store_true', help='Начать обход заново, удалив очередь и прежний вывод')
+    crawl_parser.add_argument('--retry-failed', action='store_true', help='Повторить URL с ошибками загрузки')
+    crawl_parser.add_argument('--cache', help='Каталог HTTP-кэша (по умолчанию <каталог out>/http-cache)')
+    crawl_parser.add_argument('--no-cache', action='store_true', help='Загружать без HTTP-кэша')
+    crawl_parser.add_argument('--recrawl', action='store_true', help='Повторно проверить уже обойденные URL')
+    crawl_parser.add_argument('--offline', action='store_true', help='Воспроизвести обход из HTTP-кэша без сети')
+    crawl_parser.add_argument(
+        '--compress', choices=['auto', 'none', 'gzip', 'zstd'], default='auto',
+        help='Сжатие вывода (auto — по расширению --out: .gz, .zst)',
+    )
+    crawl_parser.add_argument('--rotate-mb', type=int, help='Разбивать вывод на части указанного размера, МБ')
+    crawl_parser.add_argument('--blobs', help='Хранилище тел страниц (по умолчанию <каталог out>/blobs)')
+    
+    # Команда reextract
+    reextract_parser = subparsers.add_parser('reextract', help='Разобрать страницы заново из хранилища тел')
+    reextract_parser.add_argument('--start', required=True, help='Начальный URL обхода')
+    reextract_parser.add_argument('--in', dest='input', required=True, help='Вывод crawl (JSONL)')
+    reextract_parser.add_argument('--blobs', help='Хранилище тел страниц (по умолчанию <каталог in>/blobs)')
+    reextract_parser.add_argument('--out', required=True, help='Путь к выходному файлу (JSONL)')
+    
+    # Команда bench-normalize
+    bench_parser = subparsers.add_parser('bench-normalize', help='Сравнить скорость нормализации HTML')
+    bench_parser.add_argument('--in', dest='input', required=True, help='Вывод crawl (JSONL)')
+    bench_parser.add_argument('--blobs', help='Хранилище тел страниц (по умолчанию <каталог in>/blobs)')
+    bench_parser.add_argument('--limit', type=int, help='Не больше указанного числа страниц')
+    bench_parser.add_argument('--workers', type=int, default=4, help='Процессов для sanitize_many (0 — без пула)')
+    bench_parser.add_argument('--repeat', type=int, default=3, help='Прогонов каждого варианта')
     
     # Команда import-xml
     xml_parser = subparsers.add_parser('import-xml', help='Импорт из OJS XML')
@@ -40,6 +72,20 @@ def main():
         langs = [l.strip() for l in args.langs.split(',')]
         output_path = Path(args.out)
         output_path.parent.mkdir(parents=True, exist_ok=True)
+        frontier_path = Path(args.frontier) if args.frontier else output_path.with_name(output_path.name + '.frontier.sqlite3')
+        cache_dir = None if args.no_cache else Path(args.cache or output_path.parent / 'http-cache')
+        blob_dir = Path(args.blobs or output_path.parent / 'blobs')
+        if args.offline:
+            if cache_dir is None or not cache_dir.exists():
+                logger.error("Для --offline нужен существующий HTTP-кэш (--cache)")
+                sys.exit(1)
+            # Воспроизведение всегда проходит сайт целиком, очередь — в памяти
+            frontier_path = None
+        elif args.restart:
+            for path in (frontier_path, Path(f'{frontier_path}-wal'), Path(f'{frontier_path}-shm')):
+                path.unlink(missing_ok=True)
+        elif frontier_path.exists():
+            logger.info(f"Продолжение обхода по очереди {frontier_path}")
         
         logger.info(f"Начало краулинга: {args.start}")
         
@@ -49,14 +95,61 @@ def main():
             langs=langs,
             since_year=args.since,
             rate_limit=args.rate_limit,
-            output_path=str(output_path)
+            output_path=str(output_path),
+            max_pages=args.max_pages,
+            concurrency=args.concurrency,
+            retries=args.retries,
+            timeout=args.timeout,
+            frontier_path=str(frontier_path) if frontier_path else None,
+            retry_failed=args.retry_failed,
+            cache_dir=str(cache_dir) if cache_dir else None,
+            offline=args.offline,
+            recrawl=args.recrawl,
+            compression=None if args.compress == 'none' else args.compress,
+            rotate_bytes=args.rotate_mb * 1024 * 1024 if args.rotate_mb else None,
+            blob_dir=str(blob_dir)
         ):
+            # Лимит --max-pages соблюдает сам краулер
             count += 1
-            if args.max_pages and count >= args.max_pages:
-                break
         
         logger.info(f"Обработано документов: {count}")
         
+    elif args.command == 'reextract':
+        input_path, output_path = Path(args.input), Path(args.out)
+        blob_dir = Path(args.blobs or input_path.parent / 'blobs')
+        if not blob_dir.exists():
+            logger.error(f"Хранилище тел не найдено: {blob_dir}")
+            sys.exit(1)
+        if output_path.resolve() == input_path.resolve():
+            logger.error("--out должен отличаться от --in")
+            sys.exit(1)
+        
+        crawler = OJSCrawler(args.start, blob_dir=str(blob_dir))
+        count = 0
+        # Вывод разбирается заново целиком: прежний файл заменяется
+        with JSONLWriter(output_path, truncate=True) as writer:
+            for item in crawler.reextract(load_jsonl(input_path)):
+                writer.write(item)
+                count += 1
+        crawler.frontier.close()
+        logger.info(f"Разобрано заново документов: {count}")
+        
+    elif args.command == 'bench-normalize':
+        from .bench import load_pages, run
+        
+        input_path = Path(args.input)
+        pages = load_pages(input_path, Path(args.blobs or input_path.parent / 'blobs'), args.limit)
+        if not pages:
+            logger.error("Нет страниц статей и выпусков с HTML")
+            sys.exit(1)
+        logger.info(f"Страниц: {len(pages)}")
+        for result in run(pages, workers=args.workers, repeat=args.repeat):
+            logger.info(
+                f"{result['name']}: {result['seconds']:.2f} с, "
+                f"{result['docs_per_second']:.0f} док/с, {result['mb_per_second']:.1f} МБ/с, "
+                f"x{result['speedup']:.1f}"
+            )
+        
     elif args.command == 'import-xml':
         logger.error("Импорт XML пока не реализован")
         sys.exit(1)
@@ -1,17 +1,76 @@
 """
 Краулер для сбора данных со старого OJS сайта.
+
+Обход начинается с архива выпусков и идет по ссылкам: архив -> выпуски
+-> статьи -> гранки (etl.frontier хранит очередь в SQLite, поэтому
+прерванный обход продолжается с места остановки). Выпуски старше
+since_year и гранки на языках вне langs не загружаются.
+
+Страницы загружаются параллельно (etl.fetcher): до concurrency запросов
+одновременно, с ограничением частоты на каждый хост и повторами
+временных ошибок. Результаты отдаются в порядке завершения загрузки.
+С HTTP-кэшем (etl.httpcache) повторный обход отдает только изменившиеся
+страницы, а режим offline воспроизводит обход из кэша без сети.
+
+Тела ответов сохраняются в хранилище по содержимому (etl.blobstore), а
+записи несут только sha256: reextract разбирает страницы заново из
+хранилища, без обхода.
 """
+import re
 import time
 import logging
-from typing import Iterator, Dict, Any, Optional, List
-from urllib.parse import urljoin, urlparse
+from pathlib import Path
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, Dict, Any, Optional, List, Tuple
+from urllib.parse import urldefrag, urljoin, urlparse
 import requests
-from bs4 import BeautifulSoup
-from .util import calculate_sha256, normalize_url, save_jsonl
+from bs4 import BeautifulSoup, Tag
+from .blobstore import BlobStore
+from .fetcher import Fetcher
+from .httpcache import HTTPCache
+from .frontier import Frontier, PRIORITY_ARCHIVE, PRIORITY_ISSUE, PRIORITY_ARTICLE, PRIORITY_GALLEY
+from .util import JSONLWriter, calculate_sha256, normalize_url
 from .normalize import clean_html
 
 logger = logging.getLogger('etl')
 
+# Путь журнала на старом сайте
+JOURNAL_PATH = '/index.php/jhd'
+
+# Шаблоны путей относительно JOURNAL_PATH: (регулярное выражение, тип документа, приоритет)
+LINK_PATTERNS = [
+    (re.compile(r'^/issue/archive(?:/\d+)?$'), 'issue', PRIORITY_ARCHIVE),
+    (re.compile(r'^/issue/(?:view/\d+|current)$'), 'issue', PRIORITY_ISSUE),
+    (re.compile(r'^/article/view/\d+$'), 'article', PRIORITY_ARTICLE),
+    (re.compile(r'^/article/(?:view|download)/\d+/\d+(?:/\d+)?$'), 'galley', PRIORITY_GALLEY),
+]
+
+# Названия языков в подписях гранок ('PDF (English)', 'PDF (Қазақша)')
+LANGUAGE_NAMES = {
+    'ru': ('русск', 'russian', 'орыс'),
+    'kk': ('қазақ', 'казах', 'kazakh'),
+    'en': ('english', 'англ', 'ағылшын'),
+}
+
+YEAR_RE = re.compile(r'\b(19\d{2}|20\d{2})\b')
+
+
+def _find_year(text: str) -> Optional[int]:
+    """Последний год в тексте ('Т. 5 № 2 (2019)' -> 2019)."""
+    years = YEAR_RE.findall(text or '')
+    return int(years[-1]) if years else None
+
+
+def _summary_text(anchor: Tag) -> str:
+    """Текст блока выпуска в архиве OJS, где год часто указан вне ссылки."""
+    block = anchor.find_parent(class_=re.compile('issue_summary|issue-summary'))
+    if block is None and anchor.parent is not None:
+        block = anchor.parent
+        # Общий контейнер всего списка содержит годы соседних выпусков
+        if len(block.get_text(strip=True)) > 300:
+            return ''
+    return block.get_text(' ', strip=True) if block else ''
+
 
 class OJSCrawler:
     """Краулер для OJS сайта."""
@@ -22,18 +81,44 @@ class OJSCrawler:
         rate_limit: float = 1.0,
         max_pages: Optional[int] = None,
         langs: List[str] = None,
-        since_year: int = 2010
+        since_year: int = 2010,
+        concurrency: int = 4,
+        retries: int = 3,
+        timeout: float = 30,
+        burst: int = 1,
+        frontier_path: Optional[str] = None,
+        retry_failed: bool = False,
+        cache_dir: Optional[str] = None,
+        offline: bool = False,
+        recrawl: bool = False,
+        blob_dir: Optional[str] = None
     ):
         """
         Инициализация краулера.
         
         Args:
             start_url: Начальный URL для сканирования
-            rate_limit: Задержка между запросами в секундах
+            rate_limit: Минимальный интервал между запросами к одному хосту в секундах
             max_pages: Максимальное количество страниц для сканирования
             langs: Список языков для обработки (ru, kk, en)
             since_year: Минимальный год для обработки
+            concurrency: Число одновременных запросов
+            retries: Число повторов при временных ошибках
+            timeout: Таймаут запроса в секундах
+            burst: Сколько запросов к хосту допускается подряд без паузы
+            frontier_path: Файл SQLite очереди обхода для возобновления
+                (None — очередь в памяти)
+            retry_failed: Повторить URL, загрузка которых прошлым запуском не удалась
+            cache_dir: Каталог HTTP-кэша (etl.httpcache): повторные загрузки
+                идут условными запросами, неизменные страницы (304) не
+                разбираются и не отдаются
+            offline: Воспроизвести обход из cache_dir без сети
+            recrawl: Вернуть в очередь уже обработанные URL (повторный обход)
+            blob_dir: Хранилище тел ответов (etl.blobstore); с ним записи
+                не содержат html_content, а HTTP-кэш хранит тела там же
         """
+        if offline and not cache_dir:
+            raise ValueError('Режим offline требует cache_dir')
         self.start_url = start_url.rstrip('/')
         self.rate_limit = rate_limit
         self.max_pages = max_pages
@@ -43,79 +128,258 @@ class OJSCrawler:
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (compatible; JHDKZ ETL/1.0)'
         })
-        self.visited = set()
+        self.concurrency = max(1, concurrency)
+        self.blobs = BlobStore(blob_dir) if blob_dir else None
+        self.cache = HTTPCache(cache_dir, self.blobs) if cache_dir else None
+        self.fetcher = Fetcher(
+            self.session,
+            concurrency=self.concurrency,
+            rate_limit=rate_limit,
+            burst=burst,
+            retries=retries,
+            timeout=timeout,
+            cache=self.cache,
+            offline=offline,
+        )
+        self.journal_url = self.start_url + JOURNAL_PATH
+        self.frontier = Frontier(frontier_path or ':memory:')
+        self.retry_failed = retry_failed
+        self.recrawl = recrawl
         self.pages_processed = 0
+        self.pages_unchanged = 0
     
-    def crawl(self, output_path: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    def crawl(
+        self,
+        checkpoint: Optional[Callable[[], None]] = None,
+        checkpoint_every: int = 1
+    ) -> Iterator[Dict[str, Any]]:
         """
         Запускает краулинг сайта.
         
+        Args:
+            checkpoint: Фиксация сохраненных потребителем результатов
+                (JSONLWriter.checkpoint); после нее URL отмечаются обработанными
+            checkpoint_every: Через сколько результатов вызывать checkpoint
+        
         Yields:
             Словари с данными страниц
         """
         logger.info(f"Начало краулинга: {self.start_url}")
         
-        # Обрабатываем основные разделы
-        urls_to_process = [
-            f"{self.start_url}/index.php/jhd/issue/archive",
-            f"{self.start_url}/index.php/jhd/issue/view/",
-        ]
+        if self.recrawl:
+            logger.info(f"Повторный обход известных URL: {self.frontier.requeue_done()}")
+        resumed = self.frontier.resume(self.retry_failed)
+        if resumed:
+            logger.info(f"Возвращено в очередь после прошлого запуска: {resumed}")
+        # Начальные разделы; при возобновлении они уже известны и пропускаются
+        self.frontier.add([
+            (f"{self.journal_url}/issue/archive", PRIORITY_ARCHIVE, None),
+            (f"{self.journal_url}/issue/current", PRIORITY_ISSUE, None),
+        ])
+        
+        pool = ThreadPoolExecutor(self.concurrency, thread_name_prefix='etl-fetch')
+        in_flight = {}
+        # URL, результаты которых отданы потребителю, но еще не зафиксированы
+        delivered = []
         
-        for url in urls_to_process:
-            if self.max_pages and self.pages_processed >= self.max_pages:
-                break
-            
+        def commit():
+            if checkpoint:
+                checkpoint()
+            self.frontier.done_many(delivered)
+            delivered.clear()
+        
+        try:
+            while True:
+                # В очереди пула не больше двух URL на поток
+                free = self.concurrency * 2 - len(in_flight)
+                if self.max_pages:
+                    free = min(free, self.max_pages - self.pages_processed)
+                if free > 0:
+                    for url, year in self.frontier.pop(free):
+                        self.pages_processed += 1
+                        # Ссылки неизменной страницы нужны, только если очередь их не знает
+                        discover = self.cache is not None and not self.frontier.has_children(url)
+                        in_flight[pool.submit(self._fetch_page, url, year, discover)] = url
+                if not in_flight:
+                    break
+                
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = in_flight.pop(future)
+                    try:
+                        result, links = future.result()
+                    except Exception as e:
+                        logger.error(f"Ошибка при обработке {url}: {e}")
+                        self.frontier.failed(url, str(e))
+                        continue
+                    self.frontier.add(links, parent=url)
+                    if result is None:
+                        # 304: страница не изменилась с прошлого обхода
+                        self.pages_unchanged += 1
+                        self.frontier.done(url)
+                        continue
+                    # URL считается обработанным, когда потребитель сохранил результат;
+                    # в список он попадает до yield: потребитель может закрыть обход,
+                    # уже записав результат (crawl_site), и commit в finally его учтет
+                    delivered.append(url)
+                    yield result
+                    if len(delivered) >= checkpoint_every:
+                        commit()
+        finally:
+            # Потребитель мог прервать обход: незапущенные загрузки отменяем,
+            # взятые в работу URL вернутся в очередь при следующем запуске
+            pool.shutdown(wait=True, cancel_futures=True)
             try:
-                yield from self._process_url(url)
+                commit()
             except Exception as e:
-                logger.error(f"Ошибка при обработке {url}: {e}")
+                logger.error(f"Не удалось зафиксировать результаты обхода: {e}")
+        
+        logger.info(
+            f"Краулинг завершен. Обработано страниц: {self.pages_processed}, "
+            f"без изменений: {self.pages_unchanged}, "
+            f"очередь: {self.frontier.stats()}"
+        )
+    
+    def _classify(self, url: str) -> Optional[Tuple[str, int]]:
+        """(тип документа, приоритет) для URL журнала или None для прочих страниц."""
+        if not url.startswith(self.journal_url + '/'):
+            return None
+        path = url[len(self.journal_url):]
+        for pattern, doc_type, priority in LINK_PATTERNS:
+            if pattern.match(path):
+                return doc_type, priority
+        return None
+    
+    def _normalize_link(self, page_url: str, href: str) -> Optional[str]:
+        """Абсолютный URL без фрагмента и параметров или None для чужих ссылок."""
+        href = href.strip()
+        if not href or href.startswith(('mailto:', 'javascript:', 'tel:')):
+            return None
+        url, _ = urldefrag(urljoin(page_url, href))
+        # Параметры OJS (locale, source) дают дубликаты тех же страниц
+        url = url.split('?', 1)[0].rstrip('/')
+        if urlparse(url).scheme not in ('http', 'https'):
+            return None
+        return url
+    
+    def _lang_allowed(self, text: str) -> bool:
+        """Ссылку с названием языка вне self.langs (например, 'PDF (English)') не обходим."""
+        text = text.lower()
+        mentioned = {lang for lang, names in LANGUAGE_NAMES.items() if any(name in text for name in names)}
+        return not mentioned or bool(mentioned & set(self.langs))
+    
+    def _year_allowed(self, year: Optional[int]) -> bool:
+        return year is None or year >= self.since_year
+    
+    def _discover(self, url: str, soup: BeautifulSoup, year: Optional[int]) -> List[Tuple[str, int, Optional[int]]]:
+        """
+        Ссылки на архив, выпуски, статьи и гранки со страницы url.
         
-        logger.info(f"Краулинг завершен. Обработано страниц: {self.pages_processed}")
+        Год выпуска берется из текста ссылки или ее блока (список выпусков в
+        архиве), иначе наследуется от страницы: статьи и гранки — год своего
+        выпуска. Ссылки на выпуски старше since_year и на гранки на языках
+        вне langs отбрасываются.
+        """
+        links = {}
+        for anchor in soup.find_all('a', href=True):
+            link = self._normalize_link(url, anchor['href'])
+            kind = self._classify(link) if link else None
+            if kind is None or link == url:
+                continue
+            doc_type, priority = kind
+            text = anchor.get_text(' ', strip=True)
+            link_year = year
+            if priority == PRIORITY_ISSUE:
+                link_year = _find_year(text) or _find_year(_summary_text(anchor))
+            if not self._year_allowed(link_year):
+                continue
+            if priority == PRIORITY_GALLEY and not self._lang_allowed(text):
+                continue
+            links.setdefault(link, (link, priority, link_year))
+        return list(links.values())
     
-    def _process_url(self, url: str) -> Iterator[Dict[str, Any]]:
-        """Обрабатывает одну URL."""
-        if url in self.visited:
-            return
+    def _fetch_page(
+        self, url: str, year: Optional[int] = None, discover_unchanged: bool = False
+    ) -> Tuple[Optional[Dict[str, Any]], List[Tuple[str, int, Optional[int]]]]:
+        """
+        Загружает и разбирает страницу (выполняется в потоке пула).
         
-        if self.max_pages and self.pages_processed >= self.max_pages:
-            return
+        Args:
+            discover_unchanged: Искать ссылки и на неизменной странице
+                (очередь создана заново, а страница есть в HTTP-кэше)
         
-        self.visited.add(url)
-        self.pages_processed += 1
+        Returns:
+            (результат, найденные ссылки для очереди); результат None —
+            страница не изменилась (304)
+        """
+        response = self.fetcher.fetch(url)
+        if getattr(response, 'not_modified', False):
+            if discover_unchanged and 'html' in response.headers.get('Content-Type', ''):
+                return None, self._links(url, BeautifulSoup(response.content, 'lxml'), year)
+            return None, []
+        content = response.content
+        sha256 = calculate_sha256(content)
+        if self.blobs:
+            # С HTTP-кэшем на том же хранилище тело уже сохранено
+            self.blobs.put(content, sha256)
+        kind = self._classify(url)
+        doc_type = kind[0] if kind else 'unknown'
         
-        try:
-            time.sleep(self.rate_limit)
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-            
-            content = response.content
-            sha256 = calculate_sha256(content)
-            
-            soup = BeautifulSoup(content, 'lxml')
-            
-            # Определяем тип страницы
-            if '/article/view/' in url:
-                doc_type = 'article'
-                data = self._extract_article(soup, url)
-            elif '/issue/view/' in url or '/issue/archive' in url:
-                doc_type = 'issue'
-                data = self._extract_issue(soup, url)
-            else:
-                doc_type = 'unknown'
-                data = {}
-            
+        content_type = response.headers.get('Content-Type', '')
+        if content_type and 'html' not in content_type:
+            # Гранка в PDF или другом формате: только метаданные загрузки
             result = {
                 'source_url': url,
                 'sha256': sha256,
                 'doc_type': doc_type,
-                'data': data,
+                'data': {'content_type': content_type.split(';')[0].strip(), 'size': len(content)},
                 'fetched_at': time.time(),
             }
-            
-            yield result
-            
-        except Exception as e:
-            logger.error(f"Ошибка при обработке {url}: {e}")
+            return result, []
+        
+        soup = BeautifulSoup(content, 'lxml')
+        result = {
+            'source_url': url,
+            'sha256': sha256,
+            'doc_type': doc_type,
+            'data': self._extract(doc_type, soup, url),
+            'fetched_at': time.time(),
+        }
+        return result, self._links(url, soup, year)
+    
+    def _extract(self, doc_type: str, soup: BeautifulSoup, url: str) -> Dict[str, Any]:
+        """Данные страницы по ее типу; без хранилища тел — вместе с HTML."""
+        if doc_type == 'article':
+            data = self._extract_article(soup, url)
+        elif doc_type == 'issue':
+            data = self._extract_issue(soup, url)
+        else:
+            return {}
+        if self.blobs is None:
+            data['html_content'] = str(soup)
+        return data
+    
+    def reextract(self, records: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Заново разбирает страницы записей из хранилища тел, без сети.
+        
+        Записи гранок и записи, тела которых нет в хранилище, отдаются
+        без изменений.
+        """
+        for record in records:
+            sha256 = record.get('sha256')
+            doc_type = record.get('doc_type')
+            if self.blobs and doc_type in ('article', 'issue') and sha256 in self.blobs:
+                soup = BeautifulSoup(self.blobs.get(sha256), 'lxml')
+                record = dict(record, data=self._extract(doc_type, soup, record['source_url']))
+            yield record
+    
+    def _links(self, url: str, soup: BeautifulSoup, year: Optional[int]) -> List[Tuple[str, int, Optional[int]]]:
+        """Ссылки страницы для очереди; страницы выпусков старше since_year не раскрываем."""
+        if year is None and self._classify(url) and self._classify(url)[0] == 'issue':
+            title = soup.find('h1') or soup.find('title')
+            year = _find_year(title.get_text(' ', strip=True)) if title else None
+        return self._discover(url, soup, year) if self._year_allowed(year) else []
     
     def _extract_article(self, soup: BeautifulSoup, url: str) -> Dict[str, Any]:
         """Извлекает данные статьи."""
@@ -125,15 +389,12 @@ class OJSCrawler:
         
         return {
             'title': title_text,
-            'html_content': str(soup),
         }
     
     def _extract_issue(self, soup: BeautifulSoup, url: str) -> Dict[str, Any]:
         """Извлекает данные выпуска."""
         # Базовая реализация
-        return {
-            'html_content': str(soup),
-        }
+        return {}
 
 
 def crawl_site(
@@ -141,7 +402,20 @@ def crawl_site(
     langs: List[str] = None,
     since_year: int = 2010,
     rate_limit: float = 1.0,
-    output_path: Optional[str] = None
+    output_path: Optional[str] = None,
+    max_pages: Optional[int] = None,
+    concurrency: int = 4,
+    retries: int = 3,
+    timeout: float = 30,
+    frontier_path: Optional[str] = None,
+    retry_failed: bool = False,
+    cache_dir: Optional[str] = None,
+    offline: bool = False,
+    recrawl: bool = False,
+    compression: Optional[str] = 'auto',
+    rotate_bytes: Optional[int] = None,
+    checkpoint_every: int = 200,
+    blob_dir: Optional[str] = None
 ) -> Iterator[Dict[str, Any]]:
     """
     Функция для запуска краулинга.
@@ -150,23 +424,66 @@ def crawl_site(
         start_url: Начальный URL
         langs: Список языков
         since_year: Минимальный год
-        rate_limit: Задержка между запросами
-        output_path: Путь для сохранения результатов (JSONL)
+        rate_limit: Минимальный интервал между запросами к одному хосту
+        output_path: Путь для сохранения результатов (JSONL, см. JSONLWriter);
+            при новой очереди прежний вывод удаляется, при продолжении —
+            дописывается
+        max_pages: Максимальное количество страниц
+        concurrency: Число одновременных запросов
+        retries: Число повторов при временных ошибках
+        timeout: Таймаут запроса в секундах
+        frontier_path: Файл очереди обхода; с ним повторный запуск продолжает
+            прерванный обход
+        retry_failed: Повторить URL, загрузка которых не удалась
+        cache_dir: Каталог HTTP-кэша для условных запросов
+        offline: Воспроизвести обход из cache_dir без сети
+        recrawl: Повторно проверить все URL известной очереди
+        compression: Сжатие вывода: 'gzip', 'zstd', None или 'auto' (по расширению)
+        rotate_bytes: Размер части вывода для ротации
+        checkpoint_every: Через сколько записей фиксировать вывод (fsync)
+        blob_dir: Хранилище тел ответов; записи несут только sha256
     
     Yields:
         Словари с данными
     """
+    # Новая очередь (нет файла или очередь в памяти) — обход с начала:
+    # прежний вывод удаляется, иначе те же записи допишутся к нему повторно
+    fresh = frontier_path is None or not Path(frontier_path).exists()
     crawler = OJSCrawler(
         start_url=start_url,
         rate_limit=rate_limit,
+        max_pages=max_pages,
         langs=langs or ['ru', 'kk', 'en'],
-        since_year=since_year
+        since_year=since_year,
+        concurrency=concurrency,
+        retries=retries,
+        timeout=timeout,
+        frontier_path=frontier_path,
+        retry_failed=retry_failed,
+        cache_dir=cache_dir,
+        offline=offline,
+        recrawl=recrawl,
+        blob_dir=blob_dir
     )
     
-    for item in crawler.crawl(output_path):
-        if output_path:
-            from pathlib import Path
-            from .util import save_jsonl
-            save_jsonl(item, Path(output_path))
-        yield item
+    writer = JSONLWriter(
+        Path(output_path), compression, rotate_bytes=rotate_bytes, truncate=fresh,
+    ) if output_path else None
+    items = crawler.crawl(
+        checkpoint=writer.checkpoint if writer else None,
+        checkpoint_every=checkpoint_every if writer else 1,
+    )
+    try:
+        for item in items:
+            if writer:
+                writer.write(item)
+            yield item
+    finally:
+        # Сначала обход фиксирует отданные результаты, затем закрываются файлы
+        items.close()
+        if writer:
+            writer.close()
+        crawler.frontier.close()
+        if crawler.cache:
+            crawler.cache.close()
 
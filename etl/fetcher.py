@@ -0,0 +1,149 @@
+"""
+Параллельная загрузка страниц для краулера.
+
+Запросы выполняются в пуле потоков на общем requests.Session. Частота
+запросов к каждому хосту ограничивается своим token bucket, поэтому
+параллельность ускоряет обход за счет перекрытия задержек сети, но не
+увеличивает нагрузку на старый сайт сверх заданной. Временные ошибки
+(соединение, таймаут, 429 и 5xx) повторяются с экспоненциальной паузой.
+"""
+import logging
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .httpcache import CachingAdapter, HTTPCache
+
+logger = logging.getLogger('etl')
+
+# Ответы, после которых запрос имеет смысл повторить
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Верхняя граница ожидания по заголовку Retry-After, секунды
+MAX_RETRY_AFTER = 300
+
+
+class TokenBucket:
+    """Token bucket: в среднем rate запросов в секунду, до burst подряд."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Блокирует поток, пока не появится свободный токен."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """Отдельный TokenBucket на каждый хост."""
+
+    def __init__(self, rate: Optional[float], burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url: str) -> None:
+        if not self.rate:
+            return
+        host = urlparse(url).netloc.lower()
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+        bucket.acquire()
+
+
+class Fetcher:
+    """Загрузка URL с ограничением частоты по хостам, таймаутом и повторами."""
+
+    def __init__(
+        self,
+        session: requests.Session,
+        concurrency: int = 4,
+        rate_limit: float = 1.0,
+        burst: int = 1,
+        retries: int = 3,
+        backoff: float = 1.0,
+        timeout: float = 30,
+        cache: Optional[HTTPCache] = None,
+        offline: bool = False,
+    ):
+        """
+        Args:
+            session: Сессия, через которую идут все запросы
+            concurrency: Число потоков загрузки
+            rate_limit: Минимальный средний интервал между запросами к одному
+                хосту в секундах (0 — без ограничения)
+            burst: Сколько запросов к хосту можно сделать подряд без паузы
+            retries: Число повторов после временной ошибки
+            backoff: Пауза перед первым повтором, далее удваивается
+            timeout: Таймаут соединения и чтения в секундах
+            cache: HTTP-кэш для условных запросов (etl.httpcache)
+            offline: Отвечать только из cache, без сети
+        """
+        self.session = session
+        self.concurrency = max(1, concurrency)
+        # Воспроизведение из кэша не нагружает сайт и не ограничивается
+        rate = 1 / rate_limit if rate_limit > 0 and not offline else None
+        self.limiter = HostRateLimiter(rate, burst)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        # Пул соединений не меньше числа потоков, иначе соединения закрываются
+        pool = {'pool_connections': self.concurrency, 'pool_maxsize': self.concurrency}
+        adapter = CachingAdapter(cache, offline, **pool) if cache else HTTPAdapter(**pool)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+    def _delay(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+        if retry_after.isdigit():
+            return min(float(retry_after), MAX_RETRY_AFTER)
+        # Случайная добавка разводит повторы потоков во времени
+        return self.backoff * 2 ** attempt * (1 + random.random() / 2)
+
+    def fetch(self, url: str) -> requests.Response:
+        """
+        Загружает url; повторяет при ошибках соединения, таймаутах, 429 и 5xx.
+
+        Raises:
+            requests.RequestException: Ошибка последней попытки
+        """
+        attempt = 0
+        while True:
+            self.limiter.acquire(url)
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.retries:
+                    raise
+                delay = self._delay(attempt)
+                logger.warning(f"{url}: {e}; повтор через {delay:.1f} с")
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    response.raise_for_status()
+                    return response
+                delay = self._delay(attempt, response)
+                logger.warning(f"{url}: HTTP {response.status_code}; повтор через {delay:.1f} с")
+                response.close()
+            time.sleep(delay)
+            attempt += 1
@@ -0,0 +1,130 @@
+"""
+Очередь обхода краулера (frontier) в SQLite.
+
+Каждый URL хранится одной строкой с приоритетом, состоянием и годом
+выпуска, к которому он относится. Очередь и множество посещенных URL
+переживают перезапуск: прерванный обход продолжается с необработанных
+URL, а строки, взятые в работу, но не завершенные, возвращаются в очередь.
+"""
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Приоритеты: меньшее значение обрабатывается раньше
+PRIORITY_ARCHIVE = 0
+PRIORITY_ISSUE = 1
+PRIORITY_ARTICLE = 2
+PRIORITY_GALLEY = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frontier (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    priority INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    year INTEGER,
+    parent TEXT,
+    discovered_at REAL NOT NULL,
+    fetched_at REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS frontier_queue_idx ON frontier (state, priority, id);
+CREATE INDEX IF NOT EXISTS frontier_parent_idx ON frontier (parent);
+"""
+
+
+class Frontier:
+    """
+    Очередь URL: pending -> in_progress -> done | failed.
+
+    Объект используется из одного потока (цикла обхода); загрузки в пуле
+    потоков с ним не работают.
+    """
+
+    def __init__(self, path: str = ':memory:'):
+        """
+        Args:
+            path: Файл SQLite; ':memory:' — очередь только на время процесса
+        """
+        self.path = path
+        self.db = sqlite3.connect(path)
+        if path != ':memory:':
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+
+    def add(self, entries: Iterable[Tuple[str, int, Optional[int]]], parent: Optional[str] = None) -> int:
+        """
+        Добавляет новые URL (url, приоритет, год); известные пропускаются.
+
+        Returns:
+            Число добавленных URL
+        """
+        now = time.time()
+        with self.db:
+            cursor = self.db.executemany(
+                'INSERT OR IGNORE INTO frontier (url, priority, year, parent, discovered_at) VALUES (?, ?, ?, ?, ?)',
+                [(url, priority, year, parent, now) for url, priority, year in entries],
+            )
+        return cursor.rowcount
+
+    def pop(self, limit: int) -> List[Tuple[str, Optional[int]]]:
+        """Берет в работу до limit URL с наименьшим приоритетом: [(url, год)]."""
+        with self.db:
+            rows = self.db.execute(
+                "SELECT url, year FROM frontier WHERE state = 'pending' ORDER BY priority, id LIMIT ?",
+                (limit,),
+            ).fetchall()
+            self.db.executemany("UPDATE frontier SET state = 'in_progress' WHERE url = ?", [(url,) for url, _ in rows])
+        return rows
+
+    def done(self, url: str) -> None:
+        self.done_many([url])
+
+    def done_many(self, urls: List[str]) -> None:
+        now = time.time()
+        with self.db:
+            self.db.executemany(
+                "UPDATE frontier SET state = 'done', fetched_at = ?, error = NULL WHERE url = ?",
+                [(now, url) for url in urls],
+            )
+
+    def failed(self, url: str, error: str) -> None:
+        with self.db:
+            self.db.execute(
+                "UPDATE frontier SET state = 'failed', fetched_at = ?, error = ? WHERE url = ?",
+                (time.time(), error[:2000], url),
+            )
+
+    def resume(self, retry_failed: bool = False) -> int:
+        """
+        Возвращает в очередь URL, не завершенные прошлым запуском
+        (и неудачные — с retry_failed).
+
+        Returns:
+            Число возвращенных URL
+        """
+        states = ('in_progress', 'failed') if retry_failed else ('in_progress',)
+        with self.db:
+            cursor = self.db.execute(
+                f"UPDATE frontier SET state = 'pending' WHERE state IN ({', '.join('?' * len(states))})",
+                states,
+            )
+        return cursor.rowcount
+
+    def has_children(self, url: str) -> bool:
+        """Известны ли ссылки, найденные на странице url."""
+        return self.db.execute('SELECT 1 FROM frontier WHERE parent = ? LIMIT 1', (url,)).fetchone() is not None
+
+    def requeue_done(self) -> int:
+        """Возвращает в очередь все обработанные URL для повторного обхода."""
+        with self.db:
+            cursor = self.db.execute("UPDATE frontier SET state = 'pending' WHERE state = 'done'")
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        """{состояние: число URL}."""
+        return dict(self.db.execute('SELECT state, COUNT(*) FROM frontier GROUP BY state'))
+
+    def close(self) -> None:
+        self.db.close()
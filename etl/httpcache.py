@@ -0,0 +1,160 @@
+"""
+HTTP-кэш краулера на диске.
+
+Индекс (SQLite) хранит для каждого URL статус, ETag, Last-Modified и
+sha256 тела; тела лежат в хранилище по содержимому (etl.blobstore, по
+умолчанию — bodies/ в каталоге кэша, у краулера — общее с записями),
+поэтому одинаковые страницы хранятся один раз. CachingAdapter подключается к
+requests.Session краулера:
+
+- повторный запрос URL из кэша отправляется условным (If-None-Match /
+  If-Modified-Since); на 304 адаптер возвращает тело из кэша с
+  response.not_modified = True, и краулер не разбирает страницу заново;
+- в режиме offline сеть не используется: ответы, включая редиректы,
+  воспроизводятся из кэша, URL вне кэша дают OfflineMiss.
+"""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from .blobstore import BlobStore
+
+# Ответы, которые кэшируются: страницы и редиректы (для воспроизведения offline)
+CACHEABLE_STATUSES = {200, 301, 302, 303, 307, 308}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    content_type TEXT,
+    location TEXT,
+    sha256 TEXT,
+    size INTEGER,
+    fetched_at REAL NOT NULL,
+    checked_at REAL NOT NULL
+);
+"""
+
+
+class OfflineMiss(requests.RequestException):
+    """В режиме offline запрошен URL, которого нет в кэше."""
+
+
+class HTTPCache:
+    """Индекс ответов в каталоге directory и тела в хранилище blobs."""
+
+    def __init__(self, directory: str, blobs: Optional[BlobStore] = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.blobs = blobs or BlobStore(self.directory / 'bodies')
+        # Соединение общее для потоков загрузки, доступ — под блокировкой
+        self.db = sqlite3.connect(self.directory / 'index.sqlite3', check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.db.execute('SELECT * FROM responses WHERE url = ?', (url,)).fetchone()
+        if row is None or (row['sha256'] and row['sha256'] not in self.blobs):
+            # Без тела ответ из кэша не восстановить: URL загружается заново
+            return None
+        return dict(row)
+
+    def read_body(self, entry: Dict[str, Any]) -> bytes:
+        if not entry['sha256']:
+            return b''
+        return self.blobs.get(entry['sha256'])
+
+    def store(self, url: str, response: requests.Response) -> None:
+        """Сохраняет ответ; тело — только у 200."""
+        sha256, size = None, None
+        if response.status_code == 200:
+            sha256, size = self.blobs.put(response.content), len(response.content)
+        now = time.time()
+        with self.lock, self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO responses '
+                '(url, status, etag, last_modified, content_type, location, sha256, size, fetched_at, checked_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    url, response.status_code, response.headers.get('ETag'),
+                    response.headers.get('Last-Modified'), response.headers.get('Content-Type'),
+                    response.headers.get('Location'), sha256, size, now, now,
+                ),
+            )
+
+    def touch(self, url: str) -> None:
+        """Отмечает успешную проверку актуальности (ответ 304)."""
+        with self.lock, self.db:
+            self.db.execute('UPDATE responses SET checked_at = ? WHERE url = ?', (time.time(), url))
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class CachingAdapter(HTTPAdapter):
+    """Транспорт requests с условными запросами и воспроизведением из HTTPCache."""
+
+    def __init__(self, cache: HTTPCache, offline: bool = False, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache
+        self.offline = offline
+
+    def _cached_response(self, request: requests.PreparedRequest, entry: Dict[str, Any], not_modified: bool) -> requests.Response:
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.reason = 'OK' if entry['status'] == 200 else 'Redirect'
+        headers = {
+            'Content-Type': entry['content_type'],
+            'ETag': entry['etag'],
+            'Last-Modified': entry['last_modified'],
+            'Location': entry['location'],
+        }
+        response.headers = CaseInsensitiveDict({k: v for k, v in headers.items() if v})
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = self.cache.read_body(entry)
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.from_cache = True
+        response.not_modified = not_modified
+        return response
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        if request.method != 'GET':
+            return super().send(request, **kwargs)
+        entry = self.cache.get(request.url)
+
+        if self.offline:
+            if entry is None:
+                raise OfflineMiss(f'Нет в кэше: {request.url}', request=request)
+            return self._cached_response(request, entry, not_modified=False)
+
+        if entry and entry['status'] == 200:
+            if entry['etag']:
+                request.headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                request.headers['If-Modified-Since'] = entry['last_modified']
+        response = super().send(request, **kwargs)
+
+        if response.status_code == 304 and entry:
+            response.close()
+            self.cache.touch(request.url)
+            return self._cached_response(request, entry, not_modified=True)
+        if response.status_code in CACHEABLE_STATUSES:
+            self.cache.store(request.url, response)
+        response.from_cache = False
+        response.not_modified = False
+        return response
@@ -1,12 +1,23 @@
 """
 Нормализация HTML контента.
 Удаляет опасные теги и атрибуты, оставляет только белый список.
+
+sanitize делает один проход по дереву lxml (etree.iterwalk): сразу
+пишет очищенный HTML, собирает текст и сниппет, поэтому страница
+разбирается один раз. sanitize_many обрабатывает пакеты документов в пуле
+процессов.
 """
-import re
 import logging
-from typing import Optional
-from urllib.parse import urljoin
-from bs4 import BeautifulSoup, Tag, NavigableString
+import multiprocessing
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from html import escape
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urljoin, urlparse
+
+from lxml import etree
+from lxml import html as lxml_html
 
 logger = logging.getLogger('etl')
 
@@ -33,97 +44,241 @@ ALLOWED_ATTRIBUTES = {
     'p': ['class'],
 }
 
+# Теги, удаляемые вместе с содержимым
+DROP_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'noscript', 'template'}
+
+# Теги без закрывающего тега
+VOID_TAGS = {'br', 'hr', 'img'}
+
+# Теги, на границе которых в тексте ставится пробел
+BLOCK_TAGS = {
+    'p', 'div', 'br', 'hr', 'li', 'dt', 'dd', 'tr', 'td', 'th', 'blockquote', 'pre',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'dl', 'table', 'section',
+    'article', 'header', 'footer', 'nav', 'aside', 'figure', 'figcaption',
+}
+
+# Атрибуты со ссылками и допустимые в них схемы
+URL_ATTRIBUTES = {('a', 'href'): ('http', 'https', 'mailto'), ('img', 'src'): ('http', 'https', 'data')}
+
+# Длина сниппета по умолчанию
+SNIPPET_LENGTH = 300
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _decode(html: Union[str, bytes]) -> str:
+    """Тело страницы из хранилища (bytes) в строку: UTF-8, иначе по разметке."""
+    if isinstance(html, str):
+        return html
+    try:
+        return html.decode('utf-8')
+    except UnicodeDecodeError:
+        from bs4 import UnicodeDammit
+        return UnicodeDammit(html, is_html=True).unicode_markup
+
+
+def _truncate(text: str, max_length: Optional[int]) -> str:
+    if max_length and len(text) > max_length:
+        text = text[:max_length].rsplit(' ', 1)[0] + '...'
+    return text
+
+
+def _url(tag: str, attr: str, value: str, base_url: Optional[str]) -> Optional[str]:
+    """Абсолютный URL или None, если схема не разрешена (javascript: и т.п.)."""
+    value = value.strip()
+    if value.startswith(('http://', 'https://')):
+        # Частый случай: абсолютная ссылка, разбор URL не нужен
+        return value
+    if base_url:
+        value = urljoin(base_url, value)
+    scheme = urlparse(value).scheme.lower()
+    if scheme and scheme not in URL_ATTRIBUTES[(tag, attr)]:
+        return None
+    if scheme == 'data' and not value[5:].lower().startswith('image/'):
+        return None
+    return value
+
+
+def _attributes(el, tag: str, base_url: Optional[str]) -> str:
+    allowed = ALLOWED_ATTRIBUTES.get(tag)
+    if not allowed:
+        return ''
+    parts = []
+    for name, value in el.attrib.items():
+        if name not in allowed:
+            continue
+        if (tag, name) in URL_ATTRIBUTES:
+            value = _url(tag, name, value, base_url)
+            if value is None:
+                continue
+        parts.append(f' {name}="{escape(value)}"')
+    return ''.join(parts)
+
+
+def sanitize(
+    html: Union[str, bytes],
+    base_url: Optional[str] = None,
+    snippet_length: Optional[int] = SNIPPET_LENGTH
+) -> Dict[str, str]:
+    """
+    Очищает HTML и извлекает текст за один разбор.
+
+    Разрешенные теги (ALLOWED_TAGS) сохраняются с разрешенными атрибутами,
+    остальные заменяются своим содержимым; DROP_TAGS и комментарии
+    удаляются целиком. Ссылки и изображения приводятся к абсолютным URL
+    относительно base_url.
+
+    Args:
+        html: HTML страницы или фрагмента (str или bytes из хранилища тел)
+        base_url: Базовый URL для нормализации относительных ссылок
+        snippet_length: Длина сниппета в символах
+
+    Returns:
+        {'html': очищенный HTML, 'text': текст, 'snippet': сниппет}
+    """
+    empty = {'html': '', 'text': '', 'snippet': ''}
+    if not html:
+        return empty
+    try:
+        document = lxml_html.document_fromstring(_decode(html))
+    except (etree.ParserError, ValueError) as e:
+        # Пустой документ или только комментарии
+        logger.debug(f"Ошибка парсинга HTML: {e}")
+        return empty
+    root = document.find('body')
+    if root is None:
+        root = document
+
+    out: List[str] = []
+    text: List[str] = []
+    # Глубина вложенности в <pre> и позиции текста в out, где пробелы
+    # сохраняются; остальные пробелы схлопываются в конце одним проходом
+    pre = 0
+    preserved = set()
+
+    def emit(value: Optional[str]) -> None:
+        if not value:
+            return
+        text.append(value)
+        if pre:
+            preserved.add(len(out))
+        out.append(escape(value, quote=False))
+
+    walker = etree.iterwalk(root, events=('start', 'end', 'comment', 'pi'))
+    for event, el in walker:
+        if event in ('comment', 'pi'):
+            emit(el.tail)
+            continue
+        tag = el.tag.lower() if isinstance(el.tag, str) else ''
+        if event == 'start':
+            if tag in DROP_TAGS:
+                walker.skip_subtree()
+                continue
+            if tag in BLOCK_TAGS:
+                text.append(' ')
+            if tag in ALLOWED_TAGS:
+                out.append(f'<{tag}{_attributes(el, tag, base_url)}>')
+                if tag == 'pre':
+                    pre += 1
+            emit(el.text)
+        else:
+            if tag in ALLOWED_TAGS and tag not in VOID_TAGS:
+                out.append(f'</{tag}>')
+                if tag == 'pre':
+                    pre -= 1
+            if tag in BLOCK_TAGS:
+                text.append(' ')
+            if el is not root:
+                emit(el.tail)
+
+    if preserved:
+        cleaned = ''.join(
+            part if index in preserved else _WHITESPACE.sub(' ', part)
+            for index, part in enumerate(out)
+        )
+    else:
+        cleaned = _WHITESPACE.sub(' ', ''.join(out))
+    plain = _WHITESPACE.sub(' ', ''.join(text)).strip()
+    return {
+        'html': cleaned.strip(),
+        'text': plain,
+        'snippet': _truncate(plain, snippet_length),
+    }
+
 
 def clean_html(html: str, base_url: Optional[str] = None) -> str:
     """
     Очищает HTML от опасных тегов и атрибутов.
-    
+
     Args:
         html: HTML строка для очистки
         base_url: Базовый URL для нормализации относительных ссылок
-    
+
     Returns:
         Очищенный HTML
     """
-    if not html:
-        return ''
-    
-    try:
-        soup = BeautifulSoup(html, 'lxml')
-    except Exception as e:
-        logger.warning(f"Ошибка парсинга HTML: {e}")
-        # Пытаемся использовать html5lib как fallback
-        soup = BeautifulSoup(html, 'html.parser')
-    
-    # Удаляем скрипты и стили
-    for tag in soup(['script', 'style', 'iframe', 'object', 'embed']):
-        tag.decompose()
-    
-    # Очищаем теги
-    cleaned = _clean_tag(soup, base_url)
-    
-    # Убираем множественные пробелы
-    result = re.sub(r'\s+', ' ', str(cleaned))
-    result = re.sub(r'\n\s*\n', '\n\n', result)
-    
-    return result.strip()
-
-
-def _clean_tag(tag: Tag, base_url: Optional[str] = None) -> Tag:
-    """Рекурсивно очищает теги."""
-    if isinstance(tag, NavigableString):
-        return tag
-    
-    if tag.name not in ALLOWED_TAGS:
-        # Заменяем неразрешенный тег на его содержимое
-        tag.replace_with(tag.get_text())
-        return tag
-    
-    # Удаляем неразрешенные атрибуты
-    allowed_attrs = ALLOWED_ATTRIBUTES.get(tag.name, [])
-    attrs_to_remove = []
-    for attr in tag.attrs:
-        if attr not in allowed_attrs:
-            attrs_to_remove.append(attr)
-    
-    for attr in attrs_to_remove:
-        del tag.attrs[attr]
-    
-    # Нормализуем ссылки
-    if tag.name == 'a' and 'href' in tag.attrs:
-        href = tag.attrs['href']
-        if base_url and not href.startswith(('http://', 'https://')):
-            tag.attrs['href'] = urljoin(base_url, href)
-    
-    # Нормализуем изображения
-    if tag.name == 'img' and 'src' in tag.attrs:
-        src = tag.attrs['src']
-        if base_url and not src.startswith(('http://', 'https://', 'data:')):
-            tag.attrs['src'] = urljoin(base_url, src)
-    
-    # Рекурсивно обрабатываем дочерние элементы
-    for child in list(tag.children):
-        _clean_tag(child, base_url)
-    
-    return tag
+    return sanitize(html, base_url, snippet_length=None)['html']
 
 
 def extract_text(html: str, max_length: Optional[int] = None) -> str:
     """Извлекает текст из HTML для использования в сниппетах."""
-    soup = BeautifulSoup(html, 'lxml')
-    text = soup.get_text(separator=' ', strip=True)
-    
-    if max_length:
-        if len(text) > max_length:
-            text = text[:max_length].rsplit(' ', 1)[0] + '...'
-    
-    return text
+    return _truncate(sanitize(html, snippet_length=None)['text'], max_length)
+
+
+def _sanitize_chunk(chunk: List[Tuple[Any, Optional[str]]], snippet_length: Optional[int]) -> List[Dict[str, str]]:
+    return [sanitize(html, base_url, snippet_length) for html, base_url in chunk]
+
+
+def _chunks(documents: Iterable[Tuple[Any, Optional[str]]], size: int) -> Iterator[List[Tuple[Any, Optional[str]]]]:
+    chunk = []
+    for document in documents:
+        chunk.append(document)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def sanitize_many(
+    documents: Iterable[Tuple[Union[str, bytes], Optional[str]]],
+    workers: Optional[int] = None,
+    chunk_size: int = 64,
+    snippet_length: Optional[int] = SNIPPET_LENGTH
+) -> Iterator[Dict[str, str]]:
+    """
+    sanitize для потока документов в пуле процессов.
+
+    Документы передаются процессам пакетами по chunk_size, в работе не
+    больше двух пакетов на процесс, поэтому поток может быть любой длины.
+
+    Args:
+        documents: Пары (html, base_url)
+        workers: Число процессов (None — по числу CPU, 0 — в текущем процессе)
+        chunk_size: Документов в пакете
+        snippet_length: Длина сниппета
+
+    Yields:
+        Результаты sanitize в порядке documents
+    """
+    workers = multiprocessing.cpu_count() if workers is None else workers
+    if workers <= 0:
+        for html, base_url in documents:
+            yield sanitize(html, base_url, snippet_length)
+        return
+
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        in_flight = deque()
+        for chunk in _chunks(documents, chunk_size):
+            in_flight.append(pool.submit(_sanitize_chunk, chunk, snippet_length))
+            if len(in_flight) >= workers * 2:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
 
 
 def normalize_media_url(url: str, base_url: str) -> str:
     """Нормализует URL медиа-файлов."""
-    from urllib.parse import urljoin
     if not url.startswith(('http://', 'https://', 'data:')):
         return urljoin(base_url, url)
     return url
-
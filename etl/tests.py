@@ -0,0 +1,518 @@
+"""
+Тесты ETL: нормализация HTML, запись JSONL, загрузка страниц, HTTP-кэш,
+очередь обхода.
+"""
+import gzip
+import io
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import requests
+
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from etl import util
+from etl.crawler import OJSCrawler
+from etl.fetcher import Fetcher
+from etl.frontier import PRIORITY_ARCHIVE, PRIORITY_ARTICLE, PRIORITY_GALLEY, PRIORITY_ISSUE, Frontier
+from etl.httpcache import CachingAdapter, HTTPCache, OfflineMiss
+from etl.normalize import sanitize, sanitize_many
+from etl.util import JSONLWriter, load_jsonl
+
+
+class SanitizeTests(unittest.TestCase):
+    """sanitize: белый список тегов и атрибутов, текст и сниппет за один разбор."""
+
+    BASE = 'https://jhdkz.org/index.php/jhd/article/view/1'
+
+    def test_unsafe_urls_removed(self):
+        result = sanitize(
+            '<p><a href="javascript:alert(1)">a</a><a href=" JavaScript:alert(1)">b</a>'
+            '<img src="data:text/html,<script>alert(1)</script>">'
+            '<img src="data:image/png;base64,AAAA"></p>',
+            self.BASE,
+        )
+        self.assertEqual(result['html'], '<p><a>a</a><a>b</a><img><img src="data:image/png;base64,AAAA"></p>')
+
+    def test_relative_urls_made_absolute(self):
+        result = sanitize('<a href="../download/1/2" onclick="x()">PDF</a>', self.BASE)
+        self.assertEqual(result['html'], '<a href="https://jhdkz.org/index.php/jhd/article/download/1/2">PDF</a>')
+
+    def test_dropped_tags_keep_tail(self):
+        result = sanitize('<p>до<script>alert(1)</script> после<style>p{}</style>!<!-- c -->?</p>')
+        self.assertEqual(result['html'], '<p>до после!?</p>')
+        self.assertEqual(result['text'], 'до после!?')
+
+    def test_unknown_tags_replaced_by_content(self):
+        result = sanitize('<section><p>Текст <font color="red">статьи</font></p></section>')
+        self.assertEqual(result['html'], '<p>Текст статьи</p>')
+
+    def test_whitespace_preserved_in_pre(self):
+        result = sanitize('<p>a   b</p><pre>x  =  1\n    y</pre><p>c\n\nd</p>')
+        self.assertEqual(result['html'], '<p>a b</p><pre>x  =  1\n    y</pre><p>c d</p>')
+        self.assertEqual(result['text'], 'a b x = 1 y c d')
+
+    def test_bytes_input(self):
+        html = '<p>Денсаулық</p>'
+        self.assertEqual(sanitize(html.encode('utf-8')), sanitize(html))
+        # Не UTF-8: кодировка из разметки
+        cp1251 = '<html><head><meta charset="windows-1251"></head><body><p>Здоровье</p></body></html>'
+        self.assertEqual(sanitize(cp1251.encode('cp1251'))['text'], 'Здоровье')
+
+    def test_snippet_truncated_on_word(self):
+        result = sanitize('<p>' + 'слово ' * 100 + '</p>', snippet_length=20)
+        self.assertEqual(result['snippet'], 'слово слово слово...')
+
+    def test_empty_input(self):
+        self.assertEqual(sanitize(''), {'html': '', 'text': '', 'snippet': ''})
+        self.assertEqual(sanitize('<!-- только комментарий -->')['html'], '')
+
+
+class SanitizeManyTests(unittest.TestCase):
+    """sanitize_many: результаты в порядке документов при любом числе процессов."""
+
+    def setUp(self):
+        self.documents = [(f'<p>Документ {i}</p>', None) for i in range(10)]
+        self.expected = [f'Документ {i}' for i in range(10)]
+
+    def test_in_process(self):
+        results = sanitize_many(self.documents, workers=0)
+        self.assertEqual([result['text'] for result in results], self.expected)
+
+    def test_process_pool_keeps_order(self):
+        results = sanitize_many(iter(self.documents), workers=2, chunk_size=3)
+        self.assertEqual([result['text'] for result in results], self.expected)
+
+
+class JSONLWriterTests(unittest.TestCase):
+    """JSONLWriter: контрольные точки, ротация, сжатие и возобновление."""
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+    def _crash(self, writer, records):
+        """Записи дошли до файла, но контрольной точки после них нет."""
+        for record in records:
+            writer.write(record)
+        writer._flush_buffer()
+        writer._end_block()
+        writer._raw.close()
+
+    def test_tail_after_checkpoint_truncated(self):
+        path = self.tmp / 'raw.jsonl.gz'
+        writer = JSONLWriter(path)
+        writer.write({'n': 1})
+        writer.checkpoint()
+        self._crash(writer, [{'n': 2}])
+
+        with self.assertLogs('etl', 'WARNING'), JSONLWriter(path) as writer:
+            self.assertEqual(writer.records, 1)
+            writer.write({'n': 3})
+        self.assertEqual([record['n'] for record in load_jsonl(path)], [1, 3])
+
+    def test_file_without_checkpoint_truncated(self):
+        path = self.tmp / 'raw.jsonl'
+        self._crash(JSONLWriter(path), [{'n': 1}])
+        self.assertFalse((self.tmp / 'raw.jsonl.checkpoint').exists())
+
+        with self.assertLogs('etl', 'WARNING'), JSONLWriter(path) as writer:
+            writer.write({'n': 2})
+        self.assertEqual([record['n'] for record in load_jsonl(path)], [2])
+
+    def test_resume_appends_after_close(self):
+        path = self.tmp / 'raw.jsonl.gz'
+        with JSONLWriter(path) as writer:
+            writer.write({'n': 1})
+        with JSONLWriter(path) as writer:
+            writer.write({'n': 2})
+            self.assertEqual(writer.records, 2)
+        # Каждая контрольная точка закрывает gzip member: файл из нескольких блоков
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 2)
+        self.assertEqual([record['n'] for record in load_jsonl(path)], [1, 2])
+
+    def test_rotation(self):
+        path = self.tmp / 'raw.jsonl.gz'
+        with JSONLWriter(path, rotate_bytes=1) as writer:
+            for n in range(3):
+                writer.write({'n': n})
+                writer.checkpoint()
+        self.assertFalse(path.exists())
+        parts = util.jsonl_files(path)
+        self.assertEqual([part.name for part in parts[:3]], [
+            'raw.00001.jsonl.gz', 'raw.00002.jsonl.gz', 'raw.00003.jsonl.gz',
+        ])
+        self.assertEqual([record['n'] for record in load_jsonl(path)], [0, 1, 2])
+
+        # Возобновление продолжает последнюю часть
+        with JSONLWriter(path, rotate_bytes=1) as writer:
+            writer.write({'n': 3})
+        self.assertEqual([record['n'] for record in load_jsonl(path)], [0, 1, 2, 3])
+
+    @unittest.skipUnless(util.zstandard, 'нужен пакет zstandard')
+    def test_zstd_frames(self):
+        path = self.tmp / 'raw.jsonl.zst'
+        with JSONLWriter(path) as writer:
+            writer.write({'n': 1})
+            writer.checkpoint()
+            writer.write({'n': 2})
+        with JSONLWriter(path) as writer:
+            writer.write({'n': 3})
+        self.assertEqual([record['n'] for record in load_jsonl(path)], [1, 2, 3])
+
+
+class FakeClock:
+    """Подмена модуля time: sleep только сдвигает monotonic."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def http_response(url, status, headers=None, content=b''):
+    response = requests.Response()
+    response.url = url
+    response.status_code = status
+    response.headers.update(headers or {})
+    response.raw = io.BytesIO(b'')
+    response._content = content
+    response._content_consumed = True
+    return response
+
+
+class FetcherTests(unittest.TestCase):
+    """Fetcher: повторы временных ошибок и ограничение частоты по хостам."""
+
+    URL = 'https://jhdkz.org/index.php/jhd/issue/archive'
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('etl.fetcher.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.session = mock.Mock(spec=requests.Session)
+
+    def _fetcher(self, **kwargs):
+        kwargs.setdefault('rate_limit', 0)
+        return Fetcher(self.session, backoff=1.0, **kwargs)
+
+    def test_retries_server_errors(self):
+        self.session.get.side_effect = [
+            http_response(self.URL, 503), requests.ConnectionError('reset'), http_response(self.URL, 200),
+        ]
+        with self.assertLogs('etl', 'WARNING'):
+            response = self._fetcher().fetch(self.URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.session.get.call_count, 3)
+        # Экспоненциальная пауза со случайной добавкой до половины
+        first, second = self.clock.sleeps
+        self.assertTrue(1 <= first <= 1.5 and 2 <= second <= 3, self.clock.sleeps)
+
+    def test_429_waits_retry_after(self):
+        self.session.get.side_effect = [
+            http_response(self.URL, 429, {'Retry-After': '7'}), http_response(self.URL, 200),
+        ]
+        with self.assertLogs('etl', 'WARNING'):
+            self._fetcher().fetch(self.URL)
+        self.assertEqual(self.clock.sleeps, [7.0])
+
+    def test_attempts_capped(self):
+        self.session.get.side_effect = lambda url, timeout: http_response(url, 500)
+        with self.assertLogs('etl', 'WARNING'), self.assertRaises(requests.HTTPError):
+            self._fetcher(retries=2).fetch(self.URL)
+        self.assertEqual(self.session.get.call_count, 3)
+
+    def test_client_errors_not_retried(self):
+        self.session.get.return_value = http_response(self.URL, 404)
+        with self.assertRaises(requests.HTTPError):
+            self._fetcher().fetch(self.URL)
+        self.assertEqual(self.session.get.call_count, 1)
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_rate_limited_per_host(self):
+        self.session.get.side_effect = lambda url, timeout: http_response(url, 200)
+        fetcher = self._fetcher(rate_limit=2)
+        fetcher.fetch(self.URL)
+        fetcher.fetch('https://mirror.example.org/')
+        self.assertEqual(self.clock.sleeps, [])
+        # Второй запрос к тому же хосту ждет интервал rate_limit
+        fetcher.fetch(self.URL + '?page=2')
+        self.assertEqual(self.clock.sleeps, [2.0])
+        self.assertEqual(self.clock.now, 2.0)
+
+
+
+class CachingAdapterTests(unittest.TestCase):
+    """CachingAdapter: условные запросы, 304 из кэша и воспроизведение offline."""
+
+    URL = 'https://jhdkz.org/index.php/jhd/issue/archive'
+    HEADERS = {'Content-Type': 'text/html; charset=utf-8', 'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.cache = HTTPCache(str(self.tmp / 'cache'))
+        self.addCleanup(self.cache.close)
+        # Сеть: очередь ответов (статус, заголовки, тело) и отправленные запросы
+        self.replies = []
+        self.sent = []
+        patcher = mock.patch.object(HTTPAdapter, 'send', autospec=True, side_effect=self._transport)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _transport(self, adapter, request, **kwargs):
+        self.sent.append(request)
+        status, headers, content = self.replies.pop(0)
+        response = http_response(request.url, status, headers, content)
+        response.request = request
+        return response
+
+    def _session(self, offline=False):
+        session = requests.Session()
+        session.mount('https://', CachingAdapter(self.cache, offline))
+        self.addCleanup(session.close)
+        return session
+
+    def test_conditional_request_and_not_modified(self):
+        session = self._session()
+        self.replies.append((200, self.HEADERS, b'<html>v1</html>'))
+        first = session.get(self.URL)
+        self.assertFalse(first.not_modified)
+        self.assertNotIn('If-None-Match', self.sent[0].headers)
+
+        self.replies.append((304, {}, b''))
+        second = session.get(self.URL)
+        self.assertEqual(self.sent[1].headers['If-None-Match'], '"v1"')
+        self.assertEqual(self.sent[1].headers['If-Modified-Since'], self.HEADERS['Last-Modified'])
+        self.assertTrue(second.not_modified and second.from_cache)
+        self.assertEqual((second.status_code, second.content), (200, b'<html>v1</html>'))
+        self.assertEqual(second.headers['ETag'], '"v1"')
+
+    def test_changed_page_replaces_entry(self):
+        session = self._session()
+        self.replies.append((200, self.HEADERS, b'<html>v1</html>'))
+        session.get(self.URL)
+        self.replies.append((200, dict(self.HEADERS, ETag='"v2"'), b'<html>v2</html>'))
+        response = session.get(self.URL)
+        self.assertFalse(response.not_modified)
+        self.assertEqual(response.content, b'<html>v2</html>')
+        self.assertEqual(self.cache.get(self.URL)['etag'], '"v2"')
+
+    def test_missing_body_refetched_unconditionally(self):
+        session = self._session()
+        self.replies.append((200, self.HEADERS, b'<html>v1</html>'))
+        session.get(self.URL)
+        self.cache.blobs.path(self.cache.get(self.URL)['sha256']).unlink()
+        self.replies.append((200, self.HEADERS, b'<html>v1</html>'))
+        session.get(self.URL)
+        self.assertNotIn('If-None-Match', self.sent[1].headers)
+
+    def test_offline_replays_redirects(self):
+        old = 'https://jhdkz.org/index.php/jhd/issue/current'
+        self.replies.append((302, {'Location': self.URL}, b''))
+        self.replies.append((200, self.HEADERS, b'<html>v1</html>'))
+        self._session().get(old)
+
+        response = self._session(offline=True).get(old)
+        self.assertEqual(len(self.sent), 2)
+        self.assertEqual([r.status_code for r in response.history], [302])
+        self.assertEqual((response.url, response.content), (self.URL, b'<html>v1</html>'))
+        self.assertTrue(response.from_cache)
+        self.assertFalse(response.not_modified)
+
+    def test_offline_miss(self):
+        with self.assertRaises(OfflineMiss):
+            self._session(offline=True).get(self.URL)
+        self.assertEqual(self.sent, [])
+
+
+JOURNAL = 'https://jhdkz.org/index.php/jhd'
+
+# Страницы старого сайта (OJS 3, тема по умолчанию), сокращенные
+ARCHIVE_HTML = f"""
+<html><body>
+<h1>Архив</h1>
+<ul class="issues_archive">
+  <li><div class="obj_issue_summary">
+    <a class="title" href="{JOURNAL}/issue/view/40">Т. 5 № 2</a>
+    <div class="series">Т. 5 № 2 (2019)</div>
+  </div></li>
+  <li><div class="obj_issue_summary">
+    <a class="title" href="{JOURNAL}/issue/view/41?locale=ru_RU">Т. 6 № 1 (2020)</a>
+  </div></li>
+  <li><div class="obj_issue_summary">
+    <a class="title" href="{JOURNAL}/issue/view/3">Т. 1 № 1</a>
+    <div class="series">Т. 1 № 1 (2008)</div>
+  </div></li>
+</ul>
+<div class="cmp_pagination"><a class="next" href="{JOURNAL}/issue/archive/2">Следующая</a></div>
+<a href="https://jhdkz.org/index.php/jhd/about">О журнале</a>
+<a href="https://example.org/index.php/jhd/issue/view/40">Зеркало</a>
+</body></html>
+"""
+
+ISSUE_HTML = f"""
+<html><head><title>Т. 5 № 2 (2019) | Journal of Health Development</title></head><body>
+<h1>Т. 5 № 2 (2019)</h1>
+<div class="obj_article_summary">
+  <h3 class="title"><a href="{JOURNAL}/article/view/100">Статья</a></h3>
+  <ul class="galleys_links">
+    <li><a class="obj_galley_link pdf" href="{JOURNAL}/article/view/100/200">PDF (Русский)</a></li>
+    <li><a class="obj_galley_link pdf" href="{JOURNAL}/article/view/100/201">PDF (English)</a></li>
+    <li><a class="obj_galley_link pdf" href="{JOURNAL}/article/download/100/202#page=1">PDF</a></li>
+  </ul>
+</div>
+<a href="{JOURNAL}/issue/archive">Архив</a>
+</body></html>
+"""
+
+
+class FrontierTests(unittest.TestCase):
+    """Frontier: очередь по приоритетам и возобновление после перезапуска."""
+
+    def setUp(self):
+        self.frontier = Frontier()
+        self.addCleanup(self.frontier.close)
+        self.frontier.add([
+            (JOURNAL + '/article/view/1', PRIORITY_ARTICLE, 2019),
+            (JOURNAL + '/issue/view/1', PRIORITY_ISSUE, 2019),
+            (JOURNAL + '/issue/archive', PRIORITY_ARCHIVE, None),
+        ])
+
+    def test_pop_by_priority(self):
+        self.assertEqual(self.frontier.add([(JOURNAL + '/issue/view/1', PRIORITY_ISSUE, None)]), 0)
+        self.assertEqual(self.frontier.pop(2), [(JOURNAL + '/issue/archive', None), (JOURNAL + '/issue/view/1', 2019)])
+        self.assertEqual(self.frontier.pop(5), [(JOURNAL + '/article/view/1', 2019)])
+        self.assertEqual(self.frontier.pop(5), [])
+        self.assertEqual(self.frontier.stats(), {'in_progress': 3})
+
+    def test_resume(self):
+        archive, issue = (url for url, _ in self.frontier.pop(2))
+        self.frontier.done(archive)
+        self.frontier.failed(issue, 'HTTP 500')
+        self.frontier.pop(1)
+        self.assertEqual(self.frontier.resume(), 1)
+        self.assertEqual(self.frontier.pop(5), [(JOURNAL + '/article/view/1', 2019)])
+        # Неудачные возвращаются только по запросу
+        self.assertEqual(self.frontier.resume(retry_failed=True), 2)
+        self.assertEqual(self.frontier.stats(), {'done': 1, 'pending': 2})
+
+    def test_requeue_done(self):
+        urls = [url for url, _ in self.frontier.pop(3)]
+        self.frontier.done_many(urls[:2])
+        self.assertEqual(self.frontier.requeue_done(), 2)
+        self.assertEqual(self.frontier.stats(), {'in_progress': 1, 'pending': 2})
+
+    def test_has_children(self):
+        self.frontier.add([(JOURNAL + '/issue/view/2', PRIORITY_ISSUE, 2020)], parent=JOURNAL + '/issue/archive')
+        self.assertTrue(self.frontier.has_children(JOURNAL + '/issue/archive'))
+        self.assertFalse(self.frontier.has_children(JOURNAL + '/issue/view/1'))
+
+
+class DiscoverTests(unittest.TestCase):
+    """OJSCrawler: ссылки архива и выпуска, фильтры since_year и langs."""
+
+    def setUp(self):
+        self.crawler = OJSCrawler('https://jhdkz.org/', since_year=2010, langs=['ru', 'kk'])
+        self.addCleanup(self.crawler.frontier.close)
+
+    def _links(self, url, html, year=None):
+        return self.crawler._links(url, BeautifulSoup(html, 'lxml'), year)
+
+    def test_archive_links(self):
+        links = self._links(JOURNAL + '/issue/archive', ARCHIVE_HTML)
+        self.assertEqual(sorted(links), [
+            (JOURNAL + '/issue/archive/2', PRIORITY_ARCHIVE, None),
+            (JOURNAL + '/issue/view/40', PRIORITY_ISSUE, 2019),
+            (JOURNAL + '/issue/view/41', PRIORITY_ISSUE, 2020),
+        ])
+
+    def test_issue_links(self):
+        # Год выпуска из заголовка страницы переходит статьям и гранкам
+        links = self._links(JOURNAL + '/issue/view/40', ISSUE_HTML)
+        self.assertEqual(sorted(links), [
+            (JOURNAL + '/article/download/100/202', PRIORITY_GALLEY, 2019),
+            (JOURNAL + '/article/view/100', PRIORITY_ARTICLE, 2019),
+            (JOURNAL + '/article/view/100/200', PRIORITY_GALLEY, 2019),
+            (JOURNAL + '/issue/archive', PRIORITY_ARCHIVE, 2019),
+        ])
+
+    def test_old_issue_not_expanded(self):
+        html = ISSUE_HTML.replace('(2019)', '(2008)')
+        self.assertEqual(self._links(JOURNAL + '/issue/view/3', html), [])
+
+
+class CrawlResumeTests(unittest.TestCase):
+    """Прерванный обход продолжается из файла очереди."""
+
+    PAGES = {
+        JOURNAL + '/issue/archive': ARCHIVE_HTML.replace('/issue/view/41', '/issue/view/40'),
+        JOURNAL + '/issue/view/40': ISSUE_HTML,
+        JOURNAL + '/issue/current': '<html><body><h1>Текущий выпуск</h1></body></html>',
+        JOURNAL + '/article/view/100': '<html><body><h1>Статья</h1></body></html>',
+    }
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.fetched = []
+
+    def _fetch(self, url):
+        self.fetched.append(url)
+        if url not in self.PAGES:
+            raise requests.HTTPError(f'404 для {url}')
+        return http_response(url, 200, {'Content-Type': 'text/html'}, self.PAGES[url].encode('utf-8'))
+
+    def _crawler(self):
+        crawler = OJSCrawler(
+            'https://jhdkz.org/', rate_limit=0, concurrency=1, langs=['ru'],
+            frontier_path=str(self.tmp / 'frontier.sqlite3'),
+        )
+        crawler.fetcher.fetch = self._fetch
+        self.addCleanup(crawler.frontier.close)
+        return crawler
+
+    def test_restart_does_not_duplicate_output(self):
+        from etl.cli import main
+
+        out = self.tmp / 'raw.jsonl.gz'
+        argv = [
+            'etl', 'crawl', '--start', 'https://jhdkz.org/', '--out', str(out), '--langs', 'ru',
+            '--rate-limit', '0', '--concurrency', '1', '--no-cache', '--restart',
+        ]
+        fetch = lambda fetcher, url: self._fetch(url)
+        with mock.patch.object(Fetcher, 'fetch', fetch), mock.patch('sys.argv', argv):
+            for _ in range(2):
+                with self.assertLogs('etl', 'INFO'):
+                    main()
+                urls = [record['source_url'] for record in load_jsonl(out)]
+                self.assertEqual(sorted(urls), sorted(self.PAGES))
+
+    def test_resume_after_interrupt(self):
+        items = self._crawler().crawl()
+        with self.assertLogs('etl', 'INFO'):
+            first = next(items)
+        self.assertEqual(first['source_url'], JOURNAL + '/issue/archive')
+        # Потребитель прервал обход: отданный результат фиксируется
+        items.close()
+
+        self.fetched.clear()
+        with self.assertLogs('etl', 'ERROR'):
+            urls = [item['source_url'] for item in self._crawler().crawl()]
+        # Архив не загружается повторно; выпуск из архива найден прошлым запуском
+        self.assertNotIn(JOURNAL + '/issue/archive', self.fetched)
+        self.assertEqual(sorted(urls), [
+            JOURNAL + '/article/view/100', JOURNAL + '/issue/current', JOURNAL + '/issue/view/40',
+        ])
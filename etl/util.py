@@ -1,15 +1,38 @@
 """
 Утилиты для ETL процесса.
+
+JSONLWriter пишет результаты обхода буферами, при необходимости сжимая
+(gzip или zstd) и разбивая вывод на части по размеру. checkpoint()
+сбрасывает буфер, закрывает сжатый блок и делает fsync, после чего
+записи до этой точки переживают падение процесса; хвост, записанный
+после последней контрольной точки (или весь файл, если точки еще не
+было), при следующем открытии отрезается.
+load_jsonl читает такие файлы (и все части) потоком.
 """
+import gzip
 import hashlib
+import io
 import json
 import logging
+import os
+import re
+import tempfile
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, List, Optional
 from urllib.parse import urlparse, urljoin
 
+try:
+    import zstandard
+except ImportError:
+    # zstd необязателен: без пакета доступны только gzip и несжатый вывод
+    zstandard = None
+
 logger = logging.getLogger('etl')
 
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
 
 def calculate_sha256(content: bytes) -> str:
     """Вычисляет SHA256 хеш контента."""
@@ -29,12 +52,217 @@ def save_jsonl(data: Dict[str, Any], output_path: Path) -> None:
         f.write(json.dumps(data, ensure_ascii=False) + '\n')
 
 
-def load_jsonl(input_path: Path):
-    """Загружает данные из JSONL файла."""
-    with open(input_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            if line.strip():
-                yield json.loads(line)
+def compression_for(path: Path) -> Optional[str]:
+    """Сжатие по расширению файла: 'gzip', 'zstd' или None."""
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if path.name.endswith(suffix):
+            return compression
+    return None
+
+
+def _split_name(path: Path):
+    """'raw.jsonl.gz' -> ('raw', '.jsonl.gz')."""
+    base, dot, suffixes = path.name.partition('.')
+    return base, dot + suffixes
+
+
+def part_path(path: Path, number: int) -> Path:
+    """Имя части при ротации: raw.jsonl.gz -> raw.00001.jsonl.gz."""
+    base, suffixes = _split_name(path)
+    return path.with_name(f'{base}.{number:05d}{suffixes}')
+
+
+def jsonl_files(path: Path) -> List[Path]:
+    """Файл path или, если вывод разбит на части, все части по порядку."""
+    path = Path(path)
+    return [path] if path.exists() else _parts(path)
+
+
+def _parts(path: Path) -> List[Path]:
+    base, suffixes = _split_name(path)
+    pattern = re.compile(rf'^{re.escape(base)}\.(\d{{5}}){re.escape(suffixes)}$')
+    parts = [part for part in path.parent.glob(f'{base}.*{suffixes}') if pattern.match(part.name)]
+    return sorted(parts, key=lambda part: part.name)
+
+
+def _open_text(path: Path):
+    """Текстовый поток файла; сжатие определяется по сигнатуре."""
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if magic.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise RuntimeError(f'Для чтения {path} нужен пакет zstandard')
+        raw = open(path, 'rb')
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(reader, encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def load_jsonl(input_path: Path) -> Iterator[Dict[str, Any]]:
+    """Загружает данные из JSONL файла (в том числе сжатого и разбитого на части)."""
+    files = jsonl_files(input_path)
+    if not files:
+        raise FileNotFoundError(input_path)
+    for path in files:
+        with _open_text(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class JSONLWriter:
+    """
+    Буферизованная запись JSONL со сжатием, ротацией и контрольными точками.
+    
+    Вывод дописывается к существующим файлам, поэтому возобновленный обход
+    продолжает тот же файл. Состояние последней контрольной точки хранится
+    рядом, в <path>.checkpoint; файл без контрольной точки считается
+    незавершенным и начинается заново. Запуск, который начинает работу с
+    начала (truncate=True), удаляет прежний вывод.
+    """
+    
+    def __init__(
+        self,
+        path: Path,
+        compression: Optional[str] = 'auto',
+        buffer_size: int = 1024 * 1024,
+        rotate_bytes: Optional[int] = None,
+        truncate: bool = False
+    ):
+        """
+        Args:
+            path: Файл вывода; при ротации — шаблон имени частей (part_path)
+            compression: 'gzip', 'zstd', None или 'auto' (по расширению path)
+            buffer_size: Размер буфера записей в байтах
+            rotate_bytes: Начинать новую часть, когда текущая превысит размер
+                (проверяется на контрольных точках)
+            truncate: Удалить прежний вывод (файл, части и контрольную точку):
+                запуск начинается заново и не дописывает те же записи
+        """
+        self.path = Path(path)
+        self.compression = compression_for(self.path) if compression == 'auto' else compression
+        if self.compression not in (None, 'gzip', 'zstd'):
+            raise ValueError(f'Неизвестное сжатие: {self.compression}')
+        if self.compression == 'zstd' and zstandard is None:
+            raise RuntimeError('Для сжатия zstd установите пакет zstandard')
+        self.buffer_size = buffer_size
+        self.rotate_bytes = rotate_bytes
+        self.checkpoint_path = self.path.with_name(self.path.name + '.checkpoint')
+        self.records = 0
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+        self._raw = None
+        self._stream = None
+        if truncate:
+            self._remove()
+        self._open(self._restore())
+    
+    def _remove(self) -> None:
+        """Удаляет прежний вывод и его контрольную точку."""
+        removed = [path for path in [self.path, *_parts(self.path), self.checkpoint_path] if path.exists()]
+        for path in removed:
+            path.unlink()
+        if removed:
+            logger.info(f"{self.path}: прежний вывод удален, запись начинается заново")
+    
+    def _restore(self) -> int:
+        """Отрезает незафиксированный хвост и возвращает номер текущей части."""
+        state = {}
+        if self.checkpoint_path.exists():
+            state = json.loads(self.checkpoint_path.read_text(encoding='utf-8'))
+            self.records = state.get('records', 0)
+        if self.rotate_bytes:
+            parts = _parts(self.path)
+            number = int(parts[-1].name.split('.')[1]) if parts else 1
+        else:
+            number = 0
+        current = self._file(number)
+        # Без контрольной точки для текущего файла в нем нет подтвержденных записей
+        offset = state['offset'] if state.get('file') == current.name else 0
+        if current.exists() and current.stat().st_size > offset:
+            # Записи после контрольной точки не подтверждены: обход их повторит
+            with open(current, 'r+b') as f:
+                f.truncate(offset)
+            logger.warning(f"{current}: отрезан незафиксированный хвост после контрольной точки")
+        return number
+    
+    def _file(self, number: int) -> Path:
+        return part_path(self.path, number) if self.rotate_bytes else self.path
+    
+    def _open(self, number: int) -> None:
+        self.number = number
+        self.current = self._file(number)
+        self.current.parent.mkdir(parents=True, exist_ok=True)
+        self._raw = open(self.current, 'ab')
+    
+    def _compressor(self):
+        """Новый сжатый блок (gzip member / zstd frame) поверх файла."""
+        if self.compression == 'gzip':
+            return gzip.GzipFile(fileobj=self._raw, mode='wb', mtime=0)
+        if self.compression == 'zstd':
+            return zstandard.ZstdCompressor().stream_writer(self._raw, closefd=False)
+        return self._raw
+    
+    def write(self, record: Dict[str, Any]) -> None:
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        self._buffer.append(line)
+        self._buffered += len(line)
+        self.records += 1
+        if self._buffered >= self.buffer_size:
+            self._flush_buffer()
+    
+    def _flush_buffer(self) -> None:
+        if not self._buffer:
+            return
+        if self._stream is None:
+            self._stream = self._compressor()
+        self._stream.write(b''.join(self._buffer))
+        self._buffer.clear()
+        self._buffered = 0
+    
+    def _end_block(self) -> None:
+        """Закрывает сжатый блок: данные до этой точки читаются без продолжения."""
+        if self._stream is not None and self._stream is not self._raw:
+            if self.compression == 'zstd':
+                self._stream.flush(zstandard.FLUSH_FRAME)
+            else:
+                self._stream.close()
+        self._stream = None
+        self._raw.flush()
+    
+    def checkpoint(self) -> None:
+        """Сбрасывает буфер на диск (fsync) и фиксирует позицию в <path>.checkpoint."""
+        self._flush_buffer()
+        self._end_block()
+        os.fsync(self._raw.fileno())
+        offset = self._raw.tell()
+        if self.rotate_bytes and offset >= self.rotate_bytes:
+            # Часть заполнена и зафиксирована: дальше пишем в следующую
+            self._raw.close()
+            self._open(self.number + 1)
+            offset = 0
+        state = {'file': self.current.name, 'offset': offset, 'records': self.records}
+        fd, tmp = tempfile.mkstemp(dir=self.checkpoint_path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.checkpoint_path)
+    
+    def close(self) -> None:
+        if self._raw is None:
+            return
+        self.checkpoint()
+        self._raw.close()
+        self._raw = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
 
 
 def ensure_dir(path: Path) -> None:
@@ -2,6 +2,30 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.utils.text import slugify
 
+
+class IssueQuerySet(models.QuerySet):
+    def published(self):
+        return self.filter(status='published')
+
+    def with_article_counts(self):
+        """Аннотирует число опубликованных статей выпуска (одним запросом для всего списка)."""
+        return self.annotate(
+            published_articles_count=models.Count('articles', filter=models.Q(articles__status='published'))
+        )
+
+    def year_summary(self):
+        """Итоги по годам (GROUP BY year): [{'year', 'issues', 'articles'}] по убыванию года."""
+        return (
+            self.order_by()
+            .values('year')
+            .annotate(
+                issues=models.Count('pk', distinct=True),
+                articles=models.Count('articles', filter=models.Q(articles__status='published')),
+            )
+            .order_by('-year')
+        )
+
+
 class Issue(models.Model):
     """
     Модель выпуска журнала.
@@ -38,6 +62,8 @@ class Issue(models.Model):
     description = models.TextField("Описание", blank=True)
     keywords = models.CharField("Ключевые слова", max_length=500, blank=True)
     
+    objects = IssueQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "Выпуск"
         verbose_name_plural = "Выпуски"
@@ -68,8 +94,13 @@ class Issue(models.Model):
     
     @property
     def articles_count(self):
-        """Возвращает количество статей в выпуске."""
-        return self.articles.count()
+        """
+        Возвращает количество опубликованных статей в выпуске.
+        Для списков используйте Issue.objects.with_article_counts() — без запроса на каждый выпуск.
+        """
+        if hasattr(self, 'published_articles_count'):
+            return self.published_articles_count
+        return self.articles.filter(status='published').count()
     
     def get_volume_info(self):
         """Возвращает информацию о томе и номере."""
@@ -1,3 +1,51 @@
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from articles.models import Article
+from .models import Issue
+
+
+class IssueListingTests(TestCase):
+    """Списки выпусков: счетчики статей аннотацией, группировка по годам."""
+
+    def setUp(self):
+        cache.clear()
+        for year, number, articles in ((2024, 1, 2), (2025, 1, 1), (2025, 2, 0)):
+            issue = Issue.objects.create(year=year, number=number, title_ru=f"Выпуск {year}-{number}", status='published')
+            for i in range(articles):
+                Article.objects.create(
+                    issue=issue, title_ru=f"Статья {year}-{number}-{i}", abstract_ru="А", keywords_ru="к",
+                    page_start=1, page_end=2, status='published',
+                )
+        draft_issue = Issue.objects.get(year=2024, number=1)
+        Article.objects.create(
+            issue=draft_issue, title_ru="Черновик", abstract_ru="А", keywords_ru="к",
+            page_start=3, page_end=4, status='draft',
+        )
+
+    def test_issue_list(self):
+        response = self.client.get(reverse('issues:issue_list'))
+        self.assertEqual(response.status_code, 200)
+        years = response.context['years']
+        self.assertEqual([year for year, _ in years], [2025, 2024])
+        self.assertEqual([issue.number for issue in years[0][1]], [2, 1])
+        self.assertEqual(years[1][1][0].articles_count, 2)
+
+    def test_archive_summary_and_filter(self):
+        response = self.client.get(reverse('issues:issue_archive'))
+        self.assertEqual(response.context['total_issues'], 3)
+        self.assertEqual(response.context['total_articles'], 3)
+        self.assertEqual(response.context['all_years'], [2025, 2024])
+
+        response = self.client.get(reverse('issues:issue_archive'), {'year': '2025'})
+        self.assertEqual(response.context['total_issues'], 2)
+        self.assertEqual(response.context['total_articles'], 1)
+        self.assertEqual([year for year, _ in response.context['years']], [2025])
+
+        self.assertEqual(self.client.get(reverse('issues:issue_archive'), {'year': 'x'}).status_code, 200)
+
+    def test_counts_do_not_query_per_issue(self):
+        issues = list(Issue.objects.published().with_article_counts())
+        with self.assertNumQueries(0):
+            self.assertEqual(sorted(issue.articles_count for issue in issues), [0, 1, 2])
@@ -1,8 +1,22 @@
+from itertools import groupby
+from operator import attrgetter
+
 from django.shortcuts import render, get_object_or_404
 from django.views.generic import ListView, DetailView
-from django.db.models import Q
+from django.db.models import Max, Q
+from django.utils.decorators import method_decorator
+from core.pagecache import cache_anonymous_page, tag
+from core.conditional import conditional_page, deleted_at, latest
+from articles.models import Article
 from .models import Issue
 
+
+def group_by_year(issues):
+    """[(год, [выпуски])] для списка выпусков, упорядоченного по убыванию года."""
+    return [(year, list(group)) for year, group in groupby(issues, key=attrgetter('year'))]
+
+
+@method_decorator(cache_anonymous_page('issues', 'articles'), name='dispatch')
 class IssueListView(ListView):
     """Список выпусков."""
     model = Issue
@@ -11,24 +25,32 @@ class IssueListView(ListView):
     paginate_by = 12
     
     def get_queryset(self):
-        return Issue.objects.filter(status='published').prefetch_related('articles')
+        return Issue.objects.published().with_article_counts().order_by('-year', '-number')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Группируем выпуски по годам
-        issues = self.get_queryset()
-        years = {}
-        for issue in issues:
-            year = issue.year
-            if year not in years:
-                years[year] = []
-            years[year].append(issue)
-        
-        # Сортируем годы в обратном порядке
-        context['years'] = sorted(years.items(), key=lambda x: x[0], reverse=True)
+        # Группируем по годам выпуски текущей страницы (уже упорядочены по году)
+        context['years'] = group_by_year(context['object_list'])
         return context
 
+def _issue_last_modified(request, year, number):
+    stats = Issue.objects.filter(year=year, number=number).aggregate(
+        issue=Max('updated_at'), articles=Max('articles__updated_at'),
+    )
+    if stats['issue'] is None:
+        return None
+    return latest(*stats.values(), deleted_at(Article))
+
+
+def _archive_last_modified(request):
+    stats = Issue.objects.filter(status='published').aggregate(
+        issue=Max('updated_at'), articles=Max('articles__updated_at'),
+    )
+    return latest(*stats.values(), deleted_at(Article, Issue))
+
+
+@method_decorator([conditional_page(_issue_last_modified), cache_anonymous_page('articles')], name='dispatch')
 class IssueDetailView(DetailView):
     """Детальная страница выпуска."""
     model = Issue
@@ -40,9 +62,10 @@ class IssueDetailView(DetailView):
         year = self.kwargs.get('year')
         number = self.kwargs.get('number')
         # Используем get_object_or_404 для корректной обработки 404 ошибок
-        return get_object_or_404(Issue, year=year, number=number)
+        return get_object_or_404(Issue.objects.with_article_counts(), year=year, number=number)
     
     def get_context_data(self, **kwargs):
+        tag(self.request, f'issue:{self.object.pk}')
         context = super().get_context_data(**kwargs)
         
         # Получаем статьи выпуска
@@ -50,32 +73,28 @@ class IssueDetailView(DetailView):
         
         return context
 
+@conditional_page(_archive_last_modified)
+@cache_anonymous_page('issues', 'articles')
 def issue_archive(request):
     """Архив выпусков."""
-    year = request.GET.get('year')
-    
-    issues = Issue.objects.filter(status='published').prefetch_related('articles')
+    year = request.GET.get('year', '')
+    if not year.isdigit():
+        year = ''
     
+    published = Issue.objects.published()
+    issues = published.with_article_counts().order_by('-year', '-number')
     if year:
         issues = issues.filter(year=year)
     
-    # Группируем по годам
-    years = {}
-    for issue in issues:
-        year = issue.year
-        if year not in years:
-            years[year] = []
-        years[year].append(issue)
-    
-    # Сортируем годы в обратном порядке
-    grouped_issues = sorted(years.items(), key=lambda x: x[0], reverse=True)
-    
-    # Получаем список всех лет для фильтрации
-    all_years = Issue.objects.filter(status='published').values_list('year', flat=True).distinct().order_by('-year')
+    # Итоги по годам считаются в SQL (GROUP BY year); по ним же строится фильтр
+    summary = list(published.year_summary())
+    selected = [row for row in summary if not year or row['year'] == int(year)]
     
     context = {
-        'years': grouped_issues,
-        'all_years': all_years,
+        'years': group_by_year(issues),
+        'all_years': [row['year'] for row in summary],
+        'total_issues': sum(row['issues'] for row in selected),
+        'total_articles': sum(row['articles'] for row in selected),
         'selected_year': year,
     }
     return render(request, 'issues/issue_archive.html', context)
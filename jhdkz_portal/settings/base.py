@@ -126,6 +126,118 @@ MEDIA_ROOT = env.str('MEDIA_ROOT', default=str(BASE_DIR / 'media'))
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Кэш: по умолчанию в памяти процесса — только для разработки в одном
+# процессе. С несколькими воркерами нужен общий (CACHE_URL=redis://127.0.0.1:6379/1,
+# обязателен в prod.py), иначе буфер счетчиков, версия редиректов и
+# инвалидация кэша страниц видны только своему процессу
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://jhdkz'),
+}
+CACHE_IS_SHARED = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# Кэш публичных страниц для анонимных посетителей (core.pagecache);
+# сбрасывается сигналами сохранения статей, выпусков, новостей и страниц.
+# По умолчанию включен только на общем кэше
+PAGE_CACHE_ENABLED = env.bool('PAGE_CACHE_ENABLED', default=CACHE_IS_SHARED)
+PAGE_CACHE_ALIAS = 'default'
+PAGE_CACHE_TIMEOUT = env.int('PAGE_CACHE_TIMEOUT', default=300)
+
+# Редиректы старых URL (core.redirects): ищутся в БД только пути с префиксами
+# старого сайта, ответы хранятся в LRU процесса; версия в общем кэше
+# сверяется не чаще раза в REDIRECTS_VERSION_CHECK_INTERVAL секунд
+REDIRECTS_CACHE_ALIAS = 'default'
+REDIRECTS_PATH_PREFIXES = env.list('REDIRECTS_PATH_PREFIXES', default=['/index.php/'])
+REDIRECTS_LRU_SIZE = env.int('REDIRECTS_LRU_SIZE', default=1024)
+REDIRECTS_VERSION_CHECK_INTERVAL = env.int('REDIRECTS_VERSION_CHECK_INTERVAL', default=5)
+
+# Журнал событий (core.events): очередь в памяти процесса, запись фоновым
+# потоком пакетами; 'sync' — запись сразу в запросе
+EVENTS_WRITER = env.str('EVENTS_WRITER', default='thread')
+EVENTS_BUFFER_SIZE = env.int('EVENTS_BUFFER_SIZE', default=10000)
+EVENTS_BATCH_SIZE = 500
+EVENTS_FLUSH_INTERVAL = env.int('EVENTS_FLUSH_INTERVAL', default=5)
+
+# Хранение событий (core.analytics): rollup_events ведет суточные итоги,
+# учитывая события, замеченные не меньше EVENTS_ROLLUP_SETTLE секунд назад;
+# prune_events архивирует события старше EVENTS_RETENTION_DAYS в EVENTS_ARCHIVE_DIR
+EVENTS_ROLLUP_SETTLE = env.int('EVENTS_ROLLUP_SETTLE', default=60)
+EVENTS_RETENTION_DAYS = env.int('EVENTS_RETENTION_DAYS', default=180)
+EVENTS_ARCHIVE_DIR = env.str('EVENTS_ARCHIVE_DIR', default=str(BASE_DIR / 'var' / 'events'))
+
+# Sitemap (core.sitemaps): индекс и gzip-файлы разделов по SITEMAP_MAX_URLS
+# адресов строит build_sitemaps; после изменений — фоновый поток ('thread'),
+# 'sync' или 'off' (только команда). SITE_URL — публичный адрес сайта для
+# sitemap и OAI-PMH, в production обязателен (settings.prod)
+SITE_URL = env.str('SITE_URL', default='http://localhost:8000')
+SITEMAP_ROOT = env.str('SITEMAP_ROOT', default=str(BASE_DIR / 'var' / 'sitemaps'))
+SITEMAP_MAX_URLS = env.int('SITEMAP_MAX_URLS', default=50000)
+SITEMAP_ON_CHANGE = env.str('SITEMAP_ON_CHANGE', default='thread')
+
+# Уменьшенные копии обложек и изображений новостей (core.images): пресеты
+# ширины в пикселях, копии WebP и JPEG в MEDIA_ROOT/IMAGE_DERIVATIVES_DIR;
+# заранее строит warm_image_derivatives, иначе — первый запрос копии
+IMAGE_PRESETS = {'sm': 320, 'md': 640, 'lg': 1280}
+IMAGE_QUALITY = env.int('IMAGE_QUALITY', default=82)
+IMAGE_DERIVATIVES_DIR = 'derivatives'
+IMAGE_DERIVATIVE_SOURCES = ('issues/covers/', 'news/')
+IMAGE_CACHE_ALIAS = 'default'
+
+# OAI-PMH (core.oai): записей на страницу списка; название и email для Identify
+# по умолчанию берутся из SiteSettings
+OAI_PAGE_SIZE = env.int('OAI_PAGE_SIZE', default=100)
+OAI_REPOSITORY_NAME = env.str('OAI_REPOSITORY_NAME', default='')
+OAI_ADMIN_EMAIL = env.str('OAI_ADMIN_EMAIL', default='noreply@jhdkz.org')
+
+# Текст PDF статей для поиска (articles.fulltext): процессов в пуле команды
+# extract_pdf_text; обработка после загрузки — 'thread', 'sync' или 'off'
+PDF_TEXT_WORKERS = env.int('PDF_TEXT_WORKERS', default=2)
+PDF_TEXT_ON_UPLOAD = env.str('PDF_TEXT_ON_UPLOAD', default='thread')
+PDF_TEXT_MAX_CHARS = env.int('PDF_TEXT_MAX_CHARS', default=2_000_000)
+
+# Похожие статьи (articles.similarity): число соседей и обновление после
+# сохранения статьи — 'thread' (фоновый поток), 'sync' или 'off' (только
+# периодической командой build_similar_articles)
+SIMILAR_ARTICLES_TOP_K = env.int('SIMILAR_ARTICLES_TOP_K', default=5)
+SIMILAR_ARTICLES_ON_SAVE = env.str('SIMILAR_ARTICLES_ON_SAVE', default='thread')
+
+# Тела страниц, загруженных ETL (etl.blobstore): import_jhd переносит их
+# сюда, RawDocument ссылается на них по sha256
+ETL_BLOB_ROOT = env.str('ETL_BLOB_ROOT', default=str(BASE_DIR / 'var' / 'etl-blobs'))
+
+# Выгрузка метаданных (articles.export): статей на пакет итератора и реквизиты
+# депозитора для Crossref (по умолчанию — название журнала)
+EXPORT_CHUNK_SIZE = env.int('EXPORT_CHUNK_SIZE', default=500)
+JOURNAL_ISSN = env.str('JOURNAL_ISSN', default='')
+CROSSREF_DEPOSITOR_NAME = env.str('CROSSREF_DEPOSITOR_NAME', default='')
+CROSSREF_DEPOSITOR_EMAIL = env.str('CROSSREF_DEPOSITOR_EMAIL', default='')
+CROSSREF_REGISTRANT = env.str('CROSSREF_REGISTRANT', default='')
+
+# Счетчики просмотров/загрузок статей (articles.counters): буфер в кэше,
+# сброс в БД не чаще раза в COUNTERS_FLUSH_INTERVAL секунд на процесс
+COUNTERS_CACHE_ALIAS = 'default'
+COUNTERS_FLUSH_INTERVAL = env.int('COUNTERS_FLUSH_INTERVAL', default=30)
+
+# Сводная статистика (core.stats): время жизни кэша в секундах; кэш
+# сбрасывается и раньше — при публикации статей и сбросе счетчиков
+SITE_STATISTICS_CACHE_ALIAS = 'default'
+SITE_STATISTICS_TIMEOUT = env.int('SITE_STATISTICS_TIMEOUT', default=60)
+
+# Поиск (core.search): путь к классу бэкенда; пусто — выбор по СУБД
+# (Postgres — tsvector, SQLite — FTS5, иначе icontains)
+SEARCH_BACKEND = env.str('SEARCH_BACKEND', default='')
+# Сколько лучших совпадений SQLite FTS5 ранжирует по bm25 (найдены и
+# посчитаны все совпадения, остальные идут после них по дате)
+SEARCH_MAX_RESULTS = 1000
+
+# Отдача файлов статей (core.downloads): '' — из Django (потоково, с Range),
+# 'x-accel' — через nginx X-Accel-Redirect, 'x-sendfile' — через X-Sendfile.
+# Для nginx: location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+DOWNLOADS_SENDFILE_MODE = env.str('DOWNLOADS_SENDFILE_MODE', default='')
+DOWNLOADS_ACCEL_PREFIX = env.str('DOWNLOADS_ACCEL_PREFIX', default='/protected-media/')
+
 AUTH_USER_MODEL = 'users.User'
 
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
@@ -2,10 +2,27 @@
 Настройки для продакшена (production).
 Включает все необходимые настройки безопасности и оптимизации.
 """
+from urllib.parse import urlsplit
+
+from django.core.exceptions import ImproperlyConfigured
+
 from .base import *  # noqa
 
 DEBUG = False
 
+# Общий кэш обязателен: gunicorn запускает несколько воркеров, а буфер
+# счетчиков, версия редиректов и инвалидация кэша страниц должны быть
+# видны всем процессам
+if not CACHE_IS_SHARED:
+    raise ImproperlyConfigured('Укажите общий кэш в CACHE_URL (например, redis://127.0.0.1:6379/1)')
+
+# Публичный адрес сайта: из него строятся ссылки sitemap, OAI-PMH baseURL,
+# идентификаторы записей oai:<домен>:article/<id> и ссылки на статьи в них.
+# Значение по умолчанию (localhost) попало бы в выдачу для роботов
+SITE_URL = env.str('SITE_URL', default='')
+if urlsplit(SITE_URL).hostname in (None, '', 'localhost', '127.0.0.1', '::1'):
+    raise ImproperlyConfigured('Укажите публичный адрес сайта в SITE_URL (например, https://jhd.kz)')
+
 # ALLOWED_HOSTS - обязательно добавить IP или домен сервера
 ALLOWED_HOSTS = env.list('ALLOWED_HOSTS', default=['31.3.209.35', 'localhost', '127.0.0.1'])
 
@@ -6,6 +6,7 @@ from django.views.generic import CreateView, UpdateView, ListView, TemplateView
 from django.urls import reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin
 from .forms import AuthorRegistrationForm, UserProfileForm
+from core.stats import author_statistics, site_statistics
 from .models import User
 
 class AuthorRegistrationView(CreateView):
@@ -72,17 +73,10 @@ class EditorDashboardView(EditorRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         # Простая статистика: пользователи-авторы, статьи, выпуски
-        ctx['authors_count'] = User.objects.filter(role='author').count()
-        try:
-            from articles.models import Article
-            ctx['articles_count'] = Article.objects.all().count()
-        except Exception:
-            ctx['articles_count'] = 0
-        try:
-            from issues.models import Issue
-            ctx['issues_count'] = Issue.objects.all().count()
-        except Exception:
-            ctx['issues_count'] = 0
+        stats = site_statistics()
+        ctx['authors_count'] = stats['total_authors']
+        ctx['articles_count'] = stats['all_articles']
+        ctx['issues_count'] = stats['total_issues']
         return ctx
 
 
@@ -112,20 +106,13 @@ def dashboard(request):
     
     # Статистика пользователя
     if user.role == 'author':
-        articles = user.articles.filter(status='published')
-        total_articles = articles.count()
-        total_views = sum(article.views for article in articles)
-        total_downloads = sum(article.downloads for article in articles)
+        stats = author_statistics(user)
     else:
-        total_articles = 0
-        total_views = 0
-        total_downloads = 0
+        stats = {'total_articles': 0, 'total_views': 0, 'total_downloads': 0}
     
     context = {
         'user': user,
-        'total_articles': total_articles,
-        'total_views': total_views,
-        'total_downloads': total_downloads,
+        **stats,
     }
     
     return render(request, 'users/dashboard.html', context)
@@ -13,8 +13,8 @@ django.setup()
 from articles.models import Article
 from issues.models import Issue
 from users.models import User
-from core.models import News
-from django.db.models import Count, Sum
+from django.db.models import Count
+from core.stats import compute as compute_statistics
 
 def print_separator(title):
     """Печатает разделитель с заголовком."""
@@ -26,40 +26,31 @@ def view_statistics():
     """Показывает общую статистику."""
     print_separator("ОБЩАЯ СТАТИСТИКА")
     
+    # Скрипт выполняется отдельно от сайта — считаем без кэша
+    stats = compute_statistics()
+    
     # Статьи
-    total_articles = Article.objects.count()
-    published_articles = Article.objects.filter(status='published').count()
     print(f"\n📄 Статьи:")
-    print(f"   Всего: {total_articles}")
-    print(f"   Опубликовано: {published_articles}")
-    
-    total_views = Article.objects.aggregate(total=Sum('views'))['total'] or 0
-    total_downloads = Article.objects.aggregate(total=Sum('downloads'))['total'] or 0
-    print(f"   Просмотров: {total_views}")
-    print(f"   Загрузок: {total_downloads}")
+    print(f"   Всего: {stats['all_articles']}")
+    print(f"   Опубликовано: {stats['total_articles']}")
+    print(f"   Просмотров: {stats['all_views']}")
+    print(f"   Загрузок: {stats['all_downloads']}")
     
     # Выпуски
-    total_issues = Issue.objects.count()
-    published_issues = Issue.objects.filter(status='published').count()
     print(f"\n📚 Выпуски:")
-    print(f"   Всего: {total_issues}")
-    print(f"   Опубликовано: {published_issues}")
+    print(f"   Всего: {stats['total_issues']}")
+    print(f"   Опубликовано: {stats['published_issues']}")
     
     # Пользователи
-    total_users = User.objects.count()
-    authors = User.objects.filter(role='author').count()
-    editors = User.objects.filter(role='editor').count()
-    reviewers = User.objects.filter(role='reviewer').count()
     print(f"\n👥 Пользователи:")
-    print(f"   Всего: {total_users}")
-    print(f"   Авторов: {authors}")
-    print(f"   Редакторов: {editors}")
-    print(f"   Рецензентов: {reviewers}")
+    print(f"   Всего: {stats['total_users']}")
+    print(f"   Авторов: {stats['total_authors']}")
+    print(f"   Редакторов: {stats['total_editors']}")
+    print(f"   Рецензентов: {stats['total_reviewers']}")
     
     # Новости
-    total_news = News.objects.count()
     print(f"\n📰 Новости:")
-    print(f"   Всего: {total_news}")
+    print(f"   Всего: {stats['total_news']}")
 
 def view_articles():
     """Показывает список статей."""